@@ -5,6 +5,39 @@ from django.conf import settings
 _bot = None
 _logger = None
 
+def configure_api_session():
+    """Share one keep-alive HTTP session between all apihelper calls"""
+    import requests
+    from requests.adapters import HTTPAdapter
+    from telebot import apihelper
+    from urllib3.util.retry import Retry
+
+    # Retry only failed connects: the request never reached Telegram, so resending is safe.
+    # Read errors are not retried to avoid duplicate messages.
+    retries = Retry(
+        total=settings.TELEGRAM_CONNECT_RETRIES,
+        connect=settings.TELEGRAM_CONNECT_RETRIES,
+        read=0,
+        status=0,
+        backoff_factor=0.3,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=settings.TELEGRAM_POOL_SIZE,
+        max_retries=retries,
+    )
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+
+    # apihelper otherwise creates a session per thread and recreates it every
+    # SESSION_TIME_TO_LIVE seconds, paying a new TLS handshake each time
+    apihelper.session = session
+    apihelper.CONNECT_TIMEOUT = settings.TELEGRAM_CONNECT_TIMEOUT
+    apihelper.READ_TIMEOUT = settings.TELEGRAM_READ_TIMEOUT
+    return session
+
+
 def get_bot():
     """Lazy initialization of the bot"""
     global _bot
@@ -12,12 +45,19 @@ def get_bot():
         import telebot
         from dd.settings import get_bot_commands
 
+        configure_api_session()
+
         commands = get_bot_commands()
         _bot = telebot.TeleBot(
             settings.BOT_TOKEN,
             threaded=False,
             skip_pending=True,
         )
+        # Every message the bot sends, including direct bot.send_message calls
+        # from handlers, goes through the global and per-chat rate limits
+        from telebot import apihelper
+        from bot.sender import outbound
+        apihelper.CUSTOM_REQUEST_SENDER = outbound.send_request
         _bot.set_my_commands(commands)
         try:
             bot_info = _bot.get_me()
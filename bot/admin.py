@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import User, Task, Subtask, UserState, Role
+from .models import User, Task, Subtask, UserState, Role, NotificationOutbox
 
 
 @admin.register(Role)
@@ -48,14 +48,14 @@ class TaskAdmin(admin.ModelAdmin):
     list_display = ('id', 'title', 'creator', 'assignee', 'assigned_role', 'status', 'progress', 'due_date', 'created_at')
     search_fields = ('title', 'description', 'creator__user_name', 'assignee__user_name')
     list_filter = ('status', 'due_date', 'created_at', 'creator', 'assignee', 'assigned_role')
-    readonly_fields = ('created_at', 'updated_at', 'closed_at', 'id')
+    readonly_fields = ('created_at', 'updated_at', 'closed_at', 'id', 'subtasks_total', 'subtasks_done', 'next_notify_at')
     ordering = ('-created_at',)
     fieldsets = (
         ('Основная информация', {
             'fields': ('title', 'description', 'creator', 'assignee', 'assigned_role')
         }),
         ('Статус и прогресс', {
-            'fields': ('status', 'progress', 'due_date', 'notification_interval', 'last_notified_at')
+            'fields': ('status', 'subtasks_done', 'subtasks_total', 'due_date', 'notification_interval', 'last_notified_at', 'next_notify_at')
         }),
         ('Отчет', {
             'fields': ('report_text', 'report_attachments'),
@@ -110,4 +110,13 @@ class UserStateAdmin(admin.ModelAdmin):
 
     def get_queryset(self, request):
         # Убрали select_related, используем raw_id_fields
-        return super().get_queryset(request)
\ No newline at end of file
+        return super().get_queryset(request)
+
+
+@admin.register(NotificationOutbox)
+class NotificationOutboxAdmin(admin.ModelAdmin):
+    list_display = ('id', 'recipient', 'status', 'attempts', 'next_attempt_at', 'deliver_after', 'created_at', 'sent_at')
+    search_fields = ('recipient', 'idempotency_key', 'text')
+    list_filter = ('status', 'created_at')
+    readonly_fields = ('created_at', 'sent_at', 'id')
+    ordering = ('-id',)
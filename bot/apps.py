@@ -4,6 +4,7 @@ class BotConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'bot'
     def ready(self):
+        from . import signals  # noqa: F401
         if os.getenv('RUN_SCHEDULER') == 'true':
             try:
                 from .schedulers import start_scheduler
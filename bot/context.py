@@ -0,0 +1,58 @@
+"""
+Контекст обработки одного обновления.
+
+За время обработки одного сообщения или нажатия пользователь и его состояние
+запрашиваются многократно: в master_message_handler, check_registration,
+check_permissions и в самом обработчике. В рамках update_context() объекты
+User (вместе с ролями) и состояния UserState загружаются один раз и
+переиспользуются, а изменения состояния записываются в БД одним действием
+в конце обработки (через хранилище из bot/state_store.py). Вне контекста (планировщик, management-команды) функции из
+bot/handlers/utils.py работают напрямую с БД, как раньше.
+"""
+import threading
+from contextlib import contextmanager
+
+_local = threading.local()
+
+
+class UpdateContext:
+    def __init__(self):
+        self.users = {}
+        self.states = {}
+        self.dirty_states = set()
+
+
+def get_context():
+    """Текущий контекст обновления или None"""
+    return getattr(_local, 'context', None)
+
+
+@contextmanager
+def update_context():
+    """Открывает контекст обновления; по выходу записывает измененные состояния"""
+    if get_context() is not None:
+        # Вложенный вызов (например, обработка внутри уже открытого контекста)
+        yield get_context()
+        return
+
+    context = UpdateContext()
+    _local.context = context
+    try:
+        yield context
+    finally:
+        try:
+            flush_states(context)
+        finally:
+            _local.context = None
+
+
+def flush_states(context: UpdateContext) -> None:
+    from bot.state_store import state_store
+
+    for chat_id in list(context.dirty_states):
+        state = context.states.get(chat_id)
+        if state:
+            state_store.save(chat_id, state)
+        else:
+            state_store.delete(chat_id)
+    context.dirty_states.clear()
@@ -0,0 +1,75 @@
+"""
+Экранирование и проверка разметки Telegram Markdown (legacy, parse_mode='Markdown').
+
+Пользовательский текст (названия, описания, комментарии, имена) может содержать
+символы разметки. Раньше такие сообщения отправлялись как есть, Telegram отвечал
+"can't parse entities", и только потом сообщение уходило повторно без разметки.
+Теперь пользовательские значения экранируются при сборке текста, а итоговый
+текст проверяется локально по тем же правилам, что и у Telegram: если разметка
+все равно некорректна, сообщение сразу отправляется без parse_mode.
+"""
+import re
+
+from bot import logger
+
+# В legacy Markdown экранируются только эти символы, и только вне сущностей
+_ESCAPABLE = frozenset('_*`[')
+_ESCAPE_TABLE = str.maketrans({char: '\\' + char for char in _ESCAPABLE})
+_SPECIAL = re.compile(r'[\\_*`\[]')
+
+
+def escape_md(value) -> str:
+    """Экранирует пользовательское значение для вставки в текст с parse_mode='Markdown'"""
+    if value is None:
+        return ''
+    return str(value).translate(_ESCAPE_TABLE)
+
+
+def find_markdown_error(text: str):
+    """
+    Возвращает позицию сущности, которую Telegram не сможет разобрать
+    ("Can't find end of the entity"), или None, если разметка корректна.
+    """
+    position = 0
+    while True:
+        match = _SPECIAL.search(text, position)
+        if match is None:
+            return None
+        position = match.start()
+        char = text[position]
+
+        if char == '\\':
+            position += 2 if text[position + 1:position + 2] in _ESCAPABLE else 1
+            continue
+
+        begin = position
+        if char == '`' and text.startswith('``', position + 1):
+            end = text.find('```', position + 3)
+            if end == -1:
+                return begin
+            position = end + 3
+            continue
+
+        end = text.find(']' if char == '[' else char, position + 1)
+        if end == -1:
+            return begin
+        position = end + 1
+
+        if char == '[' and text.startswith('(', position):
+            # Незакрытая ссылка не ошибка: URL просто забирает остаток текста
+            close = text.find(')', position + 1)
+            position = len(text) if close == -1 else close + 1
+
+
+def is_valid_markdown(text: str) -> bool:
+    return find_markdown_error(text) is None
+
+
+def safe_parse_mode(text: str, parse_mode):
+    """Возвращает parse_mode, либо None, если текст не пройдет разбор Markdown в Telegram"""
+    if parse_mode and parse_mode.lower() == 'markdown':
+        error_position = find_markdown_error(text or '')
+        if error_position is not None:
+            logger.info(f"Invalid Markdown at offset {error_position}, sending without parse_mode")
+            return None
+    return parse_mode
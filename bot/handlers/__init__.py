@@ -2,7 +2,7 @@
 from .commands import (
     start_command, tasks_command,
     close_task_command, task_progress_command, debug_command,
-    tasks_callback
+    tasks_callback, task_list_callback
 )
 from .tasks import (
     create_task_command, create_task_callback,
@@ -20,7 +20,8 @@ from .task_creation import (
     add_subtask_callback, cancel_subtask_input_callback, clear_subtasks_callback, finish_subtasks_callback,
     clear_attachments_callback, finish_attachments_callback,
     skip_assignee_callback, choose_assignee_callback,
-    user_page_callback, select_user_callback, back_to_assignee_selection_callback,
+    user_next_callback, user_prev_callback, user_search_callback, user_search_reset_callback,
+    handle_user_search_input, select_user_callback, back_to_assignee_selection_callback,
     back_to_assignee_type_callback, cancel_task_creation_callback,
     select_notification_interval_callback, skip_notification_interval_callback,
     back_to_calendar_callback, back_to_notifications_callback, 
@@ -33,7 +34,7 @@ from .role_handlers import (
 from .task_editing import (
     task_edit_callback, edit_title_callback, edit_description_callback,
     edit_assignee_callback, edit_due_date_callback, edit_notification_interval_callback,
-    assignee_page_callback, change_assignee_callback, add_subtasks_callback, reopen_task_callback
+    change_assignee_callback, add_subtasks_callback, reopen_task_callback
 )
 from .reports import (
     handle_task_report, view_report_attachments_callback,
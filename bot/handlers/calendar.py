@@ -132,7 +132,7 @@ def process_calendar_callback(call) -> None:
     """
     Обрабатывает callback'и календаря
     """
-    from bot.handlers.utils import get_user_state
+    from bot.handlers.utils import get_user_state, safe_edit_or_send_message
     chat_id = str(call.message.chat.id)
     user_state = get_user_state(chat_id)
     context = user_state.get('calendar_context', 'task_creation')
@@ -150,7 +150,7 @@ def process_calendar_callback(call) -> None:
         try:
             year, month = int(year), int(month)
             text, markup = create_calendar(year, month)
-            bot.edit_message_text(text, call.message.chat.id, call.message.message_id, reply_markup=markup)
+            safe_edit_or_send_message(chat_id, text, reply_markup=markup, message_id=call.message.message_id)
         except ValueError:
             logger.error(f"Неверные числовые значения в prev: {data}")
             return
@@ -166,7 +166,7 @@ def process_calendar_callback(call) -> None:
         try:
             year, month = int(year), int(month)
             text, markup = create_calendar(year, month)
-            bot.edit_message_text(text, call.message.chat.id, call.message.message_id, reply_markup=markup)
+            safe_edit_or_send_message(chat_id, text, reply_markup=markup, message_id=call.message.message_id)
         except ValueError:
             logger.error(f"Неверные числовые значения в next: {data}")
             return
@@ -205,7 +205,7 @@ def process_calendar_callback(call) -> None:
             set_user_state(chat_id, user_state)
 
         text, markup = create_time_selector(selected_date)
-        bot.edit_message_text(text, call.message.chat.id, call.message.message_id, reply_markup=markup)
+        safe_edit_or_send_message(chat_id, text, reply_markup=markup, message_id=call.message.message_id)
 
     elif data.startswith("calendar_past_date_"):
         # Нажата прошедшая дата - показываем уведомление
@@ -258,12 +258,12 @@ def process_calendar_callback(call) -> None:
                 try:
                     task = Task.objects.get(id=int(task_id))
                     task.due_date = due_date
-                    task.save()
+                    task.save(update_fields=['due_date'])
                     text = f"➡️ Срок задачи обновлен: {due_date.strftime('%d.%m.%Y %H:%M')}"
                     from bot.keyboards import get_task_actions_markup
                     markup = get_task_actions_markup(task.id, task.status, task.report_attachments,
-                                                   task.creator.telegram_id == chat_id,
-                                                   task.assignee.telegram_id == chat_id)
+                                                   task.creator_id == chat_id,
+                                                   task.assignee_id == chat_id)
                 except Exception as e:
                     logger.error(f"Ошибка при обновлении срока задачи: {e}")
                     text = "❌ Ошибка при обновлении срока задачи"
@@ -279,7 +279,7 @@ def process_calendar_callback(call) -> None:
                 return  # Не отправляем сообщение, функция show_notification_selection_menu сама обработает
 
             if markup:
-                bot.edit_message_text(text, call.message.chat.id, call.message.message_id, reply_markup=markup)
+                safe_edit_or_send_message(chat_id, text, reply_markup=markup, message_id=call.message.message_id)
 
     elif data == "calendar_no_time":
         # Без времени - сохраняем только дату
@@ -304,12 +304,12 @@ def process_calendar_callback(call) -> None:
                 try:
                     task = Task.objects.get(id=int(task_id))
                     task.due_date = due_date
-                    task.save()
+                    task.save(update_fields=['due_date'])
                     text = f"➡️ Срок задачи обновлен: {due_date.strftime('%d.%m.%Y')} (без времени)"
                     from bot.keyboards import get_task_actions_markup
                     markup = get_task_actions_markup(task.id, task.status, task.report_attachments,
-                                                   task.creator.telegram_id == chat_id,
-                                                   task.assignee.telegram_id == chat_id)
+                                                   task.creator_id == chat_id,
+                                                   task.assignee_id == chat_id)
                 except Exception as e:
                     logger.error(f"Ошибка при обновлении срока задачи: {e}")
                     text = "❌ Ошибка при обновлении срока задачи"
@@ -324,7 +324,7 @@ def process_calendar_callback(call) -> None:
                 return
 
             if markup:
-                bot.edit_message_text(text, call.message.chat.id, call.message.message_id, reply_markup=markup)
+                safe_edit_or_send_message(chat_id, text, reply_markup=markup, message_id=call.message.message_id)
 
     elif data == "calendar_skip_date":
         # Без срока
@@ -339,12 +339,12 @@ def process_calendar_callback(call) -> None:
                 try:
                     task = Task.objects.get(id=int(task_id))
                     task.due_date = None
-                    task.save()
+                    task.save(update_fields=['due_date'])
                     text = "➡️ Срок задачи снят"
                     from bot.keyboards import get_task_actions_markup
                     markup = get_task_actions_markup(task.id, task.status, task.report_attachments,
-                                                   task.creator.telegram_id == chat_id,
-                                                   task.assignee.telegram_id == chat_id)
+                                                   task.creator_id == chat_id,
+                                                   task.assignee_id == chat_id)
                 except Exception as e:
                     logger.error(f"Ошибка при снятии срока задачи: {e}")
                     text = "❌ Ошибка при снятии срока задачи"
@@ -359,12 +359,12 @@ def process_calendar_callback(call) -> None:
                 return
 
             if markup:
-                bot.edit_message_text(text, call.message.chat.id, call.message.message_id, reply_markup=markup)
+                safe_edit_or_send_message(chat_id, text, reply_markup=markup, message_id=call.message.message_id)
 
     elif data == "calendar_back_to_date":
         # Возврат к выбору даты
         text, markup = create_calendar()
-        bot.edit_message_text(text, call.message.chat.id, call.message.message_id, reply_markup=markup)
+        safe_edit_or_send_message(chat_id, text, reply_markup=markup, message_id=call.message.message_id)
 
     elif data == "calendar_cancel":
         # Отмена с подтверждением
@@ -387,7 +387,7 @@ def show_calendar(chat_id: str, context: str = "task_creation", message_id: int
     """
     Показывает календарь пользователю
     """
-    from bot.handlers.utils import get_user_state, set_user_state
+    from bot.handlers.utils import get_user_state, set_user_state, safe_edit_or_send_message
     user_state = get_user_state(chat_id)
     user_state['calendar_context'] = context
     set_user_state(chat_id, user_state)
@@ -400,10 +400,4 @@ def show_calendar(chat_id: str, context: str = "task_creation", message_id: int
         text += "\n\n_Выбери дату на календаре или нажми 'Пропустить срок'._"
         markup.add(InlineKeyboardButton("Пропустить срок", callback_data="skip_due_date"))
 
-    if message_id:
-        try:
-            bot.edit_message_text(text, chat_id, message_id, reply_markup=markup, parse_mode='Markdown')
-        except Exception:
-            bot.send_message(chat_id, text, reply_markup=markup, parse_mode='Markdown')
-    else:
-        bot.send_message(chat_id, text, reply_markup=markup, parse_mode='Markdown')
\ No newline at end of file
+    safe_edit_or_send_message(chat_id, text, reply_markup=markup, message_id=message_id, parse_mode='Markdown')
\ No newline at end of file
@@ -1,10 +1,11 @@
 from bot.handlers.utils import (
-    get_or_create_user, get_chat_id_from_update, safe_edit_or_send_message, format_task_info, 
-    check_permissions, show_task_progress, check_registration
+    get_or_create_user, get_chat_id_from_update, format_task_info,
+    check_permissions, show_task_progress, check_registration, get_task_for_view,
+    get_user, show_task_list
 )
 from bot import bot, logger
-from bot.models import User, Task
-from bot.keyboards import get_tasks_list_markup, TASK_MANAGEMENT_MARKUP, main_markup, get_main_menu
+from bot.models import Task
+from bot.keyboards import TASK_LIST_VIEW_FILTERS, TASK_MANAGEMENT_MARKUP, main_markup, get_main_menu
 from bot.handlers.tasks import initiate_task_close
 from telebot.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 from django.core.exceptions import ObjectDoesNotExist
@@ -22,7 +23,7 @@ def start_command(message: Message) -> None:
             return
         
         # Существующий пользователь с полными данными - показываем меню
-        user = User.objects.get(telegram_id=chat_id)
+        user = get_user(chat_id)
         logger.info(f"Пользователь найден: {user.user_name}")
 
         # Меню с проверкой туториала
@@ -50,15 +51,34 @@ def tasks_command(message: Message) -> None:
     tasks_command_logic(message)
 
 
-def tasks_callback(call: CallbackQuery) -> None:
-    # Проверяем, находится ли пользователь уже в разделе "мои задачи" (активные задачи)
-    current_text = getattr(call.message, 'text', '') or getattr(call.message, 'caption', '') or ''
-    logger.info(f"tasks_callback: current_text = '{current_text[:100]}...'")
+def _shows_my_tasks_first_page(message) -> bool:
+    """
+    Показывает ли сообщение первую страницу "Мои задачи" без фильтра. Решается по
+    callback_data кнопок (task_list_assignee_<фильтр>_<курсор>), а не по тексту:
+    есть "Вперёд" по фильтру all и нет "Назад". Без кнопок навигации фильтр
+    неизвестен - тогда список просто перерисовывается.
+    """
+    markup = getattr(message, 'reply_markup', None)
+    callbacks = [
+        button.callback_data or ''
+        for row in (getattr(markup, 'keyboard', None) or [])
+        for button in row
+    ]
+    navigation = {
+        (status_filter, cursor[:1])
+        for status_filter, cursor in (
+            data[len('task_list_assignee_'):].split('_', 1)
+            for data in callbacks if data.startswith('task_list_assignee_')
+        )
+        if cursor != '0'
+    }
+    return navigation == {('all', 'a')}
+
 
-    # Проверяем оба возможных текста раздела "мои задачи"
-    if "ВАШИ АКТИВНЫЕ ЗАДАЧИ" in current_text or "У вас нет активных задач" in current_text:
+def tasks_callback(call: CallbackQuery) -> None:
+    # Пользователь уже на первой странице "Мои задачи" - не перерисовываем список
+    if _shows_my_tasks_first_page(call.message):
         logger.info("tasks_callback: User already in tasks section, showing notification")
-        # Показываем уведомление, что пользователь уже в этом разделе
         bot.answer_callback_query(
             call.id,
             "ℹ️ Вы уже находитесь в разделе 'Мои задачи'",
@@ -66,7 +86,6 @@ def tasks_callback(call: CallbackQuery) -> None:
         )
         return
 
-    logger.info("tasks_callback: User not in tasks section, loading tasks")
     # Вызываем логику напрямую с передачей callback объекта
     tasks_command_logic(call)
 
@@ -77,32 +96,21 @@ def tasks_command_logic(update) -> None:
     chat_id = get_chat_id_from_update(update)
     user = get_or_create_user(chat_id)
 
-    # Получаем активные задачи пользователя (назначенные лично или через роль)
-    from django.db.models import Q
-    active_tasks = Task.objects.filter(
-        Q(assignee=user) | Q(assigned_role__in=user.roles.all()),
-        status__in=['active', 'pending_review']
-    ).distinct().order_by('-created_at')
-
-    if not active_tasks:
-        text = "📋 У вас нет активных задач"
-        from bot.keyboards import UNIVERSAL_BUTTONS
-        markup = UNIVERSAL_BUTTONS
-    else:
-        text = f"📋 ВАШИ АКТИВНЫЕ ЗАДАЧИ\n\n"
-        markup = get_tasks_list_markup(active_tasks, is_creator_view=False)
-
-    # Если это callback (есть message в update), редактируем сообщение
-    if hasattr(update, 'message') and hasattr(update.message, 'message_id'):
-        safe_edit_or_send_message(
-            chat_id=chat_id,
-            text=text,
-            reply_markup=markup,
-            message_id=update.message.message_id
-        )
-    else:
-        # Если это команда, отправляем новое сообщение
-        safe_edit_or_send_message(chat_id, text, reply_markup=markup)
+    # Активные задачи пользователя (назначенные лично или через роль), первая страница
+    # Если это callback (есть message в update), редактируем сообщение, иначе отправляем новое
+    message_id = update.message.message_id if hasattr(update, 'message') and hasattr(update.message, 'message_id') else None
+    show_task_list(chat_id, user, 'assignee', message_id=message_id)
+
+
+def task_list_callback(call: CallbackQuery, view: str, status_filter: str, cursor: str) -> None:
+    """Листание и фильтры списков задач (callback task_list_<view>_<filter>_<курсор>)"""
+    valid_cursor = cursor == '0' or (cursor[:1] in ('a', 'b') and cursor[1:].isdigit())
+    if view not in TASK_LIST_VIEW_FILTERS or status_filter not in TASK_LIST_VIEW_FILTERS[view] or not valid_cursor:
+        bot.answer_callback_query(call.id, "❌ Неверный формат данных", show_alert=True)
+        return
+    chat_id = get_chat_id_from_update(call)
+    user = get_or_create_user(chat_id)
+    show_task_list(chat_id, user, view, status_filter, cursor, message_id=call.message.message_id)
 
 # Обработчик create_task перенесен в tasks.py для избежания дублирования
 
@@ -117,7 +125,7 @@ def close_task_command(message: Message) -> None:
             return
 
         task_id = int(parts[1])
-        task = Task.objects.get(id=task_id)
+        task = get_task_for_view(task_id)
         chat_id = str(message.chat.id)
         user = get_or_create_user(chat_id)
 
@@ -146,7 +154,7 @@ def task_progress_command(message: Message) -> None:
             return
 
         task_id = int(parts[1])
-        task = Task.objects.get(id=task_id)
+        task = get_task_for_view(task_id)
         chat_id = str(message.chat.id)
         user = get_or_create_user(chat_id)
 
@@ -155,7 +163,7 @@ def task_progress_command(message: Message) -> None:
             bot.send_message(message.chat.id, error_msg)
             return
 
-        is_creator = task.creator.telegram_id == user.telegram_id
+        is_creator = task.creator_id == user.telegram_id
         # Исполнителем считается тот, кто имеет доступ (назначен лично или через роль)
         is_assignee = task.has_access(user) and not is_creator
         # Если и создатель и исполнитель в одном лице (сам себе назначил через роль), 
@@ -1,5 +1,6 @@
 from bot.handlers.utils import (
-    get_or_create_user, get_user_state, set_user_state, clear_user_state, check_registration
+    get_or_create_user, get_user_state, set_user_state, clear_user_state, check_registration,
+    get_user, safe_edit_or_send_message
 )
 from bot import bot, logger
 from bot.models import User
@@ -9,7 +10,7 @@ from telebot.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKe
 def show_profile(chat_id: str, message_id: int = None) -> None:
     """Показывает профиль пользователя"""
     try:
-        user = User.objects.get(telegram_id=chat_id)
+        user = get_user(chat_id)
         
         profile_text = f"""👤 **ВАШ ПРОФИЛЬ**
 
@@ -26,14 +27,7 @@ def show_profile(chat_id: str, message_id: int = None) -> None:
         markup.add(InlineKeyboardButton("⏰ Редактировать время работы", callback_data="profile_edit_work_hours"))
         markup.add(InlineKeyboardButton("⬅️ Главное меню", callback_data="main_menu"))
         
-        if message_id:
-            try:
-                bot.edit_message_text(profile_text, chat_id, message_id, 
-                                     reply_markup=markup, parse_mode='Markdown')
-            except:
-                bot.send_message(chat_id, profile_text, reply_markup=markup, parse_mode='Markdown')
-        else:
-            bot.send_message(chat_id, profile_text, reply_markup=markup, parse_mode='Markdown')
+        safe_edit_or_send_message(chat_id, profile_text, reply_markup=markup, message_id=message_id, parse_mode='Markdown')
             
     except User.DoesNotExist:
         bot.send_message(chat_id, "❌ Пользователь не найден")
@@ -61,7 +55,7 @@ def profile_edit_info_menu_callback(call: CallbackQuery) -> None:
     markup.add(InlineKeyboardButton("📝 Изменить фамилию", callback_data="profile_edit_last_name"))
     markup.add(InlineKeyboardButton("⬅️ Назад", callback_data="profile"))
     
-    bot.edit_message_text(text, chat_id, call.message.message_id, reply_markup=markup)
+    safe_edit_or_send_message(chat_id, text, reply_markup=markup, message_id=call.message.message_id)
     bot.answer_callback_query(call.id)
 
 
@@ -72,13 +66,13 @@ def profile_edit_first_name_callback(call: CallbackQuery) -> None:
     user_state['state'] = 'waiting_first_name'
     set_user_state(chat_id, user_state)
     
-    bot.edit_message_text(
-        "✏️ Введите ваше имя:",
+    safe_edit_or_send_message(
         chat_id,
-        call.message.message_id,
+        "✏️ Введите ваше имя:",
         reply_markup=InlineKeyboardMarkup().add(
             InlineKeyboardButton("⬅️ Отмена", callback_data="profile_edit_info_menu")
-        )
+        ),
+        message_id=call.message.message_id
     )
     bot.answer_callback_query(call.id)
 
@@ -90,13 +84,13 @@ def profile_edit_last_name_callback(call: CallbackQuery) -> None:
     user_state['state'] = 'waiting_last_name'
     set_user_state(chat_id, user_state)
     
-    bot.edit_message_text(
-        "✏️ Введите вашу фамилию:",
+    safe_edit_or_send_message(
         chat_id,
-        call.message.message_id,
+        "✏️ Введите вашу фамилию:",
         reply_markup=InlineKeyboardMarkup().add(
             InlineKeyboardButton("⬅️ Отмена", callback_data="profile_edit_info_menu")
-        )
+        ),
+        message_id=call.message.message_id
     )
     bot.answer_callback_query(call.id)
 
@@ -110,7 +104,7 @@ def profile_edit_work_hours_callback(call: CallbackQuery) -> None:
         del user_state['work_start_temp']
     set_user_state(chat_id, user_state)
     
-    user = User.objects.get(telegram_id=chat_id)
+    user = get_user(chat_id)
     
     text = f"""⏰ **РЕДАКТИРОВАНИЕ ВРЕМЕНИ РАБОТЫ**
 
@@ -119,13 +113,13 @@ def profile_edit_work_hours_callback(call: CallbackQuery) -> None:
 Введите новое время работы в формате: `с 7 до 23` или `7-23`
 (только часы, без минут)"""
     
-    bot.edit_message_text(
-        text,
+    safe_edit_or_send_message(
         chat_id,
-        call.message.message_id,
+        text,
         reply_markup=InlineKeyboardMarkup().add(
             InlineKeyboardButton("⬅️ Отмена", callback_data="profile")
         ),
+        message_id=call.message.message_id,
         parse_mode='Markdown'
     )
     bot.answer_callback_query(call.id)
@@ -156,9 +150,9 @@ def handle_first_name_input(message: Message, chat_id: str) -> None:
         return
     
     try:
-        user = User.objects.get(telegram_id=chat_id)
+        user = get_user(chat_id)
         user.first_name = message.text.strip()
-        user.save()
+        user.save(update_fields=['first_name'])
         
         clear_user_state(chat_id)
         bot.send_message(chat_id, "➡️ Имя успешно обновлено!")
@@ -176,9 +170,9 @@ def handle_last_name_input(message: Message, chat_id: str) -> None:
         return
     
     try:
-        user = User.objects.get(telegram_id=chat_id)
+        user = get_user(chat_id)
         user.last_name = message.text.strip()
-        user.save()
+        user.save(update_fields=['last_name'])
         
         clear_user_state(chat_id)
         bot.send_message(chat_id, "➡️ Фамилия успешно обновлена!")
@@ -225,10 +219,10 @@ def handle_work_hours_input(message: Message, chat_id: str) -> None:
         return
     
     try:
-        user = User.objects.get(telegram_id=chat_id)
+        user = get_user(chat_id)
         user.work_start = start
         user.work_end = end
-        user.save()
+        user.save(update_fields=['work_start', 'work_end'])
         
         # Удаляем временные данные
         if 'work_start_temp' in user_state:
@@ -1,9 +1,11 @@
 from bot.handlers.utils import (
     get_or_create_user, get_chat_id_from_update, safe_edit_or_send_message, format_task_info,
-    check_permissions, get_user_state, set_user_state, clear_user_state, send_task_notification
+    check_permissions, get_user_state, set_user_state, clear_user_state, send_task_notification,
+    send_attachments, get_task_for_view, RECENT_COMMENTS_LIMIT
 )
 from bot.handlers.main import show_task_progress
 from bot import bot, logger
+from bot.formatting import escape_md
 from bot.models import User, Task, TaskComment
 from bot.keyboards import (
     get_task_actions_markup, TASK_MANAGEMENT_MARKUP, get_main_menu
@@ -30,7 +32,7 @@ def handle_task_report(message: Message) -> None:
         return
 
     try:
-        active_task = Task.objects.get(id=task_id)
+        active_task = get_task_for_view(task_id)
 
         # Обрабатываем текстовый отчет или подпись к фото
         new_text = ""
@@ -84,7 +86,7 @@ def handle_task_report(message: Message) -> None:
         active_task.report_text = report_text
         active_task.report_attachments = attachments
         active_task.status = 'pending_review'
-        active_task.save()
+        active_task.save(update_fields=['report_text', 'report_attachments', 'status'])
 
         # Уведомляем создателя
         notify_creator_about_report(active_task)
@@ -109,7 +111,7 @@ def finish_report_callback(call: CallbackQuery) -> None:
     attachments = user_state.get('report_attachments', [])
     
     try:
-        task = Task.objects.get(id=task_id)
+        task = get_task_for_view(task_id)
         report_text = user_state.get('report_text')
         
         if not report_text:
@@ -118,12 +120,12 @@ def finish_report_callback(call: CallbackQuery) -> None:
         task.report_text = report_text
         task.report_attachments = attachments
         task.status = 'pending_review'
-        task.save()
+        task.save(update_fields=['report_text', 'report_attachments', 'status'])
         
         notify_creator_about_report(task)
         
         clear_user_state(chat_id)
-        bot.edit_message_text("✅ Отчет успешно отправлен!", chat_id, call.message.message_id)
+        safe_edit_or_send_message(chat_id, "✅ Отчет успешно отправлен!", message_id=call.message.message_id)
         user = get_or_create_user(chat_id)
         bot.send_message(chat_id, "Вы вернулись в главное меню", reply_markup=get_main_menu(user))
         
@@ -134,10 +136,11 @@ def finish_report_callback(call: CallbackQuery) -> None:
 
 def notify_creator_about_report(task: Task) -> None:
     try:
-        creator_text = f"📬 **Ваша задача готова к проверке**\n\n{format_task_info(task)}"
+        creator_text = f"📬 **Ваша задача готова к проверке**\n\n{format_task_info(task, markdown=True)}"
 
         markup = get_task_actions_markup(task.id, task.status, task.report_attachments, True, False)
-        send_task_notification(task.creator.telegram_id, creator_text, reply_markup=markup, parse_mode='Markdown')
+        send_task_notification(task.creator_id, creator_text, reply_markup=markup, parse_mode='Markdown',
+                               task=task)
     except Exception as e:
         logger.error(f"Не удалось уведомить создателя: {e}")
 
@@ -148,14 +151,15 @@ def notify_creator_about_comment(task: Task, comment: TaskComment) -> None:
     """
     try:
         notification_text = f"💬 **Новый комментарий к задаче**\n\n"
-        notification_text += f"📋 Задача: {task.title}\n"
-        notification_text += f"👤 Автор комментария: {comment.author.user_name}\n"
-        notification_text += f"💭 Комментарий: {comment.text}\n"
+        notification_text += f"📋 Задача: {escape_md(task.title)}\n"
+        notification_text += f"👤 Автор комментария: {escape_md(comment.author.user_name)}\n"
+        notification_text += f"💭 Комментарий: {escape_md(comment.text)}\n"
 
         markup = get_task_actions_markup(task.id, task.status, task.report_attachments, 
                                         True, False)
-        send_task_notification(task.creator.telegram_id, notification_text, 
-                        reply_markup=markup, parse_mode='Markdown')
+        # Серия комментариев объединяется в одно сообщение (NOTIFICATION_COALESCE_SECONDS)
+        send_task_notification(task.creator_id, notification_text, 
+                        reply_markup=markup, parse_mode='Markdown', task=task, coalesce=True)
     except Exception as e:
         logger.error(f"Не удалось уведомить создателя о комментарии: {e}")
 
@@ -166,9 +170,9 @@ def notify_assignee_about_comment(task: Task, comment: TaskComment) -> None:
     """
     try:
         notification_text = f"💬 **Новый комментарий к задаче**\n\n"
-        notification_text += f"📋 Задача: {task.title}\n"
-        notification_text += f"👤 Автор комментария: {comment.author.user_name}\n"
-        notification_text += f"💭 Комментарий: {comment.text}\n"
+        notification_text += f"📋 Задача: {escape_md(task.title)}\n"
+        notification_text += f"👤 Автор комментария: {escape_md(comment.author.user_name)}\n"
+        notification_text += f"💭 Комментарий: {escape_md(comment.text)}\n"
 
         markup = get_task_actions_markup(task.id, task.status, task.report_attachments, 
                                         False, True)
@@ -178,7 +182,7 @@ def notify_assignee_about_comment(task: Task, comment: TaskComment) -> None:
             if assignee.telegram_id != str(comment.author.telegram_id):
                 try:
                     send_task_notification(assignee.telegram_id, notification_text, 
-                                    reply_markup=markup, parse_mode='Markdown')
+                                    reply_markup=markup, parse_mode='Markdown', task=task, coalesce=True)
                 except Exception as e:
                     logger.error(f"Не удалось уведомить участника {assignee.telegram_id} о комментарии: {e}")
     except Exception as e:
@@ -207,7 +211,7 @@ def handle_task_comment(message: Message) -> None:
         return
 
     try:
-        task = Task.objects.get(id=task_id)
+        task = get_task_for_view(task_id)
         user = get_or_create_user(chat_id)
         
         comment = TaskComment.objects.create(
@@ -215,12 +219,14 @@ def handle_task_comment(message: Message) -> None:
             author=user,
             text=message.text.strip()
         )
+        # Новый комментарий - в начало уже загруженных, чтобы не загружать задачу повторно
+        task.recent_comments = [comment] + task.recent_comments[:RECENT_COMMENTS_LIMIT - 1]
         
         bot.send_message(chat_id, "✅ Комментарий добавлен!")
         clear_user_state(chat_id)
         
         # Уведомляем о комментарии согласно логике
-        is_user_creator = (user.telegram_id == task.creator.telegram_id)
+        is_user_creator = (user.telegram_id == task.creator_id)
         is_user_assignee = task.has_access(user)
         
         if is_user_creator:
@@ -230,7 +236,7 @@ def handle_task_comment(message: Message) -> None:
             # Если оставил любой из исполнителей - уведомляем создателя
             notify_creator_about_comment(task, comment)
         
-        # Показываем задачу снова
+        # Показываем задачу снова (с новым комментарием)
         show_task_progress(chat_id, task, is_user_creator, is_user_assignee)
         
     except Exception as e:
@@ -238,10 +244,8 @@ def handle_task_comment(message: Message) -> None:
         bot.send_message(chat_id, "❌ Ошибка при добавлении комментария")
 
 
-def view_report_attachments_callback(call: CallbackQuery) -> None:
-    # (Existing logic, keep it)
+def view_report_attachments_callback(call: CallbackQuery, task_id: int) -> None:
     try:
-        task_id = int(call.data.split('_')[3])
         task = Task.objects.get(id=task_id)
         chat_id = get_chat_id_from_update(call)
         allowed, error_msg = check_permissions(chat_id, task, require_creator=False)
@@ -254,21 +258,13 @@ def view_report_attachments_callback(call: CallbackQuery) -> None:
             return
 
         bot.answer_callback_query(call.id, "Отправляю вложения...")
-        for attachment in task.report_attachments:
-            try:
-                if attachment['type'] == 'photo':
-                    bot.send_photo(call.message.chat.id, attachment['file_id'])
-                elif attachment['type'] == 'document':
-                    bot.send_document(call.message.chat.id, attachment['file_id'])
-            except Exception as e:
-                logger.error(f"Ошибка при отправке вложения: {e}")
+        send_attachments(call.message.chat.id, task.report_attachments)
 
     except (ValueError, ObjectDoesNotExist):
         bot.answer_callback_query(call.id, "Задача не найдена", show_alert=True)
 
-def task_comment_callback(call: CallbackQuery) -> None:
+def task_comment_callback(call: CallbackQuery, task_id: int) -> None:
     try:
-        task_id = int(call.data.split('_')[2])
         chat_id = str(call.message.chat.id)
         initiate_comment(chat_id, task_id)
         bot.answer_callback_query(call.id)
@@ -283,4 +279,4 @@ def clear_report_attachments_callback(call: CallbackQuery) -> None:
         user_state['report_text'] = ''
         set_user_state(chat_id, user_state)
         bot.answer_callback_query(call.id, "Отчет очищен")
-        bot.edit_message_text("❌ Данные отчета очищены. Отправьте новые или напишите текст отчета:", chat_id, call.message.message_id)
+        safe_edit_or_send_message(chat_id, "❌ Данные отчета очищены. Отправьте новые или напишите текст отчета:", message_id=call.message.message_id)
@@ -49,12 +49,11 @@ def show_role_selection_list(chat_id: str, user_state: dict, call: CallbackQuery
         bot.send_message(chat_id, text, reply_markup=markup, parse_mode='Markdown')
 
 
-def select_role_callback(call: CallbackQuery) -> None:
+def select_role_callback(call: CallbackQuery, role_id: int) -> None:
     """Обработчик выбора роли для задачи"""
     try:
         from bot.handlers.task_creation import create_task_from_state
         
-        role_id = int(call.data.split('_')[2])
         chat_id = get_chat_id_from_update(call)
         user_state = get_user_state(chat_id)
 
@@ -1,8 +1,9 @@
 from bot.handlers.utils import (
     get_or_create_user, get_chat_id_from_update, safe_edit_or_send_message, format_task_info,
-    check_permissions, show_task_progress, check_registration, send_task_notification
+    check_permissions, show_task_progress, check_registration, send_task_notification,
+    send_attachments, get_task_for_view, get_user
 )
-from bot.models import Task
+from bot.models import Task, Subtask
 
 
 def check_all_subtasks_completed(task: Task) -> tuple[bool, str]:
@@ -10,12 +11,11 @@ def check_all_subtasks_completed(task: Task) -> tuple[bool, str]:
     Проверяет, все ли подзадачи выполнены
     Возвращает (все_выполнены, сообщение_ошибки)
     """
-    subtasks = task.subtasks.all()
-    if not subtasks:
+    if not task.subtasks_total:
         return True, ""  # Если подзадач нет, то проверка пройдена
 
-    completed_count = subtasks.filter(is_completed=True).count()
-    total_count = subtasks.count()
+    completed_count = task.subtasks_done
+    total_count = task.subtasks_total
 
     if completed_count == total_count:
         return True, ""
@@ -24,7 +24,6 @@ def check_all_subtasks_completed(task: Task) -> tuple[bool, str]:
         return False, f"❌ Невозможно закрыть задачу! {incomplete_count} подзадач из {total_count} не выполнены."
 from bot.handlers.tasks import initiate_task_close
 from bot import bot, logger
-from bot.models import User, Task, Subtask
 from bot.keyboards import (
     get_task_actions_markup, get_subtask_toggle_markup,
     TASK_MANAGEMENT_MARKUP
@@ -34,14 +33,11 @@ from django.core.exceptions import ObjectDoesNotExist
 from django.utils import timezone
 
 
-def task_view_callback(call: CallbackQuery) -> None:
+def task_view_callback(call: CallbackQuery, task_id: int, view_type: str = 'assignee') -> None:
     if not check_registration(call):
         return
     try:
-        parts = call.data.split('_')
-        task_id = int(parts[2])
-        view_type = parts[3] if len(parts) > 3 else 'assignee'
-        task = Task.objects.get(id=task_id)
+        task = get_task_for_view(task_id)
         is_creator_view = view_type == 'creator'
         require_creator = is_creator_view
         chat_id = get_chat_id_from_update(call)
@@ -50,7 +46,7 @@ def task_view_callback(call: CallbackQuery) -> None:
             bot.answer_callback_query(call.id, error_msg, show_alert=True)
             return
         user = get_or_create_user(chat_id)
-        is_creator = task.creator.telegram_id == user.telegram_id
+        is_creator = task.creator_id == user.telegram_id
         # Исполнителем считается любой, кто имеет доступ (лично или через роль)
         is_assignee = task.has_access(user)
         show_task_progress(call.message.chat.id, task, is_creator, is_assignee, call.message.message_id)
@@ -60,31 +56,29 @@ def task_view_callback(call: CallbackQuery) -> None:
         bot.answer_callback_query(call.id, f"Ошибка: {e}", show_alert=True)
 
 
-def task_progress_callback(call: CallbackQuery) -> None:
+def task_progress_callback(call: CallbackQuery, task_id: int) -> None:
     if not check_registration(call):
         return
     try:
-        task_id = int(call.data.split('_')[2])
-        task = Task.objects.get(id=task_id)
+        task = get_task_for_view(task_id)
         chat_id = get_chat_id_from_update(call)
         allowed, error_msg = check_permissions(chat_id, task, require_creator=False)
         if not allowed:
             bot.answer_callback_query(call.id, error_msg, show_alert=True)
             return
         user = get_or_create_user(chat_id)
-        is_creator = task.creator.telegram_id == user.telegram_id
+        is_creator = task.creator_id == user.telegram_id
         is_assignee = task.has_access(user)
         show_task_progress(chat_id, task, is_creator, is_assignee, call.message.message_id)
     except (ValueError, ObjectDoesNotExist):
         bot.answer_callback_query(call.id, "Задача не найдена", show_alert=True)
 
 
-def task_complete_callback(call: CallbackQuery) -> None:
+def task_complete_callback(call: CallbackQuery, task_id: int) -> None:
     if not check_registration(call):
         return
     try:
-        task_id = int(call.data.split('_')[2])
-        task = Task.objects.get(id=task_id)
+        task = get_task_for_view(task_id)
         chat_id = get_chat_id_from_update(call)
         allowed, error_msg = check_permissions(chat_id, task, require_creator=False)
         if not allowed:
@@ -102,25 +96,25 @@ def task_complete_callback(call: CallbackQuery) -> None:
             return
 
         user = get_or_create_user(chat_id)
-        is_creator = task.creator.telegram_id == user.telegram_id
+        is_creator = task.creator_id == user.telegram_id
 
         if is_creator:
             # Если создатель завершает задачу напрямую
             task.status = 'completed'
             task.closed_at = timezone.now()
-            task.save()
+            task.save(update_fields=['status', 'closed_at'])
             text = f"✅ Задача '{task.title}' отмечена как выполненная!"
         else:
             # Если исполнитель отправляет на проверку
             task.status = 'pending_review'
-            task.save()
+            task.save(update_fields=['status'])
             text = f"📤 Задача '{task.title}' отправлена на проверку создателю"
 
             # Уведомляем создателя
             try:
-                creator_notification = f"📬 Ваша задача готова к проверке\n\n{format_task_info(task)}"
+                creator_notification = f"📬 Ваша задача готова к проверке\n\n{format_task_info(task, markdown=True)}"
                 markup = get_task_actions_markup(task.id, task.status, task.report_attachments, True, False)
-                send_task_notification(task.creator.telegram_id, creator_notification, reply_markup=markup)
+                send_task_notification(task.creator_id, creator_notification, reply_markup=markup, task=task)
             except Exception as e:
                 logger.error(f"Не удалось уведомить создателя задачи {task_id}: {e}")
 
@@ -138,12 +132,11 @@ def task_complete_callback(call: CallbackQuery) -> None:
         bot.answer_callback_query(call.id, "Задача не найдена", show_alert=True)
 
 
-def task_confirm_callback(call: CallbackQuery) -> None:
+def task_confirm_callback(call: CallbackQuery, task_id: int) -> None:
     if not check_registration(call):
         return
     try:
-        task_id = int(call.data.split('_')[2])
-        task = Task.objects.get(id=task_id)
+        task = get_task_for_view(task_id)
         chat_id = get_chat_id_from_update(call)
         allowed, error_msg = check_permissions(chat_id, task, require_creator=True)
         if not allowed:
@@ -156,21 +149,21 @@ def task_confirm_callback(call: CallbackQuery) -> None:
 
         task.status = 'completed'
         task.closed_at = timezone.now()
-        task.save()
+        task.save(update_fields=['status', 'closed_at'])
 
         # Логируем в историю
         from bot.handlers.utils import log_task_history
-        user = User.objects.get(telegram_id=chat_id)
+        user = get_user(chat_id)
         log_task_history(task, user, "Выполнение подтверждено создателем")
 
         text = f"✅ Задача '{task.title}' подтверждена и завершена!"
 
         # Уведомляем исполнителей
         try:
-            assignee_notification = f"🎉 Ваша задача подтверждена!\n\n{format_task_info(task)}"
+            assignee_notification = f"🎉 Ваша задача подтверждена!\n\n{format_task_info(task, markdown=True)}"
             for assignee in task.get_assignees():
                 if assignee.telegram_id != chat_id: # Не уведомляем того, кто подтвердил (хотя подтверждает создатель)
-                    send_task_notification(assignee.telegram_id, assignee_notification)
+                    send_task_notification(assignee.telegram_id, assignee_notification, task=task)
         except Exception as e:
             logger.error(f"Не удалось уведомить исполнителей задачи {task_id}: {e}")
 
@@ -180,12 +173,11 @@ def task_confirm_callback(call: CallbackQuery) -> None:
         bot.answer_callback_query(call.id, "Задача не найдена", show_alert=True)
 
 
-def task_reject_callback(call: CallbackQuery) -> None:
+def task_reject_callback(call: CallbackQuery, task_id: int) -> None:
     if not check_registration(call):
         return
     try:
-        task_id = int(call.data.split('_')[2])
-        task = Task.objects.get(id=task_id)
+        task = get_task_for_view(task_id)
         chat_id = get_chat_id_from_update(call)
         allowed, error_msg = check_permissions(chat_id, task, require_creator=True)
         if not allowed:
@@ -199,16 +191,16 @@ def task_reject_callback(call: CallbackQuery) -> None:
         task.status = 'active'
         task.report_text = None
         task.report_attachments.clear()
-        task.save()
+        task.save(update_fields=['status', 'report_text', 'report_attachments'])
 
         text = f"❌ Задача '{task.title}' возвращена на доработку"
 
         # Уведомляем исполнителей
         try:
-            assignee_notification = f"🔄 Ваша задача возвращена на доработку\n\n{format_task_info(task)}\n\n💬 Комментарий: Нужно доработать"
+            assignee_notification = f"🔄 Ваша задача возвращена на доработку\n\n{format_task_info(task, markdown=True)}\n\n💬 Комментарий: Нужно доработать"
             markup = get_task_actions_markup(task.id, task.status, task.report_attachments, False, True)
             for assignee in task.get_assignees():
-                send_task_notification(assignee.telegram_id, assignee_notification, reply_markup=markup)
+                send_task_notification(assignee.telegram_id, assignee_notification, reply_markup=markup, task=task)
         except Exception as e:
             logger.error(f"Не удалось уведомить исполнителей задачи {task_id}: {e}")
 
@@ -218,16 +210,16 @@ def task_reject_callback(call: CallbackQuery) -> None:
         bot.answer_callback_query(call.id, "Задача не найдена", show_alert=True)
 
 
-def subtask_toggle_callback(call: CallbackQuery) -> None:
+def subtask_toggle_callback(call: CallbackQuery, task_id: int, subtask_id: int) -> None:
     if not check_registration(call):
         return
     try:
-        parts = call.data.split('_')
-        task_id = int(parts[2])
-        subtask_id = int(parts[3])
-
-        task = Task.objects.get(id=task_id)
-        subtask = task.subtasks.get(id=subtask_id)
+        task = get_task_for_view(task_id)
+        # Берем подзадачу из уже загруженного списка: после переключения экран
+        # перерисовывается по тем же объектам без повторных запросов
+        subtask = next((s for s in task.subtasks.all() if s.id == subtask_id), None)
+        if subtask is None:
+            raise Subtask.DoesNotExist
 
         chat_id = get_chat_id_from_update(call)
         allowed, error_msg = check_permissions(chat_id, task, require_creator=False)
@@ -241,11 +233,11 @@ def subtask_toggle_callback(call: CallbackQuery) -> None:
             subtask.completed_at = timezone.now()
         else:
             subtask.completed_at = None
-        subtask.save()
+        subtask.save(update_fields=['is_completed', 'completed_at'])
 
         # Показываем обновленный вид задачи с прогрессом
         user = get_or_create_user(chat_id)
-        is_creator = task.creator.telegram_id == user.telegram_id
+        is_creator = task.creator_id == user.telegram_id
         is_assignee = task.has_access(user)
         show_task_progress(chat_id, task, is_creator, is_assignee, call.message.message_id)
 
@@ -257,11 +249,10 @@ def subtask_toggle_callback(call: CallbackQuery) -> None:
         bot.answer_callback_query(call.id, "Подзадача не найдена", show_alert=True)
 
 
-def task_delete_callback(call: CallbackQuery) -> None:
+def task_delete_callback(call: CallbackQuery, task_id: int) -> None:
     if not check_registration(call):
         return
     try:
-        task_id = int(call.data.split('_')[2])
         task = Task.objects.get(id=task_id)
         chat_id = get_chat_id_from_update(call)
         # Удаление может делать только создатель
@@ -289,11 +280,10 @@ def task_delete_callback(call: CallbackQuery) -> None:
         bot.answer_callback_query(call.id, "Произошла ошибка", show_alert=True)
 
 
-def confirm_delete_callback(call: CallbackQuery) -> None:
+def confirm_delete_callback(call: CallbackQuery, task_id: int) -> None:
     if not check_registration(call):
         return
     try:
-        task_id = int(call.data.split('_')[2])
         task = Task.objects.get(id=task_id)
         chat_id = get_chat_id_from_update(call)
         # Удаление может делать только создатель
@@ -325,12 +315,11 @@ def confirm_delete_callback(call: CallbackQuery) -> None:
         bot.answer_callback_query(call.id, "Произошла ошибка", show_alert=True)
 
 
-def task_status_callback(call: CallbackQuery) -> None:
+def task_status_callback(call: CallbackQuery, task_id: int) -> None:
     if not check_registration(call):
         return
     try:
-        task_id = int(call.data.split('_')[2])
-        task = Task.objects.get(id=task_id)
+        task = get_task_for_view(task_id)
         chat_id = get_chat_id_from_update(call)
         allowed, error_msg = check_permissions(chat_id, task, require_creator=False)
         if not allowed:
@@ -340,7 +329,7 @@ def task_status_callback(call: CallbackQuery) -> None:
         status_info = f"📊 Статус задачи\n\n{format_task_info(task, show_details=True)}"
 
         markup = get_task_actions_markup(task.id, task.status, task.report_attachments,
-                                       task.creator.telegram_id == chat_id,
+                                       task.creator_id == chat_id,
                                        task.has_access(get_or_create_user(chat_id)))
         safe_edit_or_send_message(call.message.chat.id, status_info, reply_markup=markup, message_id=call.message.message_id)
 
@@ -348,7 +337,7 @@ def task_status_callback(call: CallbackQuery) -> None:
         bot.answer_callback_query(call.id, "Задача не найдена", show_alert=True)
 
 
-def task_close_callback(call: CallbackQuery) -> None:
+def task_close_callback(call: CallbackQuery, task_id: int) -> None:
     """Обработчик нажатия кнопки 'Отправить на проверку'"""
     if not check_registration(call):
         return
@@ -356,18 +345,10 @@ def task_close_callback(call: CallbackQuery) -> None:
     logger.info(f"Callback data: {call.data}")
 
     try:
-        # Парсим task_id
-        parts = call.data.split('_')
-        if len(parts) < 3:
-            logger.error(f"Invalid callback data format: {call.data}")
-            bot.answer_callback_query(call.id, "❌ Неверный формат данных", show_alert=True)
-            return
-
-        task_id = int(parts[2])
         logger.info(f"Task ID: {task_id}")
 
         # Получаем задачу
-        task = Task.objects.get(id=task_id)
+        task = get_task_for_view(task_id)
         logger.info(f"Task found: {task.title}")
 
         # Получаем chat_id
@@ -435,10 +416,9 @@ def task_close_callback(call: CallbackQuery) -> None:
         logger.info("=== TASK_CLOSE_CALLBACK FAILED ===")
 
 
-def view_task_attachments_callback(call: CallbackQuery) -> None:
+def view_task_attachments_callback(call: CallbackQuery, task_id: int) -> None:
     """Обработчик просмотра вложений, добавленных при создании задачи"""
     try:
-        task_id = int(call.data.split('_')[3])
         task = Task.objects.get(id=task_id)
         chat_id = get_chat_id_from_update(call)
         
@@ -454,14 +434,7 @@ def view_task_attachments_callback(call: CallbackQuery) -> None:
         # Отправляем все вложения
         bot.answer_callback_query(call.id, f"Отправляю вложения ({len(task.attachments)} шт.)...")
         
-        for attachment in task.attachments:
-            try:
-                if attachment['type'] == 'photo':
-                    bot.send_photo(call.message.chat.id, attachment['file_id'])
-                elif attachment['type'] == 'document':
-                    bot.send_document(call.message.chat.id, attachment['file_id'])
-            except Exception as e:
-                logger.error(f"Ошибка при отправке вложения задачи {task.id}: {e}")
+        send_attachments(call.message.chat.id, task.attachments)
 
     except (ValueError, ObjectDoesNotExist, IndexError):
         bot.answer_callback_query(call.id, "Задача не найдена", show_alert=True)
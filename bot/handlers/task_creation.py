@@ -1,10 +1,11 @@
 from bot.handlers.utils import (
     get_or_create_user, get_chat_id_from_update, safe_edit_or_send_message, get_user_state,
     set_user_state, clear_user_state, check_permissions, format_task_info, parse_datetime_from_state,
-    send_task_notification
+    send_task_notification, get_user_page, get_task_for_view
 )
 from bot import bot, logger
-from bot.models import User, Task, Subtask
+from bot.formatting import escape_md
+from bot.models import User, Task
 from bot.keyboards import (
     get_user_selection_markup, TASK_MANAGEMENT_MARKUP, get_task_actions_markup
 )
@@ -62,29 +63,20 @@ def show_notification_selection_menu(chat_id: str, user_state: dict, call: Callb
         bot.send_message(chat_id, text, reply_markup=markup, parse_mode='Markdown')
 
 
-def select_notification_interval_callback(call: CallbackQuery) -> None:
-    """Обработчик выбора интервала уведомлений"""
+def select_notification_interval_callback(call: CallbackQuery, interval: int = None) -> None:
+    """Обработчик выбора интервала уведомлений (None - без оповещений)"""
     chat_id = get_chat_id_from_update(call)
     user_state = get_user_state(chat_id)
     if user_state:
-        data = call.data
-        if data == "set_notify_none":
-            interval = None
-        else:
-            try:
-                interval = int(data.split('_')[2])
-            except (IndexError, ValueError):
-                interval = None
-        
         user_state['notification_interval'] = interval
         
         # Если это редактирование существующей задачи
         if user_state.get('editing_field') == 'notification_interval' and 'editing_task_id' in user_state:
             try:
                 task_id = user_state['editing_task_id']
-                task = Task.objects.get(id=task_id)
+                task = get_task_for_view(task_id)
                 task.notification_interval = interval
-                task.save()
+                task.save(update_fields=['notification_interval'])
                 
                 from bot.handlers.utils import clear_user_state
                 clear_user_state(chat_id)
@@ -114,9 +106,9 @@ def skip_notification_interval_callback(call: CallbackQuery) -> None:
         if user_state.get('editing_field') == 'notification_interval' and 'editing_task_id' in user_state:
             try:
                 task_id = user_state['editing_task_id']
-                task = Task.objects.get(id=task_id)
+                task = get_task_for_view(task_id)
                 task.notification_interval = None
-                task.save()
+                task.save(update_fields=['notification_interval'])
                 
                 from bot.handlers.utils import clear_user_state
                 clear_user_state(chat_id)
@@ -203,17 +195,37 @@ def show_subtasks_menu(chat_id: str, user_state: dict, call: CallbackQuery = Non
 
 
 def show_user_selection_list(chat_id: str, user_state: dict, call: CallbackQuery = None) -> None:
-    """Показывает список всех пользователей с пагинацией"""
-    text = f"👤 Выберите исполнителя для задачи '{user_state.get('title', '')}'\n\n"
-    text += "Выберите пользователя из списка:"
+    """Показывает первую страницу списка пользователей (поиск сбрасывается)"""
+    if user_state.pop('user_search', None) is not None:
+        set_user_state(chat_id, user_state)
+    show_user_selection_page(chat_id, call.message.message_id if call else None, user_state=user_state)
 
-    users = list(User.objects.all())
-    markup = get_user_selection_markup(users)
 
-    if call:
-        safe_edit_or_send_message(chat_id, text, reply_markup=markup, message_id=call.message.message_id, parse_mode='Markdown')
+def show_user_selection_page(chat_id: str, message_id: int = None, after: str = None, before: str = None,
+                             user_state: dict = None) -> None:
+    """Страница выбора исполнителя: при создании задачи и при смене исполнителя"""
+    if user_state is None:
+        user_state = get_user_state(chat_id)
+    search = user_state.get('user_search')
+    users, has_prev, has_next = get_user_page(after=after, before=before, search=search)
+
+    editing = user_state.get('editing_field') == 'assignee' and 'editing_task_id' in user_state
+    if editing:
+        title = user_state.get('editing_task_title', '')
+        text = f"👤 Выберите нового исполнителя для задачи '{escape_md(title)}':"
     else:
-        bot.send_message(chat_id, text, reply_markup=markup)
+        text = f"👤 Выберите исполнителя для задачи '{escape_md(user_state.get('title', ''))}'\n\n"
+        text += "Выберите пользователя из списка:"
+    if search:
+        text += f"\n\n🔍 Поиск: {escape_md(search)}"
+        if not users:
+            text += "\nНикого не найдено"
+
+    markup = get_user_selection_markup(users, has_prev, has_next, search)
+    if editing:
+        markup.add(InlineKeyboardButton("⬅️ Назад к редактированию", callback_data=f"task_edit_{user_state['editing_task_id']}"))
+
+    safe_edit_or_send_message(chat_id, text, reply_markup=markup, message_id=message_id, parse_mode='Markdown')
 
 
 def create_task_from_state(chat_id: str, user_state: dict, message_id: int = None) -> tuple[bool, str, InlineKeyboardMarkup]:
@@ -253,11 +265,7 @@ def create_task_from_state(chat_id: str, user_state: dict, message_id: int = Non
 
             # Создаем подзадачи, если они были добавлены
             subtasks = user_state.get('subtasks', [])
-            for subtask_title in subtasks:
-                Subtask.objects.create(
-                    task=task,
-                    title=subtask_title
-                )
+            task.add_subtasks(subtasks)
             # Логируем создание в историю
             from bot.handlers.utils import log_task_history
             log_task_history(task, creator, "Задача создана")
@@ -285,17 +293,19 @@ def create_task_from_state(chat_id: str, user_state: dict, message_id: int = Non
                 for user in assignees:
                     if user.telegram_id != creator.telegram_id:
                         try:
-                            notification_text = f"📋 **Вам назначена новая задача (роль: {assigned_role.name})**\n\n{format_task_info(task)}"
+                            notification_text = f"📋 **Вам назначена новая задача** (роль: {escape_md(assigned_role.name)})\n\n{format_task_info(task, markdown=True)}"
                             markup = get_task_actions_markup(task.id, task.status, task.report_attachments, False, True)
-                            send_task_notification(user.telegram_id, notification_text, reply_markup=markup, parse_mode='Markdown')
+                            send_task_notification(user.telegram_id, notification_text, reply_markup=markup, parse_mode='Markdown',
+                                                   idempotency_key=f"task_created:{task.id}:{user.telegram_id}", task=task)
                         except Exception as e:
                             logger.error(f"Не удалось уведомить пользователя {user.telegram_id} о новой задаче: {e}")
             elif assignee and creator.telegram_id != assignee.telegram_id:
                 # Уведомляем конкретного исполнителя, если это не создатель
                 try:
-                    notification_text = f"📋 **Вам назначена новая задача**\n\n{format_task_info(task)}"
+                    notification_text = f"📋 **Вам назначена новая задача**\n\n{format_task_info(task, markdown=True)}"
                     markup = get_task_actions_markup(task.id, task.status, task.report_attachments, False, True)
-                    send_task_notification(assignee.telegram_id, notification_text, reply_markup=markup, parse_mode='Markdown')
+                    send_task_notification(assignee.telegram_id, notification_text, reply_markup=markup, parse_mode='Markdown',
+                                           idempotency_key=f"task_created:{task.id}:{assignee.telegram_id}", task=task)
                 except Exception as e:
                     logger.error(f"Не удалось уведомить исполнителя {assignee.telegram_id} о новой задаче: {e}")
 
@@ -356,22 +366,14 @@ def handle_task_creation_messages(message: Message) -> None:
                     return
 
                 # Создаем подзадачи
-                from bot.models import Subtask
-                created_count = 0
-                for subtask_title in subtasks:
-                    if len(subtask_title) > 3:  # Минимум 3 символа для названия
-                        Subtask.objects.create(
-                            task=task,
-                            title=subtask_title
-                        )
-                        created_count += 1
+                created_count = len(task.add_subtasks(
+                    subtask_title for subtask_title in subtasks
+                    if len(subtask_title) > 3  # Минимум 3 символа для названия
+                ))
 
-                # Очищаем состояние
+                # Очищаем состояние (счетчики подзадач обновляются при их создании)
                 clear_user_state(chat_id)
 
-                # Обновляем прогресс задачи
-                task.update_progress()
-
                 text = f"➡️ Добавлено {created_count} подзадач к задаче '{task.title}'"
                 bot.send_message(message.chat.id, text, reply_markup=TASK_MANAGEMENT_MARKUP)
 
@@ -389,17 +391,17 @@ def handle_task_creation_messages(message: Message) -> None:
             task_id = user_state['editing_task_id']
             field = user_state.get('editing_field')
             try:
-                task = Task.objects.get(id=task_id)
+                task = get_task_for_view(task_id)
                 if field == 'title':
                     if len(message.text.strip()) < 3:
                         bot.send_message(message.chat.id, "❌ Название задачи должно содержать минимум 3 символа")
                         return
                     task.title = message.text.strip()
-                    task.save()
+                    task.save(update_fields=['title'])
                     bot.send_message(message.chat.id, f"✅ Название задачи #{task_id} изменено")
                 elif field == 'description':
                     task.description = message.text.strip()
-                    task.save()
+                    task.save(update_fields=['description'])
                     bot.send_message(message.chat.id, f"✅ Описание задачи #{task_id} изменено")
                 
                 # Очищаем состояние
@@ -407,8 +409,8 @@ def handle_task_creation_messages(message: Message) -> None:
                 
                 # Показываем обновленную информацию о задаче
                 from bot.handlers.utils import show_task_progress
-                is_creator = str(task.creator.telegram_id) == str(chat_id)
-                is_assignee = str(task.assignee.telegram_id) == str(chat_id)
+                is_creator = str(task.creator_id) == str(chat_id)
+                is_assignee = str(task.assignee_id) == str(chat_id)
                 show_task_progress(chat_id, task, is_creator, is_assignee)
                 return
             except Task.DoesNotExist:
@@ -681,40 +683,67 @@ def choose_assignee_callback(call: CallbackQuery) -> None:
         show_assignee_selection_menu(chat_id, user_state, call)
 
 
-def user_page_callback(call: CallbackQuery) -> None:
-    try:
-        page = int(call.data.split('_')[2])
-        show_user_selection_page(call, page)
-    except (ValueError, IndexError):
-        bot.answer_callback_query(call.id, "Ошибка навигации", show_alert=True)
-
-
-def show_user_selection_page(call: CallbackQuery, page: int, users_per_page: int = 5) -> None:
-    users = list(User.objects.all())
-    markup = get_user_selection_markup(users, page, users_per_page)
-    # Проверяем тип users - если это QuerySet, используем count(), иначе len()
-    if hasattr(users, 'count') and not isinstance(users, list):
-        try:
-            total_users = users.count()
-        except (TypeError, AttributeError):
-            total_users = len(users)
+def user_next_callback(call: CallbackQuery, after_telegram_id: str) -> None:
+    show_user_selection_page(get_chat_id_from_update(call), call.message.message_id, after=after_telegram_id)
+
+
+def user_prev_callback(call: CallbackQuery, before_telegram_id: str) -> None:
+    show_user_selection_page(get_chat_id_from_update(call), call.message.message_id, before=before_telegram_id)
+
+
+def user_search_callback(call: CallbackQuery) -> None:
+    """Переводит выбор исполнителя в режим поиска: следующее сообщение - начало имени"""
+    chat_id = get_chat_id_from_update(call)
+    user_state = get_user_state(chat_id)
+    if user_state.get('state') != 'waiting_user_search':
+        user_state['user_search_return_state'] = user_state.get('state') or ''
+    user_state['state'] = 'waiting_user_search'
+    set_user_state(chat_id, user_state)
+
+    markup = InlineKeyboardMarkup()
+    markup.add(InlineKeyboardButton("⬅️ Отмена", callback_data="user_search_reset"))
+    safe_edit_or_send_message(chat_id, "🔍 Введите начало имени, фамилии или username пользователя:", reply_markup=markup,
+                              message_id=call.message.message_id)
+
+
+def _finish_user_search(chat_id: str, search: str = None) -> dict:
+    user_state = get_user_state(chat_id)
+    if user_state.get('state') == 'waiting_user_search':
+        user_state['state'] = user_state.pop('user_search_return_state', '')
+    if search:
+        user_state['user_search'] = search
     else:
-        total_users = len(users)
-    total_pages = (total_users + users_per_page - 1) // users_per_page if total_users > 0 else 1
-    text = f"👤 Выберите исполнителя (страница {page + 1} из {total_pages}):"
-    safe_edit_or_send_message(call.message.chat.id, text, reply_markup=markup, message_id=call.message.message_id, parse_mode='Markdown')
+        user_state.pop('user_search', None)
+    set_user_state(chat_id, user_state)
+    return user_state
 
 
-def select_user_callback(call: CallbackQuery) -> None:
+def user_search_reset_callback(call: CallbackQuery) -> None:
+    chat_id = get_chat_id_from_update(call)
+    user_state = _finish_user_search(chat_id)
+    show_user_selection_page(chat_id, call.message.message_id, user_state=user_state)
+
+
+def handle_user_search_input(message: Message) -> None:
+    """Обрабатывает введенное начало имени и показывает найденных пользователей"""
+    chat_id = str(message.chat.id)
+    search = (message.text or '').strip()[:100]
+    if not search:
+        bot.send_message(chat_id, "❌ Введите начало имени текстом")
+        return
+    user_state = _finish_user_search(chat_id, search)
+    show_user_selection_page(chat_id, user_state=user_state)
+
+
+def select_user_callback(call: CallbackQuery, assignee_telegram_id: str) -> None:
     try:
-        assignee_telegram_id = call.data.split('_')[2]
         chat_id = get_chat_id_from_update(call)
         user_state = get_user_state(chat_id)
 
         if user_state:
             if user_state.get('editing_field') == 'assignee' and 'editing_task_id' in user_state:
                 task_id = user_state['editing_task_id']
-                task = Task.objects.get(id=task_id)
+                task = get_task_for_view(task_id)
                 new_assignee = User.objects.get(telegram_id=assignee_telegram_id)
                 old_assignee = task.assignee
                 
@@ -724,16 +753,17 @@ def select_user_callback(call: CallbackQuery) -> None:
                 
                 task.assignee = new_assignee
                 try:
-                    task.save()
+                    task.save(update_fields=['assignee'])
                 except ValidationError as ve:
                     bot.answer_callback_query(call.id, f"❌ Ошибка валидации: {ve.message}", show_alert=True)
                     return
                 
                 # Уведомляем нового исполнителя
                 try:
-                    notification_text = f"📋 **Вам назначена задача**\n\n{format_task_info(task)}"
+                    notification_text = f"📋 **Вам назначена задача**\n\n{format_task_info(task, markdown=True)}"
                     markup = get_task_actions_markup(task.id, task.status, task.report_attachments, False, True)
-                    send_task_notification(new_assignee.telegram_id, notification_text, reply_markup=markup, parse_mode='Markdown')
+                    send_task_notification(new_assignee.telegram_id, notification_text, reply_markup=markup, parse_mode='Markdown',
+                                           task=task)
                 except Exception as e:
                     logger.error(f"Не удалось уведомить исполнителя {new_assignee.telegram_id}: {e}")
                 
@@ -743,8 +773,8 @@ def select_user_callback(call: CallbackQuery) -> None:
                 
                 # Показываем обновленную информацию о задаче
                 from bot.handlers.utils import show_task_progress
-                is_creator = str(task.creator.telegram_id) == str(chat_id)
-                is_assignee = str(task.assignee.telegram_id) == str(chat_id)
+                is_creator = str(task.creator_id) == str(chat_id)
+                is_assignee = str(task.assignee_id) == str(chat_id)
                 show_task_progress(chat_id, task, is_creator, is_assignee)
                 return
 
@@ -839,17 +869,15 @@ def actually_cancel_task_callback(call: CallbackQuery) -> None:
     text = "❌ Создание задачи отменено"
     safe_edit_or_send_message(chat_id, text, reply_markup=TASK_MANAGEMENT_MARKUP, message_id=call.message.message_id, parse_mode='Markdown')
 
-def resume_task_callback(call: CallbackQuery) -> None:
+def resume_task_callback(call: CallbackQuery, state: str) -> None:
     """Возврат к созданию задачи после нажатия 'Нет' в подтверждении отмены"""
     chat_id = get_chat_id_from_update(call)
     user_state = get_user_state(chat_id)
     if not user_state:
         # Если вдруг состояние потерялось, возвращаем в меню
-        bot.edit_message_text("❌ Ошибка: сессия истекла", chat_id, call.message.message_id, reply_markup=TASK_MANAGEMENT_MARKUP)
+        safe_edit_or_send_message(chat_id, "❌ Ошибка: сессия истекла", reply_markup=TASK_MANAGEMENT_MARKUP, message_id=call.message.message_id)
         return
         
-    state = call.data.replace('resume_task_', '')
-    
     if state == 'waiting_task_title':
         # Возврат к началу (ввод названия)
         from bot.handlers.tasks import create_task_command_logic
@@ -1,11 +1,11 @@
 from bot.handlers.utils import (
     get_or_create_user, get_chat_id_from_update, safe_edit_or_send_message, format_task_info,
-    check_permissions, check_registration
+    check_permissions, check_registration, send_task_notification, get_task_for_view
 )
 from bot import bot, logger
 from bot.models import User, Task
 from bot.keyboards import (
-    get_task_actions_markup, get_user_selection_markup,
+    get_task_actions_markup,
     TASK_MANAGEMENT_MARKUP
 )
 from telebot.types import CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
@@ -31,12 +31,11 @@ def show_task_edit_menu(call: CallbackQuery, task: Task) -> None:
     safe_edit_or_send_message(call.message.chat.id, text, reply_markup=markup, message_id=call.message.message_id)
 
 
-def task_edit_callback(call: CallbackQuery) -> None:
+def task_edit_callback(call: CallbackQuery, task_id: int) -> None:
     if not check_registration(call):
         return
     try:
-        task_id = int(call.data.split('_')[2])
-        task = Task.objects.get(id=task_id)
+        task = get_task_for_view(task_id)
         chat_id = get_chat_id_from_update(call)
         allowed, error_msg = check_permissions(chat_id, task, require_creator=False)
         if not allowed:
@@ -49,9 +48,8 @@ def task_edit_callback(call: CallbackQuery) -> None:
         bot.answer_callback_query(call.id, "Задача не найдена", show_alert=True)
 
 
-def edit_title_callback(call: CallbackQuery) -> None:
+def edit_title_callback(call: CallbackQuery, task_id: int) -> None:
     try:
-        task_id = int(call.data.split('_')[2])
         task = Task.objects.get(id=task_id)
         chat_id = get_chat_id_from_update(call)
         allowed, error_msg = check_permissions(chat_id, task, require_creator=False)
@@ -74,9 +72,8 @@ def edit_title_callback(call: CallbackQuery) -> None:
         bot.answer_callback_query(call.id, "Задача не найдена", show_alert=True)
 
 
-def edit_description_callback(call: CallbackQuery) -> None:
+def edit_description_callback(call: CallbackQuery, task_id: int) -> None:
     try:
-        task_id = int(call.data.split('_')[2])
         task = Task.objects.get(id=task_id)
         chat_id = get_chat_id_from_update(call)
         allowed, error_msg = check_permissions(chat_id, task, require_creator=False)
@@ -100,9 +97,8 @@ def edit_description_callback(call: CallbackQuery) -> None:
         bot.answer_callback_query(call.id, "Задача не найдена", show_alert=True)
 
 
-def edit_assignee_callback(call: CallbackQuery) -> None:
+def edit_assignee_callback(call: CallbackQuery, task_id: int) -> None:
     try:
-        task_id = int(call.data.split('_')[2])
         task = Task.objects.get(id=task_id)
         chat_id = get_chat_id_from_update(call)
         allowed, error_msg = check_permissions(chat_id, task, require_creator=False)
@@ -112,55 +108,24 @@ def edit_assignee_callback(call: CallbackQuery) -> None:
 
         from bot.handlers.utils import get_user_state, set_user_state
         user_state = get_user_state(chat_id)
-        user_state.update({'editing_task_id': task_id, 'editing_field': 'assignee'})
+        user_state.update({'editing_task_id': task_id, 'editing_field': 'assignee', 'editing_task_title': task.title})
+        user_state.pop('user_search', None)
         set_user_state(chat_id, user_state)
-        show_assignee_selection_page(call, task, 0)
+        show_assignee_selection_page(call, user_state)
 
     except (ValueError, ObjectDoesNotExist):
         bot.answer_callback_query(call.id, "Задача не найдена", show_alert=True)
 
 
-def show_assignee_selection_page(call: CallbackQuery, task: Task, page: int, users_per_page: int = 5) -> None:
-    users = list(User.objects.all())
-    markup = get_user_selection_markup(users, page, users_per_page)
-
-    # Добавляем кнопку "Назад к редактированию"
-    back_button = InlineKeyboardButton("⬅️ Назад к редактированию", callback_data=f"task_edit_{task.id}")
-    if markup.keyboard and len(markup.keyboard) > 0:
-        markup.keyboard.append([back_button])
-    else:
-        markup.add(back_button)
-
-    text = f"👤 Выберите нового исполнителя для задачи '{task.title}' (страница {page + 1}):"
-    safe_edit_or_send_message(call.message.chat.id, text, reply_markup=markup, message_id=call.message.message_id)
+def show_assignee_selection_page(call: CallbackQuery, user_state: dict) -> None:
+    """Первая страница выбора нового исполнителя (листание и поиск - в task_creation)"""
+    from bot.handlers.task_creation import show_user_selection_page
+    show_user_selection_page(get_chat_id_from_update(call), call.message.message_id, user_state=user_state)
 
 
-def assignee_page_callback(call: CallbackQuery) -> None:
+def change_assignee_callback(call: CallbackQuery, task_id: int, new_assignee_telegram_id: str) -> None:
     try:
-        parts = call.data.split('_')
-        task_id = int(parts[2])
-        page = int(parts[3])
-
-        task = Task.objects.get(id=task_id)
-        chat_id = get_chat_id_from_update(call)
-        allowed, error_msg = check_permissions(chat_id, task, require_creator=False)
-        if not allowed:
-            bot.answer_callback_query(call.id, error_msg, show_alert=True)
-            return
-
-        show_assignee_selection_page(call, task, page)
-
-    except (ValueError, ObjectDoesNotExist):
-        bot.answer_callback_query(call.id, "Задача не найдена", show_alert=True)
-
-
-def change_assignee_callback(call: CallbackQuery) -> None:
-    try:
-        parts = call.data.split('_')
-        task_id = int(parts[2])
-        new_assignee_telegram_id = parts[3]
-
-        task = Task.objects.get(id=task_id)
+        task = get_task_for_view(task_id)
         chat_id = get_chat_id_from_update(call)
         allowed, error_msg = check_permissions(chat_id, task, require_creator=False)
         if not allowed:
@@ -176,13 +141,14 @@ def change_assignee_callback(call: CallbackQuery) -> None:
         old_assignee = task.assignee
         new_assignee = User.objects.get(telegram_id=new_assignee_telegram_id)
         task.assignee = new_assignee
-        task.save()
+        task.save(update_fields=['assignee'])
 
         # Уведомляем нового исполнителя
         try:
-            notification_text = f"📋 **Вам назначена задача**\n\n{format_task_info(task)}"
+            notification_text = f"📋 **Вам назначена задача**\n\n{format_task_info(task, markdown=True)}"
             markup = get_task_actions_markup(task.id, task.status, task.report_attachments, False, True)
-            safe_edit_or_send_message(new_assignee.telegram_id, notification_text, reply_markup=markup, parse_mode='Markdown')
+            send_task_notification(new_assignee.telegram_id, notification_text, reply_markup=markup, parse_mode='Markdown',
+                                   task=task)
         except Exception as e:
             logger.error(f"Failed to notify new assignee {new_assignee.telegram_id}: {e}")
 
@@ -196,9 +162,8 @@ def change_assignee_callback(call: CallbackQuery) -> None:
         bot.answer_callback_query(call.id, "Ошибка при смене исполнителя", show_alert=True)
 
 
-def edit_due_date_callback(call: CallbackQuery) -> None:
+def edit_due_date_callback(call: CallbackQuery, task_id: int) -> None:
     try:
-        task_id = int(call.data.split('_')[2])
         task = Task.objects.get(id=task_id)
         chat_id = get_chat_id_from_update(call)
         allowed, error_msg = check_permissions(chat_id, task, require_creator=False)
@@ -214,9 +179,8 @@ def edit_due_date_callback(call: CallbackQuery) -> None:
         bot.answer_callback_query(call.id, "Задача не найдена", show_alert=True)
 
 
-def edit_notification_interval_callback(call: CallbackQuery) -> None:
+def edit_notification_interval_callback(call: CallbackQuery, task_id: int) -> None:
     try:
-        task_id = int(call.data.split('_')[2])
         task = Task.objects.get(id=task_id)
         chat_id = get_chat_id_from_update(call)
         allowed, error_msg = check_permissions(chat_id, task, require_creator=False)
@@ -235,9 +199,8 @@ def edit_notification_interval_callback(call: CallbackQuery) -> None:
         bot.answer_callback_query(call.id, "Задача не найдена", show_alert=True)
 
 
-def add_subtasks_callback(call: CallbackQuery) -> None:
+def add_subtasks_callback(call: CallbackQuery, task_id: int) -> None:
     try:
-        task_id = int(call.data.split('_')[2])
         task = Task.objects.get(id=task_id)
         chat_id = get_chat_id_from_update(call)
         allowed, error_msg = check_permissions(chat_id, task, require_creator=False)
@@ -269,10 +232,9 @@ def add_subtasks_callback(call: CallbackQuery) -> None:
         bot.answer_callback_query(call.id, "Произошла ошибка", show_alert=True)
 
 
-def reopen_task_callback(call: CallbackQuery) -> None:
+def reopen_task_callback(call: CallbackQuery, task_id: int) -> None:
     try:
-        task_id = int(call.data.split('_')[2])
-        task = Task.objects.get(id=task_id)
+        task = get_task_for_view(task_id)
         chat_id = get_chat_id_from_update(call)
         allowed, error_msg = check_permissions(chat_id, task, require_creator=False)
         if not allowed:
@@ -286,7 +248,7 @@ def reopen_task_callback(call: CallbackQuery) -> None:
         # Меняем статус задачи на active и очищаем дату закрытия
         task.status = 'active'
         task.closed_at = None
-        task.save()
+        task.save(update_fields=['status', 'closed_at'])
 
         text = f"✅ Задача '{task.title}' снова стала активной и доступной для редактирования"
         safe_edit_or_send_message(call.message.chat.id, text, reply_markup=TASK_MANAGEMENT_MARKUP, message_id=call.message.message_id)
@@ -296,9 +258,11 @@ def reopen_task_callback(call: CallbackQuery) -> None:
         for assignee in assignees:
             if assignee.telegram_id != chat_id:
                 try:
-                    bot.send_message(
+                    send_task_notification(
                         assignee.telegram_id,
-                        f"🔄 Задача снова активна\n\n{format_task_info(task)}\n\nЗадача была возобновлена."
+                        f"🔄 Задача снова активна\n\n{format_task_info(task)}\n\nЗадача была возобновлена.",
+                        parse_mode=None,
+                        task=task
                     )
                 except Exception as e:
                     logger.error(f"Не удалось уведомить исполнителя {assignee.user_name} задачи {task_id}: {e}")
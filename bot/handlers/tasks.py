@@ -4,13 +4,13 @@ from bot import bot, logger
 from bot.models import User, Task, Subtask, UserState
 from bot.keyboards import (
     get_task_actions_markup, get_task_confirmation_markup,
-    get_subtask_toggle_markup, get_tasks_list_markup, get_user_selection_markup,
-    TASK_MANAGEMENT_MARKUP, UNIVERSAL_BUTTONS, main_markup, get_main_menu
+    get_subtask_toggle_markup, get_user_selection_markup,
+    TASK_MANAGEMENT_MARKUP, main_markup, get_main_menu
 )
 from bot.handlers.utils import (
     get_or_create_user, get_chat_id_from_update, safe_edit_or_send_message, get_user_state,
     set_user_state, clear_user_state, check_permissions, format_task_info, show_task_progress,
-    check_registration
+    check_registration, show_task_list
 )
 from telebot.types import (
     Message,
@@ -51,29 +51,7 @@ def my_created_tasks_callback(call: CallbackQuery) -> None:
         logger.info("User not in my tasks section, loading tasks...")
         chat_id = get_chat_id_from_update(call)
         user = get_or_create_user(chat_id)
-        created_tasks = Task.objects.filter(creator=user).order_by('-created_at')
-
-        if not created_tasks:
-            logger.info("No tasks found, editing message")
-            bot.edit_message_text(
-                chat_id=call.message.chat.id,
-                text="📋 Вы еще не создали ни одной задачи",
-                reply_markup=UNIVERSAL_BUTTONS,
-                message_id=call.message.message_id
-            )
-            return
-
-        text = f"📋 ЗАДАЧИ, СОЗДАННЫЕ ВАМИ\n\n"
-        markup = get_tasks_list_markup(created_tasks, is_creator_view=True)
-
-        logger.info("Editing message with tasks list")
-        bot.edit_message_text(
-            chat_id=call.message.chat.id,
-            text=text,
-            reply_markup=markup,
-            message_id=call.message.message_id
-        )
-        logger.info("Message edited successfully")
+        show_task_list(chat_id, user, 'creator', message_id=call.message.message_id)
 
     except Exception as e:
         logger.error(f"Error in my_created_tasks_callback: {e}")
@@ -88,25 +66,9 @@ def my_created_tasks_command_logic(update) -> None:
         return
     chat_id = get_chat_id_from_update(update)
     user = get_or_create_user(chat_id)
-    created_tasks = Task.objects.filter(creator=user).order_by('-created_at')
-    if not created_tasks:
-        text = "📋 Вы еще не создали ни одной задачи"
-        markup = UNIVERSAL_BUTTONS
-    else:
-        text = f"📋 ЗАДАЧИ, СОЗДАННЫЕ ВАМИ\n\n"
-        markup = get_tasks_list_markup(created_tasks, is_creator_view=True)
-
-    # Если это callback (есть message в update), редактируем сообщение
-    if hasattr(update, 'message') and hasattr(update.message, 'message_id'):
-        safe_edit_or_send_message(
-            chat_id=chat_id,
-            text=text,
-            reply_markup=markup,
-            message_id=update.message.message_id
-        )
-    else:
-        # Если это команда, отправляем новое сообщение
-        safe_edit_or_send_message(chat_id, text, reply_markup=markup)
+    # Если это callback (есть message в update), редактируем сообщение, иначе отправляем новое
+    message_id = update.message.message_id if hasattr(update, 'message') and hasattr(update.message, 'message_id') else None
+    show_task_list(chat_id, user, 'creator', message_id=message_id)
 def create_task_command_logic(update) -> None:
     if not check_registration(update):
         return
@@ -155,11 +117,11 @@ def initiate_task_close(chat_id: str, task: Task, message_id: int = None) -> Non
             safe_edit_or_send_message(chat_id, error_msg, message_id=message_id)
             return
 
-        if task.creator.telegram_id == task.assignee.telegram_id:
+        if task.creator_id == task.assignee_id:
             # Создатель и исполнитель - один человек, закрываем задачу сразу
             task.status = 'completed'
             task.closed_at = timezone.now()
-            task.save()
+            task.save(update_fields=['status', 'closed_at'])
 
             try:
                 from bot.schedulers import unschedule_task_reminder
@@ -172,7 +134,7 @@ def initiate_task_close(chat_id: str, task: Task, message_id: int = None) -> Non
             safe_edit_or_send_message(chat_id, text, reply_markup=get_main_menu(user), message_id=message_id)
         else:
             # Отправляем запрос на отчет
-            text = f"📄 **Отправка отчета по задаче**\n\n{format_task_info(task)}\n\n"
+            text = f"📄 **Отправка отчета по задаче**\n\n{format_task_info(task, markdown=True)}\n\n"
             text += "Опишите что было сделано (минимум 10 символов) или прикрепите фото/файлы:"
 
             markup = InlineKeyboardMarkup()
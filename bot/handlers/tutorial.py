@@ -1,5 +1,6 @@
 from bot.handlers.utils import (
-    get_or_create_user, safe_edit_or_send_message, set_user_state, get_user_state, clear_user_state
+    get_or_create_user, safe_edit_or_send_message, set_user_state, get_user_state, clear_user_state,
+    get_user
 )
 from bot import bot, logger
 from bot.keyboards import main_markup, TASK_MANAGEMENT_MARKUP
@@ -25,10 +26,7 @@ def start_tutorial(chat_id: str, message_id: int = None) -> None:
         'is_tutorial': True
     })
     
-    if message_id:
-        bot.edit_message_text(text, chat_id, message_id, reply_markup=markup, parse_mode='Markdown')
-    else:
-        bot.send_message(chat_id, text, reply_markup=markup, parse_mode='Markdown')
+    safe_edit_or_send_message(chat_id, text, reply_markup=markup, message_id=message_id, parse_mode='Markdown')
 
 def tutorial_task_created(chat_id: str, task_id: int, message_id: int = None) -> None:
     text = f"""✨ **Ура! Твоя первая задача создана.**
@@ -62,11 +60,10 @@ def finish_tutorial(chat_id: str, message_id: int = None) -> None:
 
 Если возникнут вопросы — я всегда рядом. Удачи в делах! 🚀"""
     
-    from bot.models import User
     try:
-        user = User.objects.get(telegram_id=chat_id)
+        user = get_user(chat_id)
         user.is_tutorial_finished = True
-        user.save()
+        user.save(update_fields=['is_tutorial_finished'])
     except Exception as e:
         logger.error(f"Error marking tutorial as finished: {e}")
 
@@ -79,11 +76,10 @@ def start_tutorial_callback(call: CallbackQuery) -> None:
 
 def skip_tutorial_callback(call: CallbackQuery) -> None:
     chat_id = str(call.message.chat.id)
-    from bot.models import User
     try:
-        user = User.objects.get(telegram_id=chat_id)
+        user = get_user(chat_id)
         user.is_tutorial_finished = True
-        user.save()
+        user.save(update_fields=['is_tutorial_finished'])
     except Exception as e:
         logger.error(f"Error skipping tutorial: {e}")
     
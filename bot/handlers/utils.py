@@ -1,9 +1,22 @@
 import os
+import re
+import copy
 import json
+import hashlib
+import threading
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from django.utils import timezone
 from bot import bot, logger
-from bot.models import User, Task, Subtask, UserState
+from bot.models import User, Task, Subtask, UserState, TaskComment
+from bot.sender import outbound
+from bot.outbox import queue_notification
+from bot.context import get_context
+from bot.state_store import state_store
+from bot.role_cache import get_user_role_ids
+from bot import task_list_cache
+from bot.timezones import get_snapshot
+from bot.formatting import escape_md, safe_parse_mode
 from telebot.apihelper import ApiTelegramException
 from bot.keyboards import (
     get_task_actions_markup, get_task_confirmation_markup,
@@ -15,15 +28,72 @@ from telebot.types import (
     InlineKeyboardButton,
     InlineKeyboardMarkup,
     CallbackQuery,
+    InputMediaPhoto,
+    InputMediaDocument,
 )
+from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
-from django.db import transaction
+from django.db import connection, transaction
+from django.db.models import F, Prefetch, Q, Subquery
 
 
-def safe_edit_or_send_message(chat_id: str, text: str, reply_markup=None, message_id=None, parse_mode=None) -> None:
-    """Безопасно редактирует сообщение или отправляет новое при ошибке"""
+class MessageRenderCache:
+    """
+    Отпечатки последнего отрисованного содержимого сообщений бота: (chat_id, message_id) ->
+    (хэш текста, хэш клавиатуры). Позволяет не отправлять в Telegram правки, которые
+    ничего не меняют, и менять только клавиатуру, если текст остался прежним.
+    Отпечаток верен, только пока сообщение правится через safe_edit_or_send_message:
+    прямой bot.edit_message_text оставит в кэше старое содержимое, и следующая
+    правка с тем же текстом будет ошибочно пропущена.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = max(1, capacity)
+        self._fingerprints = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def fingerprint(text: str, reply_markup=None, parse_mode=None) -> tuple:
+        text_hash = hashlib.blake2b(f"{parse_mode}\0{text}".encode('utf-8'), digest_size=16).digest()
+        markup_json = reply_markup.to_json() if reply_markup is not None else ''
+        markup_hash = hashlib.blake2b(markup_json.encode('utf-8'), digest_size=16).digest()
+        return text_hash, markup_hash
+
+    def get(self, chat_id, message_id):
+        with self._lock:
+            return self._fingerprints.get((str(chat_id), int(message_id)))
+
+    def set(self, chat_id, message_id, fingerprint: tuple) -> None:
+        key = (str(chat_id), int(message_id))
+        with self._lock:
+            self._fingerprints[key] = fingerprint
+            self._fingerprints.move_to_end(key)
+            if len(self._fingerprints) > self.capacity:
+                self._fingerprints.popitem(last=False)
+
+    def discard(self, chat_id, message_id) -> None:
+        with self._lock:
+            self._fingerprints.pop((str(chat_id), int(message_id)), None)
+
+
+_render_cache = MessageRenderCache(settings.MESSAGE_RENDER_CACHE_SIZE)
+
+
+def _is_not_modified_error(error: Exception) -> bool:
+    return "message is not modified" in str(error).lower()
+
+
+def _edit_rendered_message(chat_id, message_id, text: str, reply_markup, parse_mode) -> None:
+    """Редактирует сообщение, пропуская правки без изменений и правя только клавиатуру, если текст тот же"""
+    fingerprint = MessageRenderCache.fingerprint(text, reply_markup, parse_mode)
+    previous = _render_cache.get(chat_id, message_id)
+    if previous == fingerprint:
+        return
+
     try:
-        if message_id:
+        if previous is not None and previous[0] == fingerprint[0]:
+            bot.edit_message_reply_markup(chat_id=chat_id, message_id=message_id, reply_markup=reply_markup)
+        else:
             bot.edit_message_text(
                 chat_id=chat_id,
                 text=text,
@@ -31,8 +101,22 @@ def safe_edit_or_send_message(chat_id: str, text: str, reply_markup=None, messag
                 message_id=message_id,
                 parse_mode=parse_mode
             )
+    except ApiTelegramException as e:
+        if not _is_not_modified_error(e):
+            _render_cache.discard(chat_id, message_id)
+            raise
+    _render_cache.set(chat_id, message_id, fingerprint)
+
+
+def safe_edit_or_send_message(chat_id: str, text: str, reply_markup=None, message_id=None, parse_mode=None) -> None:
+    """Безопасно редактирует сообщение или отправляет новое при ошибке"""
+    parse_mode = safe_parse_mode(text, parse_mode)
+    try:
+        if message_id:
+            _edit_rendered_message(chat_id, message_id, text, reply_markup, parse_mode)
         else:
-            bot.send_message(chat_id, text, reply_markup=reply_markup, parse_mode=parse_mode)
+            sent = bot.send_message(chat_id, text, reply_markup=reply_markup, parse_mode=parse_mode)
+            _render_cache.set(chat_id, sent.message_id, MessageRenderCache.fingerprint(text, reply_markup, parse_mode))
     except ApiTelegramException as e:
         # Если ошибка в парсинге сущностей (Markdown), пробуем без parse_mode
         if "can't parse entities" in str(e).lower():
@@ -52,29 +136,67 @@ def safe_edit_or_send_message(chat_id: str, text: str, reply_markup=None, messag
             logger.error(f"Ultimate failure sending message to {chat_id}: {send_e}")
 
 
-def send_task_notification(user_id: str, text: str, reply_markup=None, parse_mode='Markdown') -> bool:
+MEDIA_GROUP_LIMIT = 10
+
+
+def send_attachments(chat_id, attachments: list) -> int:
+    """
+    Отправляет вложения альбомами через очередь исходящих сообщений.
+    Фото и документы нельзя смешивать в одном альбоме, поэтому они группируются
+    отдельно, по MEDIA_GROUP_LIMIT штук. Возвращает число вызовов API.
+    """
+    media_types = (
+        ('photo', InputMediaPhoto, 'send_photo'),
+        ('document', InputMediaDocument, 'send_document'),
+    )
+    calls = 0
+    for attachment_type, media_class, single_method in media_types:
+        file_ids = [a['file_id'] for a in attachments if a.get('type') == attachment_type]
+        for start in range(0, len(file_ids), MEDIA_GROUP_LIMIT):
+            chunk = file_ids[start:start + MEDIA_GROUP_LIMIT]
+            if len(chunk) == 1:
+                # Альбом должен содержать от 2 элементов
+                outbound.submit(single_method, chat_id, **{attachment_type: chunk[0]})
+            else:
+                outbound.submit('send_media_group', chat_id, media=[media_class(file_id) for file_id in chunk])
+            calls += 1
+    return calls
+
+
+def send_task_notification(user_id: str, text: str, reply_markup=None, parse_mode='Markdown',
+                           idempotency_key: str = None, defer: bool = True, task: Task = None,
+                           coalesce: bool = False) -> bool:
     """
     Отправляет уведомление пользователю с учетом его рабочих часов.
-    Возвращает True если сообщение отправлено, False если пропущено (не рабочее время).
+    Сообщение записывается в outbox (bot/outbox.py) в текущей транзакции и уходит после коммита.
+    В нерабочее время уведомление откладывается до начала рабочего дня получателя
+    (и придет в составе сводки), а с defer=False - пропускается. coalesce=True - частые
+    уведомления (комментарии) копятся и уходят одной сводкой; task - кнопка задачи в сводке.
+    Возвращает True если уведомление записано, False если пропущено (не рабочее время или дубль по ключу).
     """
     try:
-        user = User.objects.get(telegram_id=user_id)
+        user = get_user(user_id)
+        deliver_after = None
         if not user.is_working_time():
-            logger.info(f"Skipping notification to {user_id} - outside working hours ({user.work_start}-{user.work_end})")
-            return False
-            
-        bot.send_message(user_id, text, reply_markup=reply_markup, parse_mode=parse_mode)
-        return True
+            if not defer:
+                logger.info(f"Skipping notification to {user_id} - outside working hours ({user.work_start}-{user.work_end})")
+                return False
+            deliver_after = get_snapshot().next_work_start(user.timezone, user.work_start)
+            logger.info(f"Deferring notification to {user_id} until {deliver_after} (working hours {user.work_start}-{user.work_end})")
+
+        return queue_notification(user_id, text, reply_markup=reply_markup, parse_mode=parse_mode,
+                                  idempotency_key=idempotency_key, deliver_after=deliver_after,
+                                  task=task, coalesce=coalesce)
     except User.DoesNotExist:
         # Если пользователя нет в базе (странно, но бывает), отправляем все равно
-        bot.send_message(user_id, text, reply_markup=reply_markup, parse_mode=parse_mode)
-        return True
+        return queue_notification(user_id, text, reply_markup=reply_markup, parse_mode=parse_mode,
+                                  idempotency_key=idempotency_key, task=task, coalesce=coalesce)
     except Exception as e:
         logger.error(f"Error sending task notification to {user_id}: {e}")
         return False
 
 
-def get_user_state(chat_id) -> dict:
+def _load_state(chat_id) -> dict:
     try:
         user_state = UserState.objects.get(user__telegram_id=chat_id)
         # Возвращаем словарь с полями state и data
@@ -108,7 +230,7 @@ def get_user_state(chat_id) -> dict:
         return {}
 
 
-def set_user_state(chat_id, state_data: dict) -> None:
+def _save_state(chat_id, state_data: dict) -> None:
     # Создаем копию, чтобы не изменять исходный словарь
     state_data_copy = state_data.copy() if state_data else {}
     
@@ -135,11 +257,69 @@ def set_user_state(chat_id, state_data: dict) -> None:
     )
 
 
-def clear_user_state(chat_id) -> None:
+def _delete_state(chat_id) -> None:
     UserState.objects.filter(user__telegram_id=chat_id).delete()
 
 
+def get_user_state(chat_id) -> dict:
+    context = get_context()
+    if context is None:
+        return state_store.load(chat_id)
+    key = str(chat_id)
+    if key not in context.states:
+        context.states[key] = state_store.load(key)
+    # Копия: изменения вступают в силу только через set_user_state
+    return copy.deepcopy(context.states[key])
+
+
+def set_user_state(chat_id, state_data: dict) -> None:
+    context = get_context()
+    if context is None:
+        state_store.save(chat_id, state_data)
+        return
+    key = str(chat_id)
+    new_state = copy.deepcopy(state_data) if state_data else {}
+    if new_state.get('state') is None:
+        # Как и при прямой записи: если state не указан, сохраняем текущий
+        new_state['state'] = get_user_state(key).get('state', '')
+    context.states[key] = new_state
+    context.dirty_states.add(key)
+
+
+def clear_user_state(chat_id) -> None:
+    context = get_context()
+    if context is None:
+        state_store.delete(chat_id)
+        return
+    key = str(chat_id)
+    context.states[key] = {}
+    context.dirty_states.add(key)
+
+
+def _remember_user(user: User) -> User:
+    """Кладет пользователя в кэш текущего обновления (роли берутся из bot/role_cache.py)"""
+    context = get_context()
+    if context is not None:
+        context.users[str(user.telegram_id)] = user
+    return user
+
+
+def get_user(telegram_id) -> User:
+    """Пользователь по Telegram ID; в рамках обновления загружается один раз. Бросает User.DoesNotExist"""
+    context = get_context()
+    if context is not None and str(telegram_id) in context.users:
+        return context.users[str(telegram_id)]
+    return _remember_user(User.objects.get(telegram_id=telegram_id))
+
+
 def get_or_create_user(telegram_id: str, telegram_username: str = None, first_name: str = None) -> User:
+    context = get_context()
+    cached = context.users.get(str(telegram_id)) if context is not None else None
+    if cached is not None \
+            and (not telegram_username or cached.user_name == telegram_username) \
+            and (not first_name or cached.first_name == first_name):
+        return cached
+
     user, created = User.objects.get_or_create(
         telegram_id=telegram_id,
         defaults={
@@ -157,7 +337,7 @@ def get_or_create_user(telegram_id: str, telegram_username: str = None, first_na
         if update_fields:
             User.objects.filter(telegram_id=telegram_id).update(**update_fields)
             user.refresh_from_db()
-    return user
+    return _remember_user(user)
 
 
 def check_registration(update) -> bool:
@@ -174,7 +354,7 @@ def check_registration(update) -> bool:
         return False
 
     try:
-        user = User.objects.get(telegram_id=chat_id)
+        user = get_user(chat_id)
         if not user.first_name or not user.last_name:
             # Импортируем внутри функции, чтобы избежать циклической зависимости
             from bot.handlers.registration import start_registration
@@ -224,7 +404,7 @@ def check_permissions(user_id: str, task: Task = None, require_creator: bool = F
         return True, ""
     
     if require_creator:
-        if str(task.creator.telegram_id) != str(user_id):
+        if str(task.creator_id) != str(user_id):
             return False, "❌ У вас нет прав для этого действия (требуются права создателя)"
     else:
         if not task.has_access(user):
@@ -232,7 +412,181 @@ def check_permissions(user_id: str, task: Task = None, require_creator: bool = F
     return True, ""
 
 
-def format_task_info(task: Task, show_details: bool = False) -> str:
+USER_PAGE_SIZE = 5
+
+
+def _user_keyset_filter(anchor_id, forward: bool) -> Q:
+    """
+    Условие "после/до пользователя anchor_id" для сортировки (first_name, telegram_id).
+    Имя якоря подставляется подзапросом (алиас anchor_first_name), поэтому страница - один запрос.
+    """
+    # В SQLite и MySQL NULL при сортировке по возрастанию идет первым
+    op = 'gt' if forward else 'lt'
+    after_id = Q(**{f'telegram_id__{op}': anchor_id})
+    same_name = Q(first_name=F('anchor_first_name')) & after_id
+    other_name = Q(**{f'first_name__{op}': F('anchor_first_name')})
+    null_anchor = Q(anchor_first_name__isnull=True)
+    if forward:
+        return (null_anchor & ((Q(first_name__isnull=True) & after_id) | Q(first_name__isnull=False))) \
+            | same_name | other_name
+    return (null_anchor & Q(first_name__isnull=True) & after_id) \
+        | (~null_anchor & (same_name | other_name | Q(first_name__isnull=True)))
+
+
+def _user_search_filter(search: str) -> Q:
+    """Пользователи, у которых имя, фамилия или username начинается с search (без учета регистра)"""
+    if connection.vendor == 'sqlite':
+        # LIKE в SQLite не учитывает регистр только для ASCII ("иван" не находит "Иван"),
+        # а REGEXP Django выполняет модулем re, который сравнивает Unicode без учета регистра
+        lookup, value = 'iregex', '^' + re.escape(search)
+    else:
+        lookup, value = 'istartswith', search
+    condition = Q()
+    for field in ('first_name', 'last_name', 'user_name'):
+        condition |= Q(**{f'{field}__{lookup}': value})
+    return condition
+
+
+def get_user_page(after: str = None, before: str = None, search: str = None,
+                  per_page: int = USER_PAGE_SIZE) -> tuple[list, bool, bool]:
+    """
+    Страница пользователей для выбора исполнителя, отсортированная по имени.
+    Keyset-пагинация: after/before - Telegram ID пользователя, после (до) которого
+    нужна страница; search - начало имени, фамилии или username. Один запрос на страницу.
+    Возвращает (users, has_prev, has_next).
+    """
+    queryset = User.objects.only('telegram_id', 'user_name', 'first_name', 'last_name', 'is_admin')
+    if search:
+        queryset = queryset.filter(_user_search_filter(search))
+
+    anchor_id = after or before
+    forward = not before
+    if anchor_id:
+        anchor_first_name = User.objects.filter(telegram_id=anchor_id).values('first_name')[:1]
+        queryset = queryset.alias(anchor_first_name=Subquery(anchor_first_name)).filter(
+            _user_keyset_filter(anchor_id, forward)
+        )
+
+    ordering = ('first_name', 'telegram_id') if forward else ('-first_name', '-telegram_id')
+    users = list(queryset.order_by(*ordering)[:per_page + 1])
+    has_more = len(users) > per_page
+    users = users[:per_page]
+    if not forward:
+        users.reverse()
+        return users, has_more, True
+    return users, bool(anchor_id), has_more
+
+
+TASK_LIST_PAGE_SIZE = 8
+
+
+def task_list_queryset(user: User, view: str, status_filter: str = 'all'):
+    """Задачи списка: view='assignee' - мои активные (лично или через роль), 'creator' - созданные мной"""
+    if view == 'creator':
+        queryset = Task.objects.filter(creator=user)
+    else:
+        queryset = Task.objects.filter(
+            Q(assignee=user) | Q(assigned_role_id__in=get_user_role_ids(user)),
+            status__in=['active', 'pending_review']
+        )
+    if status_filter == 'active':
+        queryset = queryset.filter(status='active')
+    elif status_filter == 'review':
+        queryset = queryset.filter(status='pending_review')
+    elif status_filter == 'done':
+        queryset = queryset.filter(status='completed')
+    elif status_filter == 'overdue':
+        queryset = queryset.filter(status='active', due_date__lt=timezone.now())
+    return queryset
+
+
+def get_task_list_count(user: User, view: str, status_filter: str = 'all') -> int:
+    """Число задач в списке; кэшируется (см. bot/task_list_cache.py), чтобы не считать на каждой странице"""
+    return task_list_cache.get_task_list_count(
+        user.telegram_id, view, status_filter,
+        lambda: task_list_queryset(user, view, status_filter).count(),
+    )
+
+
+def get_task_page(queryset, after: int = None, before: int = None,
+                  per_page: int = TASK_LIST_PAGE_SIZE) -> tuple[list, bool, bool]:
+    """
+    Страница списка задач, новые сверху (keyset по -id): after/before - id задачи,
+    после (до) которой нужна страница. Возвращает (tasks, has_prev, has_next).
+    """
+    queryset = queryset.only('id', 'title', 'status', 'due_date')
+    if before is not None:
+        tasks = list(queryset.filter(id__gt=before).order_by('id')[:per_page + 1])
+        has_more = len(tasks) > per_page
+        tasks = tasks[:per_page]
+        tasks.reverse()
+        return tasks, has_more, True
+    if after is not None:
+        queryset = queryset.filter(id__lt=after)
+    tasks = list(queryset.order_by('-id')[:per_page + 1])
+    return tasks[:per_page], after is not None, len(tasks) > per_page
+
+
+def show_task_list(chat_id: str, user: User, view: str, status_filter: str = 'all', cursor: str = '0',
+                   message_id: int = None) -> None:
+    """
+    Показывает страницу списка задач. cursor: '0' - первая страница,
+    'a<id>' - после задачи id, 'b<id>' - до задачи id.
+    """
+    after = int(cursor[1:]) if cursor.startswith('a') else None
+    before = int(cursor[1:]) if cursor.startswith('b') else None
+    is_creator_view = view == 'creator'
+
+    tasks, has_prev, has_next = get_task_page(task_list_queryset(user, view, status_filter), after, before)
+    # Пустоту первой страницы решает сама выборка, а не число из кэша
+    if not tasks and status_filter == 'all' and not has_prev:
+        text = "📋 Вы еще не создали ни одной задачи" if is_creator_view else "📋 У вас нет активных задач"
+        safe_edit_or_send_message(chat_id, text, reply_markup=UNIVERSAL_BUTTONS, message_id=message_id)
+        return
+
+    total = max(get_task_list_count(user, view), len(tasks))
+    text = "📋 ЗАДАЧИ, СОЗДАННЫЕ ВАМИ\n\n" if is_creator_view else "📋 ВАШИ АКТИВНЫЕ ЗАДАЧИ\n\n"
+    if status_filter == 'all':
+        text += f"Всего: {total}"
+    else:
+        text += f"Всего: {total}, по фильтру: {get_task_list_count(user, view, status_filter)}"
+    if not tasks:
+        text += "\n\nНет задач по выбранному фильтру"
+
+    markup = get_tasks_list_markup(tasks, is_creator_view=is_creator_view, status_filter=status_filter,
+                                   has_prev=has_prev, has_next=has_next)
+    safe_edit_or_send_message(chat_id, text, reply_markup=markup, message_id=message_id)
+
+
+RECENT_COMMENTS_LIMIT = 3
+
+
+def task_view_queryset():
+    """
+    Задачи со всем, что выводят карточка и экран прогресса: создатель, исполнитель, роль,
+    подзадачи и последние комментарии с авторами. Итого 3 запроса вместо 10+.
+    """
+    return Task.objects.select_related('creator', 'assignee', 'assigned_role').prefetch_related(
+        'subtasks',
+        Prefetch(
+            'comments',
+            queryset=TaskComment.objects.select_related('author').order_by('-created_at')[:RECENT_COMMENTS_LIMIT],
+            to_attr='recent_comments',
+        ),
+    )
+
+
+def get_task_for_view(task_id) -> Task:
+    """Загружает задачу для отображения (см. task_view_queryset)"""
+    return task_view_queryset().get(id=task_id)
+
+
+def format_task_info(task: Task, show_details: bool = False, markdown: bool = False) -> str:
+    """
+    Текст карточки задачи. При markdown=True пользовательские значения экранируются,
+    чтобы текст можно было отправить с parse_mode='Markdown'.
+    """
+    esc = escape_md if markdown else str
     status_text = {
         'active': '🔄 Активная',
         'pending_review': '⏳ Ожидает подтверждения',
@@ -241,19 +595,19 @@ def format_task_info(task: Task, show_details: bool = False) -> str:
     }.get(task.status, '❓ Неизвестный статус')
 
     text = f"📋 Задача\n\n"
-    text += f"📝 Название: {task.title}\n"
+    text += f"📝 Название: {esc(task.title)}\n"
     text += f"📊 Статус: {status_text}\n"
-    text += f"👤 Создатель: {task.creator.get_full_name()}\n"
+    text += f"👤 Создатель: {esc(task.creator.get_full_name())}\n"
     
     if task.assigned_role:
-        text += f"👥 Роль-исполнитель: {task.assigned_role.name}\n"
+        text += f"👥 Роль-исполнитель: {esc(task.assigned_role.name)}\n"
     elif task.assignee:
-        text += f"👨‍💼 Исполнитель: {task.assignee.get_full_name()}\n"
+        text += f"👨‍💼 Исполнитель: {esc(task.assignee.get_full_name())}\n"
     else:
         text += f"👨‍💼 Исполнитель: Не назначен\n"
 
     if task.description:
-        text += f"📖 Описание: {task.description}\n"
+        text += f"📖 Описание: {esc(task.description)}\n"
 
     if task.due_date:
         text += f"⏰ Срок: {timezone.localtime(task.due_date).strftime('%d.%m.%Y %H:%M')}\n"
@@ -265,14 +619,16 @@ def format_task_info(task: Task, show_details: bool = False) -> str:
         text += f"➡️ Завершена: {timezone.localtime(task.closed_at).strftime('%d.%m.%Y %H:%M')}\n"
 
     if task.status == 'pending_review' and task.report_text:
-        text += f"\n📄 Отчет исполнителя:\n{task.report_text}\n"
+        text += f"\n📄 Отчет исполнителя:\n{esc(task.report_text)}\n"
 
     # Добавляем комментарии
-    comments = task.comments.all().order_by('-created_at')[:3]
+    comments = getattr(task, 'recent_comments', None)
+    if comments is None:
+        comments = task.comments.select_related('author').order_by('-created_at')[:RECENT_COMMENTS_LIMIT]
     if comments:
         text += "\n💬 Последние комментарии:"
         for comment in comments:
-            text += f"\n▫️ {comment.author.get_full_name()}: {comment.text}"
+            text += f"\n▫️ {esc(comment.author.get_full_name())}: {esc(comment.text)}"
         text += "\n"
 
     return text
@@ -320,11 +676,12 @@ def parse_datetime_from_state(date_value):
 def show_task_progress(chat_id: str, task: Task, is_creator: bool = False, is_assignee: bool = False, message_id: int = None) -> None:
     text = format_task_info(task, show_details=True)
 
-    subtasks = task.subtasks.all()
+    # Один список подзадач на весь экран (берется из prefetch, если задача загружена через get_task_for_view)
+    subtasks = list(task.subtasks.all())
     if subtasks:
         # Добавляем прогресс-бар
-        completed_count = subtasks.filter(is_completed=True).count()
-        total_count = subtasks.count()
+        completed_count = task.subtasks_done
+        total_count = task.subtasks_total
         progress_percentage = int((completed_count / total_count) * 100) if total_count > 0 else 0
 
         # Создаем прогресс-бар
@@ -341,7 +698,7 @@ def show_task_progress(chat_id: str, task: Task, is_creator: bool = False, is_as
             text += f"\n{status} {subtask.title}{completed_date}"
 
     # Создаем объединенную клавиатуру
-    markup = create_task_progress_markup(task, is_creator, is_assignee)
+    markup = create_task_progress_markup(task, is_creator, is_assignee, subtasks)
     safe_edit_or_send_message(chat_id, text, reply_markup=markup, message_id=message_id)
 
 
@@ -352,14 +709,15 @@ def create_progress_bar(percentage: int, length: int = 10) -> str:
     return f"[{bar}] {percentage}%"
 
 
-def create_task_progress_markup(task: Task, is_creator: bool, is_assignee: bool) -> InlineKeyboardMarkup:
+def create_task_progress_markup(task: Task, is_creator: bool, is_assignee: bool, subtasks: list = None) -> InlineKeyboardMarkup:
     """Создает объединенную клавиатуру для просмотра задачи с подзадачами"""
     from bot.keyboards import InlineKeyboardMarkup, InlineKeyboardButton
 
     markup = InlineKeyboardMarkup()
 
     # Добавляем кнопки подзадач, если они есть
-    subtasks = task.subtasks.all()
+    if subtasks is None:
+        subtasks = list(task.subtasks.all())
     if subtasks:
         for subtask in subtasks:
             status = "➡️" if subtask.is_completed else "⏳"
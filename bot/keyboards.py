@@ -96,42 +96,60 @@ def get_subtask_toggle_markup(task_id: int, subtasks) -> InlineKeyboardMarkup:
             callback_data=f"subtask_toggle_{task_id}_{subtask.id}"
         ))
     return markup
-def get_user_selection_markup(users, page: int = 0, users_per_page: int = 5) -> InlineKeyboardMarkup:
+def get_user_selection_markup(users, has_prev: bool = False, has_next: bool = False,
+                              search: str = None) -> InlineKeyboardMarkup:
+    """
+    Клавиатура одной страницы выбора пользователя (см. get_user_page).
+    Кнопки навигации передают Telegram ID крайнего пользователя страницы.
+    """
     markup = InlineKeyboardMarkup()
 
     # Добавляем кнопку "Назад к выбору исполнителя" в начало
     markup.add(InlineKeyboardButton("⬅️ Назад к выбору исполнителя", callback_data="back_to_assignee_selection"))
 
-    start_idx = page * users_per_page
-    end_idx = start_idx + users_per_page
-    users_on_page = users[start_idx:end_idx]
-    for user in users_on_page:
+    for user in users:
         role_emoji = "👑" if user.is_admin else "👨‍🎓"
         markup.add(InlineKeyboardButton(
             f"{role_emoji} {user.get_full_name()}",
             callback_data=f"select_user_{user.telegram_id}"
         ))
     nav_buttons = []
-    if page > 0:
-        nav_buttons.append(InlineKeyboardButton("⬅️ Назад", callback_data=f"user_page_{page-1}"))
-    # Проверяем тип users - если это QuerySet, используем count(), иначе len()
-    # QuerySet имеет метод count() без аргументов, список - нет
-    if hasattr(users, 'count') and not isinstance(users, list):
-        try:
-            total_users = users.count()
-        except (TypeError, AttributeError):
-            total_users = len(users)
-    else:
-        total_users = len(users)
-    total_pages = (total_users + users_per_page - 1) // users_per_page if total_users > 0 else 1
-    if page < total_pages - 1:
-        nav_buttons.append(InlineKeyboardButton("Вперёд ➡️", callback_data=f"user_page_{page+1}"))
+    if has_prev and users:
+        nav_buttons.append(InlineKeyboardButton("⬅️ Назад", callback_data=f"user_prev_{users[0].telegram_id}"))
+    if has_next and users:
+        nav_buttons.append(InlineKeyboardButton("Вперёд ➡️", callback_data=f"user_next_{users[-1].telegram_id}"))
     if nav_buttons:
         markup.add(*nav_buttons)
 
+    if search:
+        markup.add(InlineKeyboardButton("✖️ Сбросить поиск", callback_data="user_search_reset"))
+    else:
+        markup.add(InlineKeyboardButton("🔍 Поиск по имени", callback_data="user_search"))
+
     return markup
-def get_tasks_list_markup(tasks, is_creator_view: bool = False) -> InlineKeyboardMarkup:
+# Фильтры списков задач: код -> подпись кнопки
+TASK_LIST_FILTERS = {
+    'all': 'Все',
+    'active': '🔄 Активные',
+    'review': '⏳ На проверке',
+    'done': '✅ Завершенные',
+    'overdue': '🚨 Просроченные',
+}
+# Какие фильтры доступны в списке исполнителя и создателя
+TASK_LIST_VIEW_FILTERS = {
+    'assignee': ['all', 'active', 'review', 'overdue'],
+    'creator': ['all', 'active', 'review', 'done', 'overdue'],
+}
+
+
+def get_tasks_list_markup(tasks, is_creator_view: bool = False, status_filter: str = None,
+                          has_prev: bool = False, has_next: bool = False) -> InlineKeyboardMarkup:
+    """
+    Кнопки задач одной страницы. Если передан status_filter, добавляются кнопки
+    фильтров и навигации (callback task_list_<view>_<filter>_<курсор>).
+    """
     markup = InlineKeyboardMarkup()
+    view = 'creator' if is_creator_view else 'assignee'
     for task in tasks:
         status_emoji = {
             'active': '🔄',
@@ -146,8 +164,26 @@ def get_tasks_list_markup(tasks, is_creator_view: bool = False) -> InlineKeyboar
                 btn_text = f"🚨 {task.title}"
         markup.add(InlineKeyboardButton(
             btn_text,
-            callback_data=f"task_view_{task.id}_{'creator' if is_creator_view else 'assignee'}"
+            callback_data=f"task_view_{task.id}_{view}"
         ))
-    
+
+    if status_filter is not None:
+        nav_buttons = []
+        if has_prev and tasks:
+            nav_buttons.append(InlineKeyboardButton("⬅️ Назад", callback_data=f"task_list_{view}_{status_filter}_b{tasks[0].id}"))
+        if has_next and tasks:
+            nav_buttons.append(InlineKeyboardButton("Вперёд ➡️", callback_data=f"task_list_{view}_{status_filter}_a{tasks[-1].id}"))
+        if nav_buttons:
+            markup.add(*nav_buttons)
+
+        filter_buttons = [
+            InlineKeyboardButton(
+                f"• {TASK_LIST_FILTERS[code]}" if code == status_filter else TASK_LIST_FILTERS[code],
+                callback_data=f"task_list_{view}_{code}_0"
+            )
+            for code in TASK_LIST_VIEW_FILTERS[view]
+        ]
+        markup.add(*filter_buttons, row_width=3)
+
     markup.add(InlineKeyboardButton("⬅️ В меню", callback_data="main_menu"))
     return markup
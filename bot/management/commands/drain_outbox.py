@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from bot.outbox import drain_outbox
+
+
+class Command(BaseCommand):
+    help = 'Отправка накопившихся уведомлений из outbox (однократный запуск через крон)'
+
+    def handle(self, *args, **options):
+        sent_count = drain_outbox()
+        self.stdout.write(self.style.SUCCESS(f"📨 Отправлено уведомлений: {sent_count}"))
@@ -2,75 +2,112 @@ from django.core.management.base import BaseCommand
 from django.utils import timezone
 from bot.models import User, Task
 from bot import logger
-from bot.handlers.utils import send_task_notification
+from bot.outbox import queue_notification, drain_outbox
 from datetime import timedelta
-from django.db.models import Q
+from django.db.models import Count, Q
+from telebot.types import InlineKeyboardMarkup, InlineKeyboardButton
+from bot.timezones import TimezoneSnapshot
 
 class Command(BaseCommand):
     help = 'Отправка утренней сводки задач пользователям'
 
     def handle(self, *args, **options):
-        import pytz
-        users = User.objects.all()
         now_utc = timezone.now()
         today_date = now_utc.date()
-        
+
+        # 1. Пользователи, у которых наступил час начала работы (или позже, если пропустили запуск),
+        #    и еще рабочее время; сегодня сводку еще не получали. Отбор - в БД по часовым поясам
+        users = list(
+            User.objects.filter(self.eligibility_filter(TimezoneSnapshot(now_utc)))
+            .exclude(last_summary_sent_at=today_date)
+            .only('telegram_id', 'user_name')
+        )
+        if not users:
+            self.stdout.write("Нет пользователей для утренней сводки")
+            return
+
+        # 2. Счетчики задач для всех пользователей сразу (grouped conditional aggregates)
+        counters = self.collect_counters([user.telegram_id for user in users], now_utc, today_date)
+
+        markup = InlineKeyboardMarkup()
+        markup.add(InlineKeyboardButton("📋 Мои задачи", callback_data="tasks"))
+
+        sent_ids = []
         for user in users:
             try:
-                # 1. Проверяем, не отправляли ли уже сегодня
-                if user.last_summary_sent_at == today_date:
-                    continue
-                
-                # 2. Определяем текущий час в часовом поясе пользователя
-                try:
-                    tz = pytz.timezone(user.timezone)
-                except:
-                    tz = pytz.UTC
-                    
-                user_now = now_utc.astimezone(tz)
-                current_hour = user_now.hour
-                
-                # 3. Отправляем, если наступил час начала работы (или позже, если пропустили запуск)
-                if current_hour >= user.work_start:
-                    # Получаем активные задачи пользователя (где он исполнитель напрямую или через роль)
-                    user_tasks = Task.objects.filter(status='active').filter(
-                        Q(assignee=user) | Q(assigned_role__in=user.roles.all())
-                    ).distinct()
-                    
-                    active_count = user_tasks.count()
-                    
-                    # Определяем границы недели (до воскресенья включительно)
-                    start_of_week = today_date
-                    end_of_week = start_of_week + timedelta(days=(6 - start_of_week.weekday()))
-                    
-                    # Срок истекает на этой неделе
-                    due_this_week = user_tasks.filter(
-                        due_date__date__range=[start_of_week, end_of_week]
-                    ).count()
-                    
-                    # Просрочены
-                    overdue = user_tasks.filter(
-                        due_date__lt=now_utc
-                    ).count()
-                    
-                    summary_text = f"☀️ **ДОБРОЕ УТРО!**\n\n"
-                    summary_text += f"📊 **Ваша сводка задач на сегодня:**\n"
-                    summary_text += f"🔄 Активных задач: {active_count}\n"
-                    summary_text += f"📅 Срок истекает на этой неделе: {due_this_week}\n"
-                    summary_text += f"⚠️ Просрочены: {overdue}\n\n"
-                    summary_text += "Удачного рабочего дня! 💪"
-                    
-                    from telebot.types import InlineKeyboardMarkup, InlineKeyboardButton
-                    markup = InlineKeyboardMarkup()
-                    markup.add(InlineKeyboardButton("📋 Мои задачи", callback_data="tasks"))
-                    
-                    # Отправляем уведомление
-                    sent = send_task_notification(user.telegram_id, summary_text, reply_markup=markup)
-                    
-                    if sent:
-                        user.last_summary_sent_at = today_date
-                        user.save(update_fields=['last_summary_sent_at'])
-                        self.stdout.write(self.style.SUCCESS(f"➡️ Сводка отправлена {user.user_name} в {current_hour}:00"))
-                
+                active_count, due_this_week, overdue = counters.get(user.telegram_id, (0, 0, 0))
+
+                summary_text = f"☀️ **ДОБРОЕ УТРО!**\n\n"
+                summary_text += f"📊 **Ваша сводка задач на сегодня:**\n"
+                summary_text += f"🔄 Активных задач: {active_count}\n"
+                summary_text += f"📅 Срок истекает на этой неделе: {due_this_week}\n"
+                summary_text += f"⚠️ Просрочены: {overdue}\n\n"
+                summary_text += "Удачного рабочего дня! 💪"
+
+                queue_notification(user.telegram_id, summary_text, reply_markup=markup, parse_mode='Markdown',
+                                   idempotency_key=f"morning_summary:{user.telegram_id}:{today_date}")
+                sent_ids.append(user.telegram_id)
+                self.stdout.write(self.style.SUCCESS(f"➡️ Сводка отправлена {user.user_name}"))
+
             except Exception as e:
                 logger.error(f"Ошибка при обработке сводки для {user.telegram_id}: {e}")
+
+        # 3. Отмечаем отправку одним UPDATE
+        if sent_ids:
+            User.objects.filter(telegram_id__in=sent_ids).update(last_summary_sent_at=today_date)
+
+        # Уведомления записаны в outbox - отправляем их до завершения процесса
+        sent_count = drain_outbox()
+        self.stdout.write(self.style.SUCCESS(f"📨 Отправлено уведомлений: {sent_count}"))
+
+    def eligibility_filter(self, snapshot: TimezoneSnapshot) -> Q:
+        """
+        Условие "наступил час начала работы и сейчас рабочее время": решение принимается
+        один раз для каждой группы (timezone, work_start, work_end), снимок поясов - один на прогон.
+        """
+        condition = Q(pk__in=[])
+        schedules = User.objects.values_list('timezone', 'work_start', 'work_end').distinct().order_by()
+        for tz_name, work_start, work_end in schedules:
+            if snapshot.is_work_started(tz_name, work_start, work_end):
+                condition |= Q(timezone=tz_name, work_start=work_start, work_end=work_end)
+        return condition
+
+    def collect_counters(self, user_ids: list, now_utc, today_date) -> dict:
+        """Возвращает {telegram_id: (активных, срок на этой неделе, просрочено)}"""
+        # Границы недели (до воскресенья включительно)
+        end_of_week = today_date + timedelta(days=(6 - today_date.weekday()))
+        aggregates = {
+            'active': Count('id'),
+            'due_this_week': Count('id', filter=Q(due_date__date__range=[today_date, end_of_week])),
+            'overdue': Count('id', filter=Q(due_date__lt=now_utc)),
+        }
+        active_tasks = Task.objects.filter(status='active').order_by()
+
+        counters = {}
+
+        def add(user_id, row):
+            current = counters.get(user_id, (0, 0, 0))
+            counters[user_id] = (
+                current[0] + row['active'],
+                current[1] + row['due_this_week'],
+                current[2] + row['overdue'],
+            )
+
+        # Задачи, назначенные лично
+        for row in (active_tasks.filter(assignee_id__in=user_ids)
+                    .values('assignee_id').annotate(**aggregates)):
+            add(row['assignee_id'], row)
+
+        # Задачи, назначенные ролям (задача назначается либо пользователю, либо роли, поэтому суммы не пересекаются)
+        memberships = list(User.roles.through.objects.filter(user_id__in=user_ids).values_list('user_id', 'role_id'))
+        if memberships:
+            role_rows = {
+                row['assigned_role_id']: row
+                for row in active_tasks.filter(assigned_role_id__in={role_id for _, role_id in memberships})
+                .values('assigned_role_id').annotate(**aggregates)
+            }
+            for user_id, role_id in memberships:
+                if role_id in role_rows:
+                    add(user_id, role_rows[role_id])
+
+        return counters
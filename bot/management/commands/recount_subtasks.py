@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from bot.models import Task, Subtask
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = 'Пересчет счетчиков подзадач (subtasks_total/subtasks_done) по таблице подзадач'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--backfill',
+            action='store_true',
+            help='Пересчитать только задачи, где счетчики расходятся с подзадачами (после обновления)',
+        )
+
+    def handle(self, *args, **options):
+        if options.get('backfill'):
+            recounted = self.backfill()
+        else:
+            recounted = Task.objects.update(**self.counters())
+        self.stdout.write(self.style.SUCCESS(f"🔢 Пересчитаны счетчики подзадач для задач: {recounted}"))
+
+    @staticmethod
+    def count_subquery(**filters):
+        counts = (Subtask.objects.filter(task=OuterRef('pk'), **filters).order_by()
+                  .values('task').annotate(count=Count('id')).values('count'))
+        return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+    def counters(self) -> dict:
+        """Счетчики по подзапросам к подзадачам; UPDATE пишет их напрямую, минуя Task.save"""
+        return {
+            'subtasks_total': self.count_subquery(),
+            'subtasks_done': self.count_subquery(is_completed=True),
+        }
+
+    def backfill(self) -> int:
+        # id собираются заранее: MySQL не разрешает UPDATE таблицы с подзапросом к ней же
+        stale_ids = list(
+            Task.objects.annotate(actual_total=self.count_subquery(), actual_done=self.count_subquery(is_completed=True))
+            .exclude(subtasks_total=F('actual_total'), subtasks_done=F('actual_done'))
+            .order_by().values_list('pk', flat=True)
+        )
+        recounted = 0
+        for start in range(0, len(stale_ids), BATCH_SIZE):
+            recounted += Task.objects.filter(pk__in=stale_ids[start:start + BATCH_SIZE]).update(**self.counters())
+        return recounted
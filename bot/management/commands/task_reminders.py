@@ -1,40 +1,92 @@
+from datetime import timedelta
 from django.core.management.base import BaseCommand
+from django.db.models import Case, DateTimeField, ExpressionWrapper, Value, When
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from bot.models import Task, User
-from bot import bot, logger
-from bot.handlers.utils import format_task_info
+from bot import logger
+from bot.outbox import queue_notification, drain_outbox
+from bot.timezones import TimezoneSnapshot
+from bot.handlers.utils import format_task_info, task_view_queryset
 from bot.keyboards import get_task_actions_markup, InlineKeyboardButton
 
+# Через сколько повторить напоминание, если интервал задачи неизвестен на момент сдвига
+DEFAULT_REMINDER_DELAY = timedelta(hours=1)
+
+
 class Command(BaseCommand):
     help = 'Проверка и отправка напоминаний о задачах (однократный запуск через крон)'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--backfill',
+            action='store_true',
+            help='Заполнить next_notify_at для открытых задач, где он еще не рассчитан (после обновления)',
+        )
+
     def handle(self, *args, **options):
         now = timezone.now()
-        
-        # Ищем незавершенные задачи с установленным интервалом
-        unfinished_tasks = Task.objects.filter(
-            status__in=['active', 'pending_review'],
-            notification_interval__isnull=False
+        self.now = now
+        # Рабочее время получателей проверяется по одному снимку часовых поясов на прогон
+        self.snapshot = TimezoneSnapshot(now)
+
+        if options.get('backfill'):
+            filled = self.backfill_next_notify_at()
+            self.stdout.write(self.style.SUCCESS(f"🗓️ Рассчитано next_notify_at для задач: {filled}"))
+
+        # Только задачи, у которых подошло время напоминания (индекс по next_notify_at)
+        due_tasks = task_view_queryset().filter(
+            next_notify_at__lte=now,
+            status__in=Task.REMINDER_STATUSES,
         )
 
-        for task in unfinished_tasks:
+        notified = {}
+        for task in due_tasks:
             try:
-                # Определяем точку отсчета для уведомления
-                last_notice = task.last_notified_at or task.created_at
-                
-                # Проверяем, прошел ли интервал (в минутах)
-                interval_td = timezone.timedelta(minutes=task.notification_interval)
-                
-                if now - last_notice >= interval_td:
-                    self.send_reminder(task)
-                    
-                    # Обновляем время последнего уведомления
-                    task.last_notified_at = now
-                    task.save(update_fields=['last_notified_at'])
-                    
+                self.send_reminder(task)
+                notified[task.id] = task.notification_interval
             except Exception as e:
                 logger.error(f"Ошибка при обработке напоминания для задачи {task.id}: {e}")
 
+        if notified:
+            # Сдвигаем всю пачку одним UPDATE: следующее напоминание через интервал задачи
+            intervals = {interval for interval in notified.values() if interval}
+            fallback = timedelta(minutes=min(intervals)) if intervals else DEFAULT_REMINDER_DELAY
+            Task.objects.filter(id__in=notified).update(
+                last_notified_at=now,
+                next_notify_at=Case(
+                    # Напоминания выключили во время прогона - не включаем их обратно (проверяется первым:
+                    # интервал при этом мог остаться прежним)
+                    When(next_notify_at__isnull=True, then=Value(None)),
+                    *[When(notification_interval=interval, then=Value(now + timedelta(minutes=interval)))
+                      for interval in intervals],
+                    # Интервал сменили во время прогона: без default строка получила бы NULL и напоминания
+                    # прекратились бы; откладываем на наименьший интервал пачки
+                    default=Value(now + fallback),
+                    output_field=DateTimeField(),
+                ),
+            )
+
+        # Уведомления записаны в outbox - отправляем их до завершения процесса
+        sent_count = drain_outbox()
+        self.stdout.write(self.style.SUCCESS(f"📨 Отправлено уведомлений: {sent_count}"))
+
+    def backfill_next_notify_at(self) -> int:
+        """Заполняет next_notify_at = (последнее уведомление или создание) + интервал"""
+        pending = Task.objects.filter(
+            status__in=Task.REMINDER_STATUSES,
+            notification_interval__isnull=False,
+            next_notify_at__isnull=True,
+        )
+        filled = 0
+        # Интервалов немного (кнопки выбора), поэтому один UPDATE на интервал
+        for interval in set(pending.values_list('notification_interval', flat=True)):
+            filled += pending.filter(notification_interval=interval).update(next_notify_at=ExpressionWrapper(
+                Coalesce('last_notified_at', 'created_at') + Value(timedelta(minutes=interval)),
+                output_field=DateTimeField(),
+            ))
+        return filled
+
     def send_reminder(self, task):
         """Отправляет напоминание всем ответственным за задачу"""
         assignees = task.get_assignees()
@@ -47,22 +99,20 @@ class Command(BaseCommand):
             if now.date() == due_date.date():
                 deadline_notice = "\n⚠️ **СЕГОДНЯ последний срок сдачи задания!**\n"
 
-        reminder_text = f"💡 **НАПОМИНАНИЕ О ЗАДАЧЕ**\n{deadline_notice}\n{format_task_info(task)}"
+        reminder_text = f"💡 **НАПОМИНАНИЕ О ЗАДАЧЕ**\n{deadline_notice}\n{format_task_info(task, markdown=True)}"
         markup = get_task_actions_markup(task.id, task.status, task.report_attachments, False, True)
         markup.add(InlineKeyboardButton("📋 К списку задач", callback_data="tasks"))
         
-        from bot.handlers.utils import send_task_notification
         for user in assignees:
             try:
-                sent = send_task_notification(
-                    user.telegram_id,
-                    reminder_text,
-                    reply_markup=markup,
-                    parse_mode='Markdown'
-                )
-                if sent:
-                    self.stdout.write(self.style.SUCCESS(f"➡️ Напоминание по задаче {task.id} отправлено {user.user_name}"))
-                else:
+                if not user.is_working_time(self.snapshot):
                     self.stdout.write(self.style.WARNING(f"⏳ Напоминание по задаче {task.id} пропущено (не рабочее время) для {user.user_name}"))
+                    continue
+                # Не coalesce: окно объединения отложило бы напоминания на NOTIFICATION_COALESCE_SECONDS,
+                # и drain_outbox в конце прогона их бы не отправил. deliver_after = начало прогона: записи
+                # готовы сразу, а drain_outbox объединяет отложенные записи одного получателя в сводку
+                queue_notification(user.telegram_id, reminder_text, reply_markup=markup, parse_mode='Markdown',
+                                   task=task, deliver_after=self.now)
+                self.stdout.write(self.style.SUCCESS(f"➡️ Напоминание по задаче {task.id} отправлено {user.user_name}"))
             except Exception as e:
                 logger.error(f"Не удалось отправить напоминание пользователю {user.telegram_id}: {e}")
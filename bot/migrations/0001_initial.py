@@ -0,0 +1,201 @@
+# Generated by Django 5.1.6 on 2026-10-17 21:33
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Role',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='Название роли')),
+                ('description', models.TextField(blank=True, null=True, verbose_name='Описание роли')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+            ],
+            options={
+                'verbose_name': 'Роль',
+                'verbose_name_plural': 'Роли',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Task',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(help_text='Краткое название задачи', max_length=200, verbose_name='Название задачи')),
+                ('description', models.TextField(blank=True, help_text='Подробное описание задачи', null=True, verbose_name='Описание')),
+                ('notification_interval', models.PositiveIntegerField(blank=True, help_text='Интервал отправки напоминаний о задаче. Если не указано, напоминания не отправляются.', null=True, verbose_name='Интервал напоминаний (мин)')),
+                ('last_notified_at', models.DateTimeField(blank=True, null=True, verbose_name='Дата последнего уведомления')),
+                ('next_notify_at', models.DateTimeField(blank=True, help_text='Рассчитывается автоматически по интервалу напоминаний и статусу', null=True, verbose_name='Следующее напоминание')),
+                ('status', models.CharField(choices=[('active', 'Активная'), ('pending_review', 'Ожидает подтверждения'), ('completed', 'Завершена'), ('cancelled', 'Отменена')], default='active', max_length=20, verbose_name='Статус')),
+                ('subtasks_total', models.PositiveIntegerField(default=0, help_text='Счетчик поддерживается автоматически при изменении подзадач', verbose_name='Всего подзадач')),
+                ('subtasks_done', models.PositiveIntegerField(default=0, help_text='Счетчик поддерживается автоматически при изменении подзадач', verbose_name='Выполнено подзадач')),
+                ('due_date', models.DateTimeField(blank=True, null=True, verbose_name='Срок выполнения')),
+                ('attachments', models.JSONField(blank=True, default=list, help_text='Список URL вложений (фото, файлы)', null=True, verbose_name='Вложения')),
+                ('report_text', models.TextField(blank=True, help_text='Текст отчета исполнителя при закрытии задачи', null=True, verbose_name='Текст отчета')),
+                ('report_attachments', models.JSONField(blank=True, default=list, help_text='Вложения отчета исполнителя', null=True, verbose_name='Вложения отчета')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+                ('closed_at', models.DateTimeField(blank=True, null=True, verbose_name='Дата закрытия')),
+                ('assigned_role', models.ForeignKey(blank=True, help_text='Роль, которой назначена задача (все пользователи с этой ролью имеют доступ)', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='assigned_tasks', to='bot.role', verbose_name='Назначено роли')),
+            ],
+            options={
+                'verbose_name': 'Задача',
+                'verbose_name_plural': 'Задачи',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='User',
+            fields=[
+                ('telegram_id', models.CharField(max_length=50, primary_key=True, serialize=False, verbose_name='Telegram ID')),
+                ('user_name', models.CharField(max_length=100, verbose_name='Имя пользователя')),
+                ('first_name', models.CharField(blank=True, help_text='Имя пользователя', max_length=100, null=True, verbose_name='Имя')),
+                ('last_name', models.CharField(blank=True, help_text='Фамилия пользователя', max_length=100, null=True, verbose_name='Фамилия')),
+                ('is_admin', models.BooleanField(default=False, verbose_name='Администратор')),
+                ('timezone', models.CharField(default='UTC', max_length=50, verbose_name='Часовой пояс')),
+                ('is_tutorial_finished', models.BooleanField(default=False, verbose_name='Обучение пройдено')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата регистрации')),
+                ('work_start', models.PositiveIntegerField(default=7, verbose_name='Начало рабочего времени (час)')),
+                ('work_end', models.PositiveIntegerField(default=21, verbose_name='Конец рабочего времени (час)')),
+                ('last_summary_sent_at', models.DateField(blank=True, null=True, verbose_name='Дата последней отправки сводки')),
+                ('roles', models.ManyToManyField(blank=True, related_name='users', to='bot.role', verbose_name='Роли')),
+            ],
+            options={
+                'verbose_name': 'Пользователь',
+                'verbose_name_plural': 'Пользователи',
+            },
+        ),
+        migrations.CreateModel(
+            name='TaskHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('action', models.CharField(max_length=200, verbose_name='Действие')),
+                ('old_value', models.TextField(blank=True, null=True, verbose_name='Старое значение')),
+                ('new_value', models.TextField(blank=True, null=True, verbose_name='Новое значение')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата изменения')),
+                ('task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='history', to='bot.task', verbose_name='Задача')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='bot.user', verbose_name='Кто изменил')),
+            ],
+            options={
+                'verbose_name': 'История задачи',
+                'verbose_name_plural': 'История задач',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='TaskComment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('text', models.TextField(verbose_name='Текст комментария')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='comments', to='bot.task', verbose_name='Задача')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='comments', to='bot.user', verbose_name='Автор')),
+            ],
+            options={
+                'verbose_name': 'Комментарий',
+                'verbose_name_plural': 'Комментарии',
+                'ordering': ['created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='assignee',
+            field=models.ForeignKey(blank=True, help_text='Конкретный исполнитель задачи', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='assigned_tasks', to='bot.user', verbose_name='Исполнитель'),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='creator',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='created_tasks', to='bot.user', verbose_name='Создатель'),
+        ),
+        migrations.CreateModel(
+            name='UserState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('state', models.CharField(max_length=50, verbose_name='Текущее состояние')),
+                ('data', models.JSONField(default=dict, verbose_name='Данные состояния')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='state', to='bot.user', verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Состояние пользователя',
+                'verbose_name_plural': 'Состояния пользователей',
+            },
+        ),
+        migrations.CreateModel(
+            name='Subtask',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=200, verbose_name='Название подзадачи')),
+                ('is_completed', models.BooleanField(default=False, verbose_name='Выполнена')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('completed_at', models.DateTimeField(blank=True, null=True, verbose_name='Дата выполнения')),
+                ('task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='subtasks', to='bot.task', verbose_name='Задача')),
+            ],
+            options={
+                'verbose_name': 'Подзадача',
+                'verbose_name_plural': 'Подзадачи',
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['task', 'is_completed'], name='subtask_task_completed_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='NotificationOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipient', models.CharField(max_length=50, verbose_name='Получатель (Telegram ID)')),
+                ('text', models.TextField(verbose_name='Текст')),
+                ('reply_markup', models.JSONField(blank=True, null=True, verbose_name='Клавиатура')),
+                ('parse_mode', models.CharField(blank=True, max_length=20, null=True, verbose_name='Режим разметки')),
+                ('idempotency_key', models.CharField(help_text='Повторная запись с тем же ключом не создаст второе уведомление', max_length=200, unique=True, verbose_name='Ключ идемпотентности')),
+                ('status', models.CharField(choices=[('pending', 'Ожидает отправки'), ('sent', 'Отправлено'), ('failed', 'Ошибка')], default='pending', max_length=20, verbose_name='Статус')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Попыток отправки')),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Следующая попытка')),
+                ('deliver_after', models.DateTimeField(blank=True, help_text='Уведомление ждет начала рабочего дня получателя или окна объединения в сводку', null=True, verbose_name='Отложено до')),
+                ('last_error', models.TextField(blank=True, null=True, verbose_name='Последняя ошибка')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='Дата отправки')),
+                ('task', models.ForeignKey(blank=True, help_text='Задача, к которой относится уведомление (кнопка в сводке)', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='notifications', to='bot.task', verbose_name='Задача')),
+            ],
+            options={
+                'verbose_name': 'Исходящее уведомление',
+                'verbose_name_plural': 'Исходящие уведомления',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='bot_notific_status_bc9500_idx'), models.Index(fields=['recipient', 'status', 'deliver_after'], name='bot_notific_recipie_a8da19_idx')],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['first_name', 'telegram_id'], name='user_first_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['assignee', 'status'], name='task_assignee_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['assigned_role', 'status'], name='task_role_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['creator', 'created_at'], name='task_creator_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['status', 'due_date'], name='task_status_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['next_notify_at'], name='task_next_notify_idx'),
+        ),
+    ]
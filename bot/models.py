@@ -1,7 +1,10 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, F, Q
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 
+from bot.role_cache import get_user_role_ids
+
 
 class Role(models.Model):
     """Модель роли для группировки пользователей"""
@@ -108,24 +111,11 @@ class User(models.Model):
             return self.user_name
         return f"ID {self.telegram_id}"
     
-    def is_working_time(self):
-        """Проверяет, входит ли текущее время в рабочий интервал пользователя"""
-        import pytz
-        from datetime import datetime
-        try:
-            tz = pytz.timezone(self.timezone)
-        except:
-            tz = pytz.UTC
-            
-        now = datetime.now(tz)
-        current_hour = now.hour
-        
-        # Обработка случая, когда конец работы на следующий день (например, с 22 до 02)
-        if self.work_start < self.work_end:
-            return self.work_start <= current_hour < self.work_end
-        else:
-            # Например, с 22 до 06
-            return current_hour >= self.work_start or current_hour < self.work_end
+    def is_working_time(self, snapshot=None):
+        """Проверяет, входит ли текущее время в рабочий интервал пользователя (см. bot/timezones.py)"""
+        from bot.timezones import get_snapshot
+        snapshot = snapshot or get_snapshot()
+        return snapshot.is_working_time(self.timezone, self.work_start, self.work_end)
 
     def __str__(self):
         return f"{self.get_full_name()} ({'Админ' if self.is_admin else 'Учитель'})"
@@ -133,6 +123,10 @@ class User(models.Model):
     class Meta:
         verbose_name = 'Пользователь'
         verbose_name_plural = 'Пользователи'
+        indexes = [
+            # Выбор исполнителя: сортировка по имени и поиск по началу имени
+            models.Index(fields=['first_name', 'telegram_id'], name='user_first_name_idx'),
+        ]
 class Task(models.Model):
     STATUS_CHOICES = [
         ('active', 'Активная'),
@@ -186,18 +180,27 @@ class Task(models.Model):
         blank=True,
         verbose_name='Дата последнего уведомления'
     )
+    next_notify_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Следующее напоминание',
+        help_text='Рассчитывается автоматически по интервалу напоминаний и статусу'
+    )
     status = models.CharField(
         max_length=20,
         choices=STATUS_CHOICES,
         default='active',
         verbose_name='Статус'
     )
-    progress = models.CharField(
-        max_length=20,
-        blank=True,
-        null=True,
-        verbose_name='Прогресс',
-        help_text='Например: "2/5" для 2 выполненных из 5 подзадач'
+    subtasks_total = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Всего подзадач',
+        help_text='Счетчик поддерживается автоматически при изменении подзадач'
+    )
+    subtasks_done = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Выполнено подзадач',
+        help_text='Счетчик поддерживается автоматически при изменении подзадач'
     )
     due_date = models.DateTimeField(
         blank=True,
@@ -251,28 +254,102 @@ class Task(models.Model):
             if self.assignee and self.creator != self.assignee:
                 if not self.report_text:
                     raise ValidationError('Для задач в статусе "Ожидает подтверждения" требуется текст отчета')
+    # Счетчики подзадач меняются только атомарными UPDATE (см. Subtask.save/delete),
+    # поэтому обычное сохранение задачи их не перезаписывает
+    COUNTER_FIELDS = ('subtasks_total', 'subtasks_done')
+    # Изменение этих полей требует проверки правил clean() (назначение и переходы статусов)
+    CLEAN_TRIGGER_FIELDS = frozenset({'creator', 'assignee', 'assigned_role', 'status', 'report_text'})
+    # От этих полей зависит next_notify_at
+    NOTIFY_SCHEDULE_FIELDS = frozenset({'last_notified_at', 'notification_interval', 'status'})
+    REMINDER_STATUSES = ('active', 'pending_review')
+    # От этих полей зависит число задач в списках (bot/task_list_cache.py)
+    TASK_LIST_FIELDS = frozenset({'creator', 'assignee', 'assigned_role', 'status', 'due_date'})
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Запоминаем назначение: при переназначении сбрасывается и кэш списков прежних исполнителей
+        instance._saved_assignment = tuple(
+            instance.__dict__.get(name) for name in ('creator_id', 'assignee_id', 'assigned_role_id')
+        )
+        return instance
+
+    def compute_next_notify_at(self):
+        """Момент следующего напоминания по интервалу или None, если напоминать не нужно"""
+        if not self.notification_interval or self.status not in self.REMINDER_STATUSES:
+            return None
+        last_notice = self.last_notified_at or self.created_at or timezone.now()
+        return last_notice + timezone.timedelta(minutes=self.notification_interval)
+
     def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
         if self.status == 'completed' and not self.closed_at:
             self.closed_at = timezone.now()
-        self.full_clean()
+            if update_fields is not None:
+                update_fields = [*update_fields, 'closed_at']
+
+        if update_fields is None or self.NOTIFY_SCHEDULE_FIELDS.intersection(update_fields):
+            self.next_notify_at = self.compute_next_notify_at()
+            if update_fields is not None:
+                update_fields = [*update_fields, 'next_notify_at']
+
+        if update_fields is None:
+            self.full_clean()
+            if not self._state.adding and not kwargs.get('force_insert'):
+                kwargs['update_fields'] = [
+                    field.name for field in self._meta.concrete_fields
+                    if not field.primary_key and field.name not in self.COUNTER_FIELDS
+                ]
+        else:
+            # Точечное сохранение: проверяем только изменяемые поля, а clean() -
+            # только если затронуто назначение, статус или отчет
+            names = {self._meta.get_field(name).name for name in update_fields}
+            self.clean_fields(exclude=[
+                field.name for field in self._meta.concrete_fields if field.name not in names
+            ])
+            if names & self.CLEAN_TRIGGER_FIELDS:
+                self.clean()
+            names.add('updated_at')
+            kwargs['update_fields'] = list(names)
         super().save(*args, **kwargs)
+    @property
+    def progress(self):
+        """Прогресс в виде "2/5" или None, если подзадач нет"""
+        if not self.subtasks_total:
+            return None
+        return f"{self.subtasks_done}/{self.subtasks_total}"
     def get_progress_percentage(self):
-        if not self.progress or '/' not in self.progress:
-            return 0
-        try:
-            completed, total = map(int, self.progress.split('/'))
-            return int((completed / total) * 100) if total > 0 else 0
-        except (ValueError, ZeroDivisionError):
+        if not self.subtasks_total:
             return 0
+        return int((self.subtasks_done / self.subtasks_total) * 100)
     def update_progress(self):
-        subtasks = self.subtasks.all()
-        if subtasks:
-            completed_count = subtasks.filter(is_completed=True).count()
-            total_count = subtasks.count()
-            self.progress = f"{completed_count}/{total_count}"
-        else:
-            self.progress = None
-        self.save()
+        """Пересчитывает счетчики подзадач одним запросом (после массовых операций)"""
+        counts = self.subtasks.aggregate(
+            total=Count('id'),
+            done=Count('id', filter=Q(is_completed=True)),
+        )
+        self.subtasks_total = counts['total']
+        self.subtasks_done = counts['done']
+        Task.objects.filter(pk=self.pk).update(subtasks_total=self.subtasks_total, subtasks_done=self.subtasks_done)
+    def add_subtasks(self, titles) -> list:
+        """Создает подзадачи одним INSERT и обновляет счетчики одним UPDATE"""
+        subtasks = [Subtask(task=self, title=title) for title in titles]
+        if not subtasks:
+            return []
+        with transaction.atomic():
+            # bulk_create не вызывает Subtask.save, поэтому счетчики сдвигаем сами
+            created = Subtask.objects.bulk_create(subtasks)
+            self._shift_subtask_counters(len(created), 0)
+        for subtask in created:
+            subtask._saved_is_completed = False
+        return created
+    def _shift_subtask_counters(self, total_delta: int, done_delta: int):
+        Task.objects.filter(pk=self.pk).update(
+            subtasks_total=F('subtasks_total') + total_delta,
+            subtasks_done=F('subtasks_done') + done_delta,
+        )
+        self.subtasks_total += total_delta
+        self.subtasks_done += done_delta
     
     def get_assignees(self):
         """Возвращает список всех пользователей, которые имеют доступ к задаче"""
@@ -287,19 +364,29 @@ class Task(models.Model):
     def has_access(self, user):
         """Проверяет, имеет ли пользователь доступ к задаче"""
         # Создатель всегда имеет доступ
-        if self.creator == user:
+        if self.creator_id == user.pk:
             return True
         # Если задача назначена конкретному пользователю
-        if self.assignee and self.assignee == user:
+        if self.assignee_id and self.assignee_id == user.pk:
             return True
-        # Если задача назначена роли, проверяем наличие роли у пользователя
-        if self.assigned_role and user.roles.filter(id=self.assigned_role.id).exists():
+        # Если задача назначена роли, проверяем наличие роли у пользователя (по кэшу ролей)
+        if self.assigned_role_id and self.assigned_role_id in get_user_role_ids(user):
             return True
         return False
     class Meta:
         verbose_name = 'Задача'
         verbose_name_plural = 'Задачи'
         ordering = ['-created_at']
+        indexes = [
+            # "Мои задачи": по исполнителю или роли с фильтром по статусу
+            models.Index(fields=['assignee', 'status'], name='task_assignee_status_idx'),
+            models.Index(fields=['assigned_role', 'status'], name='task_role_status_idx'),
+            # "Созданные мной" в порядке создания
+            models.Index(fields=['creator', 'created_at'], name='task_creator_created_idx'),
+            # Напоминания о сроках и по интервалу
+            models.Index(fields=['status', 'due_date'], name='task_status_due_idx'),
+            models.Index(fields=['next_notify_at'], name='task_next_notify_idx'),
+        ]
 class Subtask(models.Model):
     task = models.ForeignKey(
         Task,
@@ -327,17 +414,67 @@ class Subtask(models.Model):
     def __str__(self):
         status = "➡️" if self.is_completed else "⏳"
         return f"{status} {self.title}"
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Запоминаем сохраненное значение, чтобы знать, как менять счетчики задачи
+        instance._saved_is_completed = instance.is_completed
+        return instance
     def save(self, *args, **kwargs):
         if self.is_completed and not self.completed_at:
             self.completed_at = timezone.now()
         elif not self.is_completed and self.completed_at:
             self.completed_at = None
-        super().save(*args, **kwargs)
-        self.task.update_progress()
+        if self._state.adding:
+            with transaction.atomic():
+                super().save(*args, **kwargs)
+                self.task._shift_subtask_counters(1, int(self.is_completed))
+            self._saved_is_completed = self.is_completed
+            return
+
+        was_completed = getattr(self, '_saved_is_completed', self.is_completed)
+        if was_completed == self.is_completed:
+            super().save(*args, **kwargs)
+            return
+
+        status_fields = {'is_completed', 'completed_at'}
+        update_fields = kwargs.pop('update_fields', None)
+        if update_fields is None:
+            update_fields = [field.name for field in self._meta.concrete_fields if not field.primary_key]
+        other_fields = [name for name in update_fields if name not in status_fields]
+        with transaction.atomic():
+            # Статус меняется, только если в базе еще прежнее значение: при одновременных
+            # переключениях счетчики сдвигает лишь тот, чей UPDATE изменил строку
+            changed = Subtask.objects.filter(pk=self.pk, is_completed=was_completed).update(
+                is_completed=self.is_completed,
+                completed_at=self.completed_at,
+            )
+            if changed == 1:
+                self.task._shift_subtask_counters(0, int(self.is_completed) - int(was_completed))
+            if other_fields:
+                super().save(*args, update_fields=other_fields, **kwargs)
+        if changed != 1:
+            # Подзадачу уже переключили (или удалили): берем состояние из базы
+            stored = Subtask.objects.filter(pk=self.pk).values('is_completed', 'completed_at').first()
+            if stored:
+                self.is_completed = stored['is_completed']
+                self.completed_at = stored['completed_at']
+        self._saved_is_completed = self.is_completed
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            # Флаг берем из удаляемой строки, а не из возможно устаревшего экземпляра
+            stored = Subtask.objects.select_for_update().filter(pk=self.pk).values_list('is_completed', flat=True).first()
+            result = super().delete(*args, **kwargs)
+            if stored is not None:
+                self.task._shift_subtask_counters(-1, -int(stored))
+        return result
     class Meta:
         verbose_name = 'Подзадача'
         verbose_name_plural = 'Подзадачи'
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['task', 'is_completed'], name='subtask_task_completed_idx'),
+        ]
 class UserState(models.Model):
     user = models.OneToOneField(
         User,
@@ -427,3 +564,95 @@ class TaskHistory(models.Model):
         verbose_name = 'История задачи'
         verbose_name_plural = 'История задач'
         ordering = ['-created_at']
+
+
+class NotificationOutbox(models.Model):
+    """
+    Исходящее уведомление. Записывается в той же транзакции, что и изменение задачи,
+    и отправляется фоновым обработчиком (bot/outbox.py) уже после коммита.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Ожидает отправки'),
+        ('sent', 'Отправлено'),
+        ('failed', 'Ошибка'),
+    ]
+    recipient = models.CharField(
+        max_length=50,
+        verbose_name='Получатель (Telegram ID)'
+    )
+    text = models.TextField(
+        verbose_name='Текст'
+    )
+    reply_markup = models.JSONField(
+        blank=True,
+        null=True,
+        verbose_name='Клавиатура'
+    )
+    parse_mode = models.CharField(
+        max_length=20,
+        blank=True,
+        null=True,
+        verbose_name='Режим разметки'
+    )
+    idempotency_key = models.CharField(
+        max_length=200,
+        unique=True,
+        verbose_name='Ключ идемпотентности',
+        help_text='Повторная запись с тем же ключом не создаст второе уведомление'
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='pending',
+        verbose_name='Статус'
+    )
+    attempts = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Попыток отправки'
+    )
+    next_attempt_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Следующая попытка'
+    )
+    deliver_after = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name='Отложено до',
+        help_text='Уведомление ждет начала рабочего дня получателя или окна объединения в сводку'
+    )
+    task = models.ForeignKey(
+        'Task',
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name='notifications',
+        verbose_name='Задача',
+        help_text='Задача, к которой относится уведомление (кнопка в сводке)'
+    )
+    last_error = models.TextField(
+        blank=True,
+        null=True,
+        verbose_name='Последняя ошибка'
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата создания'
+    )
+    sent_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name='Дата отправки'
+    )
+
+    def __str__(self):
+        return f"Notification to {self.recipient} ({self.get_status_display()})"
+
+    class Meta:
+        verbose_name = 'Исходящее уведомление'
+        verbose_name_plural = 'Исходящие уведомления'
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+            # Поиск уже ожидающей сводки получателя при объединении уведомлений
+            models.Index(fields=['recipient', 'status', 'deliver_after']),
+        ]
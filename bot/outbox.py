@@ -0,0 +1,293 @@
+"""
+Transactional outbox для уведомлений.
+
+Обработчики не отправляют уведомления сами: queue_notification записывает строку
+NotificationOutbox в текущей транзакции, а после коммита будит фоновый поток,
+который забирает готовые записи пачками и отправляет их через bot/sender.py.
+Откат транзакции удаляет и уведомления, медленный Telegram не держит транзакцию
+открытой, а неотправленные записи переживают перезапуск процесса (их подберет
+поток по таймеру, задача планировщика или команда drain_outbox).
+
+Уведомления, пришедшие в нерабочее время получателя, не теряются: они
+откладываются до начала его рабочего дня (deliver_after), а когда окно
+открывается, все отложенные записи одного получателя уходят одним сводным
+сообщением. Частые уведомления (комментарии, напоминания) с coalesce=True так же
+копятся NOTIFICATION_COALESCE_SECONDS секунд и присоединяются к уже ожидающей
+сводке получателя; в сводке есть кнопки задач, к которым относятся уведомления.
+"""
+import json
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Prefetch, prefetch_related_objects
+from django.utils import timezone
+from telebot.apihelper import ApiTelegramException
+from telebot.types import InlineKeyboardMarkup, InlineKeyboardButton
+
+from bot import logger
+from bot.formatting import escape_md, safe_parse_mode
+from bot.models import NotificationOutbox, Task
+from bot.sender import outbound
+
+# Пока запись отправляется, она "арендована": другие процессы ее не возьмут. Аренда продлевается
+# перед каждой отправкой, так что срок должен покрывать одно сообщение с ожиданием лимитов и 429
+LEASE_SECONDS = 120
+# Лимит длины сообщения Telegram; длинная сводка делится на несколько сообщений
+MESSAGE_LIMIT = 4096
+DIGEST_SEPARATOR = "\n\n➖➖➖➖➖\n\n"
+# Сколько кнопок задач добавлять в сводку
+DIGEST_TASK_BUTTONS = 8
+
+_drain_lock = threading.Lock()
+_wakeup = threading.Event()
+_drainer = None
+_drainer_lock = threading.Lock()
+
+
+def coalesced_deliver_after(recipient, not_before=None):
+    """
+    Момент отправки объединяемого уведомления: вместе с уже ожидающей сводкой
+    получателя, а если ее нет - через NOTIFICATION_COALESCE_SECONDS.
+    """
+    now = timezone.now()
+    pending = (
+        NotificationOutbox.objects
+        .filter(recipient=str(recipient), status='pending', deliver_after__gt=now)
+        .order_by('deliver_after')
+        .values_list('deliver_after', flat=True)
+        .first()
+    )
+    deliver_after = pending or now + timedelta(seconds=settings.NOTIFICATION_COALESCE_SECONDS)
+    if not_before is not None and deliver_after < not_before:
+        return not_before
+    return deliver_after
+
+
+def queue_notification(recipient, text: str, reply_markup=None, parse_mode=None, idempotency_key: str = None,
+                       deliver_after=None, task=None, coalesce: bool = False) -> bool:
+    """
+    Записывает уведомление в outbox (в рамках текущей транзакции, если она есть).
+    deliver_after - не отправлять раньше этого момента (нерабочее время получателя).
+    coalesce - объединить с другими уведомлениями получателя в сводку (см. coalesced_deliver_after).
+    Возвращает False, если уведомление с таким ключом уже было записано.
+    """
+    if coalesce and settings.NOTIFICATION_COALESCE_SECONDS > 0:
+        deliver_after = coalesced_deliver_after(recipient, deliver_after)
+    _, created = NotificationOutbox.objects.get_or_create(
+        idempotency_key=idempotency_key or uuid.uuid4().hex,
+        defaults={
+            'recipient': str(recipient),
+            'text': text,
+            'reply_markup': reply_markup.to_dict() if reply_markup is not None else None,
+            'parse_mode': safe_parse_mode(text, parse_mode),
+            'deliver_after': deliver_after,
+            'next_attempt_at': deliver_after or timezone.now(),
+            'task': task,
+        },
+    )
+    if created and deliver_after is None:
+        transaction.on_commit(kick_outbox_drainer)
+    return created
+
+
+def _claim_batch(batch_size: int) -> tuple:
+    """
+    Забирает пачку готовых записей и арендует их. Возвращает (записи, срок аренды):
+    срок аренды служит отметкой владельца - по нему _renew_lease узнает, не забрал ли
+    записи другой процесс после истечения аренды.
+    """
+    now = timezone.now()
+    lease_until = now + timedelta(seconds=LEASE_SECONDS)
+    with transaction.atomic():
+        batch = list(
+            NotificationOutbox.objects
+            .select_for_update(skip_locked=True)
+            .filter(status='pending', next_attempt_at__lte=now)
+            .order_by('id')[:batch_size]
+        )
+        if batch:
+            NotificationOutbox.objects.filter(id__in=[item.id for item in batch]).update(
+                next_attempt_at=lease_until
+            )
+    return batch, lease_until
+
+
+def _renew_lease(items: list, lease_until) -> bool:
+    """
+    Продлевает аренду записей перед отправкой. Пачка отправляется с ожиданием лимитов
+    и может пережить свою аренду; если за это время записи забрал другой процесс,
+    отметка аренды у них другая, и отправлять их здесь нельзя.
+    """
+    ids = [item.id for item in items]
+    renewed = NotificationOutbox.objects.filter(
+        id__in=ids, status='pending', next_attempt_at=lease_until
+    ).update(next_attempt_at=timezone.now() + timedelta(seconds=LEASE_SECONDS))
+    return renewed == len(ids)
+
+
+def _send(recipient: str, text: str, parse_mode, reply_markup: dict) -> None:
+    kwargs = {'text': text, 'parse_mode': parse_mode}
+    if reply_markup:
+        # telebot принимает клавиатуру и в виде готовой JSON-строки
+        kwargs['reply_markup'] = json.dumps(reply_markup, ensure_ascii=False)
+    # Отправка должна закончиться до истечения аренды (с запасом на таймауты HTTP);
+    # если лимиты или 429 требуют ждать дольше, запись вернется в очередь с повтором
+    deadline = (time.monotonic() + LEASE_SECONDS
+                - settings.TELEGRAM_CONNECT_TIMEOUT - settings.TELEGRAM_READ_TIMEOUT)
+    try:
+        outbound.call('send_message', recipient, deadline=deadline, **kwargs)
+    except ApiTelegramException as e:
+        if parse_mode and "can't parse entities" in str(e).lower():
+            kwargs.pop('parse_mode')
+            outbound.call('send_message', recipient, deadline=deadline, **kwargs)
+        else:
+            raise
+
+
+def _deliver(item: NotificationOutbox) -> None:
+    _send(item.recipient, item.text, item.parse_mode, item.reply_markup)
+
+
+def _digest_part(item: NotificationOutbox, markdown: bool) -> str:
+    if markdown and not item.parse_mode:
+        # Текст без разметки внутри Markdown-сводки экранируем
+        return escape_md(item.text)
+    return item.text
+
+
+def _build_digests(items: list) -> list:
+    """Делит отложенные уведомления получателя на сводки не длиннее MESSAGE_LIMIT: [(text, parse_mode, items)]"""
+    markdown = any(item.parse_mode for item in items)
+    header = f"🔔 **Новые уведомления: {len(items)}**" if markdown else f"🔔 Новые уведомления: {len(items)}"
+    digests = []
+    parts, chunk = [header], []
+    for item in items:
+        part = _digest_part(item, markdown)
+        if chunk and len(DIGEST_SEPARATOR.join(parts + [part])) > MESSAGE_LIMIT:
+            digests.append((DIGEST_SEPARATOR.join(parts), chunk))
+            parts, chunk = [], []
+        parts.append(part)
+        chunk.append(item)
+    digests.append((DIGEST_SEPARATOR.join(parts), chunk))
+    parse_mode = 'Markdown' if markdown else None
+    return [(text, safe_parse_mode(text, parse_mode), chunk) for text, chunk in digests]
+
+
+def _digest_markup(items: list) -> InlineKeyboardMarkup:
+    """Кнопки задач, упомянутых в сводке (без повторов), и переход к списку задач"""
+    markup = InlineKeyboardMarkup()
+    tasks = {}
+    for item in items:
+        if item.task_id and item.task is not None and len(tasks) < DIGEST_TASK_BUTTONS:
+            tasks.setdefault(item.task_id, item.task)
+    for task in tasks.values():
+        view = 'creator' if task.creator_id == items[0].recipient else 'assignee'
+        title = task.title if len(task.title) <= 40 else task.title[:39] + '…'
+        markup.add(InlineKeyboardButton(f"📋 {title}", callback_data=f"task_view_{task.id}_{view}"))
+    markup.add(InlineKeyboardButton("📋 Мои задачи", callback_data="tasks"))
+    return markup
+
+
+def _deliver_digest(text: str, parse_mode, items: list) -> None:
+    _send(items[0].recipient, text, parse_mode, _digest_markup(items).to_dict())
+
+
+def _delivery_groups(batch: list) -> list:
+    """
+    Разбивает пачку на отправки: обычные уведомления уходят по одному, а отложенные
+    (нерабочее время или окно объединения) объединяются по получателю в сводку.
+    [(text, parse_mode, items)]
+    """
+    groups = []
+    deferred = {}
+    for item in batch:
+        if item.deliver_after is None:
+            groups.append((None, None, [item]))
+        else:
+            deferred.setdefault(item.recipient, []).append(item)
+    for items in deferred.values():
+        if len(items) == 1:
+            groups.append((None, None, items))
+        else:
+            groups.extend(_build_digests(items))
+    return groups
+
+
+def _mark_failed_attempt(item: NotificationOutbox, error: Exception, permanent: bool) -> None:
+    attempts = item.attempts + 1
+    give_up = permanent or attempts >= settings.OUTBOX_MAX_ATTEMPTS
+    NotificationOutbox.objects.filter(id=item.id).update(
+        attempts=attempts,
+        status='failed' if give_up else 'pending',
+        next_attempt_at=timezone.now() + timedelta(seconds=min(3600, 30 * 2 ** attempts)),
+        last_error=str(error)[:1000],
+    )
+    if give_up:
+        logger.error(f"Outbox notification {item.id} to {item.recipient} failed: {error}")
+    else:
+        logger.warning(f"Outbox notification {item.id} to {item.recipient} will be retried: {error}")
+
+
+def drain_outbox(batch_size: int = None) -> int:
+    """Отправляет все готовые уведомления. Возвращает число отправленных"""
+    batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+    sent = 0
+    with _drain_lock:
+        while True:
+            batch, lease_until = _claim_batch(batch_size)
+            if not batch:
+                return sent
+            # Названия задач для кнопок сводок - одним запросом на пачку
+            prefetch_related_objects(
+                [item for item in batch if item.task_id and item.deliver_after],
+                Prefetch('task', queryset=Task.objects.only('id', 'title', 'creator_id')),
+            )
+            for digest_text, digest_parse_mode, items in _delivery_groups(batch):
+                if not _renew_lease(items, lease_until):
+                    logger.warning(f"Outbox lease expired for {[item.id for item in items]}, left to the new owner")
+                    continue
+                try:
+                    if digest_text is None:
+                        _deliver(items[0])
+                    else:
+                        _deliver_digest(digest_text, digest_parse_mode, items)
+                except ApiTelegramException as e:
+                    # 4xx (кроме 429, который обрабатывает sender) не исправится повтором
+                    error_code = e.error_code or 0
+                    for item in items:
+                        _mark_failed_attempt(item, e, permanent=400 <= error_code < 500 and error_code != 429)
+                except Exception as e:
+                    for item in items:
+                        _mark_failed_attempt(item, e, permanent=False)
+                else:
+                    # Отмечаем сразу: до конца пачки аренда этих записей могла бы истечь
+                    NotificationOutbox.objects.filter(id__in=[item.id for item in items]).update(
+                        status='sent', sent_at=timezone.now()
+                    )
+                    sent += len(items)
+
+
+def _drainer_loop() -> None:
+    while True:
+        _wakeup.wait(settings.OUTBOX_POLL_INTERVAL)
+        _wakeup.clear()
+        try:
+            drain_outbox()
+        except Exception as e:
+            logger.error(f"Outbox drainer error: {e}")
+        finally:
+            close_old_connections()
+
+
+def kick_outbox_drainer() -> None:
+    """Будит фоновый поток отправки (запускает его при первом вызове)"""
+    global _drainer
+    with _drainer_lock:
+        if _drainer is None or not _drainer.is_alive():
+            _drainer = threading.Thread(target=_drainer_loop, name='outbox-drainer', daemon=True)
+            _drainer.start()
+    _wakeup.set()
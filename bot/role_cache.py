@@ -0,0 +1,68 @@
+"""
+Кэш ролей пользователей.
+
+Проверка доступа к задаче и выборка "моих задач" нужны на каждое действие,
+а роли пользователя меняются редко (через админку или при удалении роли).
+Набор id ролей пользователя хранится в кэше Django (CACHES[ROLE_CACHE_ALIAS]);
+при изменении User.roles, удалении роли или пользователя запись сбрасывается
+сигналами из bot/signals.py. Сброс в локальном для процесса кэше (LocMem)
+не виден другим процессам, поэтому там записи живут ROLE_CACHE_LOCAL_TTL
+секунд, а в общем (Redis/Memcached/таблица БД) - ROLE_CACHE_SHARED_TTL.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+from bot import logger
+
+
+def _cache():
+    return caches[settings.ROLE_CACHE_ALIAS]
+
+
+def role_cache_ttl() -> int:
+    """Время жизни записи: ROLE_CACHE_TTL, если задан, иначе по тому, общий ли кэш для процессов"""
+    if settings.ROLE_CACHE_TTL is not None:
+        return settings.ROLE_CACHE_TTL
+    if isinstance(_cache(), (LocMemCache, DummyCache)):
+        return settings.ROLE_CACHE_LOCAL_TTL
+    return settings.ROLE_CACHE_SHARED_TTL
+
+
+def _cache_key(telegram_id) -> str:
+    return f"user_roles:{telegram_id}"
+
+
+def get_user_role_ids(user) -> frozenset:
+    """Множество id ролей пользователя (принимает User или Telegram ID)"""
+    telegram_id = getattr(user, 'telegram_id', user)
+    key = _cache_key(telegram_id)
+    try:
+        role_ids = _cache().get(key)
+    except Exception as e:
+        logger.warning(f"Role cache is unavailable: {e}")
+        role_ids = None
+    if role_ids is not None:
+        return role_ids
+
+    from bot.models import User
+    role_ids = frozenset(
+        User.roles.through.objects.filter(user_id=telegram_id).values_list('role_id', flat=True)
+    )
+    try:
+        _cache().set(key, role_ids, timeout=role_cache_ttl())
+    except Exception as e:
+        logger.warning(f"Role cache is unavailable: {e}")
+    return role_ids
+
+
+def invalidate_user_roles(telegram_ids) -> None:
+    """Сбрасывает закэшированные роли указанных пользователей"""
+    keys = [_cache_key(telegram_id) for telegram_id in telegram_ids]
+    if not keys:
+        return
+    try:
+        _cache().delete_many(keys)
+    except Exception as e:
+        logger.warning(f"Role cache is unavailable: {e}")
@@ -0,0 +1,99 @@
+"""
+Маршрутизация callback-запросов.
+
+Вместо десятков фильтров callback_query_handler, которые telebot проверяет
+по очереди для каждого нажатия, все callback'и проходят через один
+обработчик: точные значения callback_data ищутся в словаре, префиксы
+(task_view_, subtask_toggle_, calendar_, ...) - в префиксном дереве.
+Аргументы после префикса разбираются один раз и передаются обработчику
+уже приведенными к нужным типам.
+"""
+from telebot.types import CallbackQuery
+
+from bot import bot, logger
+
+
+def optional_int(value: str):
+    """Конвертер для аргументов вида '15' / 'none'"""
+    return None if value == 'none' else int(value)
+
+
+class _Route:
+    __slots__ = ('handler', 'converters')
+
+    def __init__(self, handler, converters):
+        self.handler = handler
+        self.converters = converters
+
+    def parse(self, suffix: str) -> tuple:
+        if not self.converters:
+            return ()
+        # Последний аргумент забирает остаток строки (значения могут содержать '_')
+        parts = suffix.split('_', len(self.converters) - 1)
+        if len(parts) != len(self.converters):
+            raise ValueError(f"Expected {len(self.converters)} arguments, got {len(parts)}")
+        return tuple(convert(part) for convert, part in zip(self.converters, parts))
+
+
+class CallbackRouter:
+    def __init__(self):
+        self._exact = {}
+        self._trie = {}
+
+    def exact(self, data: str, handler) -> None:
+        """Регистрирует обработчик для точного значения callback_data"""
+        self._exact[data] = handler
+
+    def prefix(self, prefix: str, handler, *converters) -> None:
+        """
+        Регистрирует обработчик для callback_data, начинающихся с prefix.
+        Остаток строки делится по '_' и приводится конвертерами; результат
+        передается обработчику позиционными аргументами после call.
+        """
+        node = self._trie
+        for char in prefix:
+            node = node.setdefault(char, {})
+        node[None] = _Route(handler, converters)
+
+    def resolve(self, data: str):
+        """Возвращает (обработчик, аргументы) или None, если маршрут не найден"""
+        handler = self._exact.get(data)
+        if handler is not None:
+            return handler, ()
+
+        # Ищем самый длинный зарегистрированный префикс
+        node = self._trie
+        match = None
+        for position, char in enumerate(data, 1):
+            node = node.get(char)
+            if node is None:
+                break
+            route = node.get(None)
+            if route is not None:
+                match = (route, position)
+        if match is None:
+            return None
+        route, end = match
+        return route.handler, route.parse(data[end:])
+
+    def dispatch(self, call: CallbackQuery) -> None:
+        data = call.data or ''
+        try:
+            resolved = self.resolve(data)
+        except ValueError as e:
+            logger.warning(f"Invalid callback data '{data}': {e}")
+            try:
+                bot.answer_callback_query(call.id, "❌ Неверный формат данных", show_alert=True)
+            except Exception:
+                pass
+            return
+
+        if resolved is None:
+            logger.warning(f"No handler for callback data '{data}'")
+            return
+
+        handler, args = resolved
+        handler(call, *args)
+
+
+callback_router = CallbackRouter()
@@ -5,9 +5,10 @@ from apscheduler.executors.pool import ThreadPoolExecutor
 from django.utils import timezone
 from datetime import timedelta
 import logging
-from bot import bot
+from bot.outbox import queue_notification
 from bot.models import Task, User
-from bot.handlers.utils import format_task_info, get_or_create_user
+from bot.handlers.utils import format_task_info, get_or_create_user, task_view_queryset
+from bot.formatting import escape_md
 from bot.keyboards import get_task_actions_markup
 from telebot.types import InlineKeyboardButton, InlineKeyboardMarkup
 
@@ -66,31 +67,29 @@ def send_daily_reminders():
                 if urgent_tasks:
                     reminder_text += "\n🚨 **ПРОСРОЧЕННЫЕ:**\n"
                     for task in urgent_tasks:
-                        reminder_text += f"• {task.title} (был до {timezone.localtime(task.due_date).strftime('%d.%m')})\n"
+                        reminder_text += f"• {escape_md(task.title)} (был до {timezone.localtime(task.due_date).strftime('%d.%m')})\n"
                 
                 if today_tasks:
                     reminder_text += "\n📅 **НА СЕГОДНЯ:**\n"
                     for task in today_tasks:
-                        reminder_text += f"• {task.title} (до {timezone.localtime(task.due_date).strftime('%H:%M')})\n"
+                        reminder_text += f"• {escape_md(task.title)} (до {timezone.localtime(task.due_date).strftime('%H:%M')})\n"
                 
                 if upcoming_tasks:
                     reminder_text += "\n📆 **СКОРО (3 дня):**\n"
                     for task in upcoming_tasks:
-                        reminder_text += f"• {task.title} ({timezone.localtime(task.due_date).strftime('%d.%m')})\n"
+                        reminder_text += f"• {escape_md(task.title)} ({timezone.localtime(task.due_date).strftime('%d.%m')})\n"
                 
                 if no_date_tasks and not (urgent_tasks or today_tasks):
                     reminder_text += "\n📝 **БЕЗ СРОКА:**\n"
                     for task in no_date_tasks[:5]:
-                        reminder_text += f"• {task.title}\n"
+                        reminder_text += f"• {escape_md(task.title)}\n"
 
                 markup = InlineKeyboardMarkup()
                 markup.add(InlineKeyboardButton("� Мои задачи", callback_data="tasks"))
                 
-                try:
-                    bot.send_message(user.telegram_id, reminder_text, reply_markup=markup, parse_mode='Markdown')
-                    logger.info(f"Sent daily reminder to user {user.telegram_id}")
-                except Exception as e:
-                    logger.error(f"Failed to send reminder to user {user.telegram_id}: {e}")
+                queue_notification(user.telegram_id, reminder_text, reply_markup=markup, parse_mode='Markdown',
+                                   idempotency_key=f"daily_reminder:{user.telegram_id}:{now.date()}")
+                logger.info(f"Queued daily reminder to user {user.telegram_id}")
             except Exception as e:
                 logger.error(f"Error processing reminders for user {user.telegram_id}: {e}")
     except Exception as e:
@@ -103,7 +102,7 @@ def send_due_date_reminders():
         tomorrow_start = tomorrow.replace(hour=0, minute=0, second=0, microsecond=0)
         tomorrow_end = tomorrow.replace(hour=23, minute=59, second=59, microsecond=999999)
         
-        due_tasks = Task.objects.filter(
+        due_tasks = task_view_queryset().filter(
             status='active',
             due_date__range=(tomorrow_start, tomorrow_end)
         )
@@ -111,14 +110,15 @@ def send_due_date_reminders():
         for task in due_tasks:
             try:
                 reminder_text = f"⏰ **НАПОМИНАНИЕ: СРОК ЗАВТРА**\n\nЗавтра истекает срок выполнения задачи:\n\n"
-                reminder_text += format_task_info(task)
+                reminder_text += format_task_info(task, markdown=True)
                 reminder_text += "\n\nПожалуйста, не забудьте завершить её вовремя!"
                 
                 markup = get_task_actions_markup(task.id, task.status, task.report_attachments, False, True)
                 markup.add(InlineKeyboardButton("📋 К списку задач", callback_data="tasks"))
                 
-                bot.send_message(task.assignee.telegram_id, reminder_text, reply_markup=markup, parse_mode='Markdown')
-                logger.info(f"Sent due date reminder for task {task.id} to user {task.assignee.telegram_id}")
+                queue_notification(task.assignee.telegram_id, reminder_text, reply_markup=markup, parse_mode='Markdown',
+                                   idempotency_key=f"due_tomorrow:{task.id}:{tomorrow.date()}", task=task, coalesce=True)
+                logger.info(f"Queued due date reminder for task {task.id} to user {task.assignee.telegram_id}")
             except Exception as e:
                 logger.error(f"Error processing due date reminder for task {task.id}: {e}")
     except Exception as e:
@@ -126,20 +126,30 @@ def send_due_date_reminders():
 
 def send_task_specific_reminder(task_id):
     try:
-        task = Task.objects.get(id=task_id, status='active')
+        task = task_view_queryset().get(id=task_id, status='active')
         reminder_text = f"💡 **НАПОМИНАНИЕ О ЗАДАЧЕ**\n\nНапоминаем о выполнении задачи:\n\n"
-        reminder_text += format_task_info(task)
+        reminder_text += format_task_info(task, markdown=True)
         
         markup = get_task_actions_markup(task.id, task.status, task.report_attachments, False, True)
         markup.add(InlineKeyboardButton("📋 К списку задач", callback_data="tasks"))
         
-        bot.send_message(task.assignee.telegram_id, reminder_text, reply_markup=markup, parse_mode='Markdown')
-        logger.info(f"Sent personal reminder for task {task.id}")
+        queue_notification(task.assignee.telegram_id, reminder_text, reply_markup=markup, parse_mode='Markdown',
+                           idempotency_key=f"due_in_24h:{task.id}:{task.due_date.isoformat()}", task=task, coalesce=True)
+        logger.info(f"Queued personal reminder for task {task.id}")
     except Task.DoesNotExist:
         logger.warning(f"Task {task_id} not found for reminder")
     except Exception as e:
         logger.error(f"Error sending personal reminder for task {task_id}: {e}")
 
+def drain_notification_outbox():
+    try:
+        from bot.outbox import drain_outbox
+        sent = drain_outbox()
+        if sent:
+            logger.info(f"Sent {sent} notifications from outbox")
+    except Exception as e:
+        logger.error(f"Error in drain_notification_outbox: {e}")
+
 def start_scheduler():
     if scheduler.running:
         logger.info("Scheduler is already running")
@@ -161,6 +171,15 @@ def start_scheduler():
             name='Due date reminders',
             replace_existing=True
         )
+        # Досылка уведомлений из outbox (например, оставшихся после перезапуска)
+        scheduler.add_job(
+            drain_notification_outbox,
+            trigger='interval',
+            minutes=1,
+            id='drain_outbox',
+            name='Notification outbox drainer',
+            replace_existing=True
+        )
         scheduler.start()
         logger.info("Scheduler started successfully")
     except Exception as e:
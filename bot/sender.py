@@ -0,0 +1,419 @@
+"""
+Исходящие вызовы Telegram Bot API с ограничением частоты.
+
+Telegram ограничивает бота примерно 30 сообщениями в секунду суммарно и
+около одного сообщения в секунду в один чат. Диспетчер держит два вида
+token bucket (общий и по чатам), а при ответе 429 читает retry_after,
+приостанавливает чат и ставит сообщение обратно в очередь вместо того,
+чтобы потерять его. Сообщения одного чата из очереди уходят в порядке
+submit(): следующее ждет, пока предыдущее не будет отправлено или отброшено.
+
+    outbound.submit('send_message', chat_id, text=...)  # в очередь, без ожидания
+    outbound.call('send_photo', chat_id, photo=...)      # синхронно, с ожиданием лимитов
+
+Прямые вызовы bot.send_message / edit_message_text / send_photo из обработчиков
+тоже проходят через лимиты: get_bot() подключает outbound.send_request как
+apihelper.CUSTOM_REQUEST_SENDER, и каждый HTTP-запрос, отправляющий сообщение,
+сначала берет токены, а ответ 429 выдерживается и повторяется.
+"""
+import heapq
+import itertools
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+
+import requests
+from django.conf import settings
+from django.db import close_old_connections
+from telebot import apihelper
+from telebot.apihelper import ApiTelegramException
+
+from bot import bot, logger
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def wait_time(self, now: float) -> float:
+        """Сколько секунд осталось до появления токена (0 - можно отправлять)"""
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self) -> None:
+        self.tokens -= 1
+
+    def refund(self) -> None:
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+
+# Методы Bot API, которые Telegram учитывает в лимитах сообщений (sendMessage, editMessageText, copyMessage, ...)
+_RATE_LIMITED_METHOD = re.compile(r'^(send|edit|copy|forward)', re.IGNORECASE)
+
+# Поток уже взял токены для текущего вызова (внутри call() и фонового потока очереди)
+_local = threading.local()
+
+
+def get_retry_after(error: ApiTelegramException):
+    """Возвращает retry_after (сек) для ответа 429, иначе None"""
+    if getattr(error, 'error_code', None) != 429:
+        return None
+    result_json = getattr(error, 'result_json', None) or {}
+    retry_after = (result_json.get('parameters') or {}).get('retry_after')
+    if retry_after is None:
+        match = re.search(r'retry after (\d+)', str(error).lower())
+        retry_after = int(match.group(1)) if match else 1
+    return float(retry_after)
+
+
+class SendDeadlineExceeded(Exception):
+    """Лимиты не позволяют отправить сообщение до заданного срока"""
+
+
+class _Job:
+    __slots__ = ('method', 'chat_id', 'kwargs', 'attempts')
+
+    def __init__(self, method: str, chat_id, kwargs: dict):
+        self.method = method
+        self.chat_id = chat_id
+        self.kwargs = kwargs
+        self.attempts = 0
+
+
+class OutboundDispatcher:
+    MAX_CHAT_BUCKETS = 10000
+
+    def __init__(self):
+        self._global_bucket = TokenBucket(settings.TELEGRAM_GLOBAL_RATE, settings.TELEGRAM_GLOBAL_RATE)
+        self._chat_buckets = OrderedDict()
+        self._paused_until = {}
+        self._heap = []
+        self._sequence = itertools.count()
+        # Порядок отправки внутри чата: chat_id -> порядковые номера еще не завершенных задач.
+        # Задача, перед которой в чате есть незавершенная, ждет в _parked, пока та не завершится
+        self._chat_order = {}
+        self._parked = {}
+        self._in_flight = 0
+        self._sent_times = deque()
+        self._sent_total = 0
+        self._failed_total = 0
+        self._retried_total = 0
+        self._dropped_total = 0
+        self._condition = threading.Condition()
+        self._worker = None
+
+    # --- лимиты ---
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        key = str(chat_id)
+        bucket = self._chat_buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(settings.TELEGRAM_CHAT_RATE, settings.TELEGRAM_CHAT_BURST)
+            self._chat_buckets[key] = bucket
+            if len(self._chat_buckets) > self.MAX_CHAT_BUCKETS:
+                self._chat_buckets.popitem(last=False)
+        else:
+            self._chat_buckets.move_to_end(key)
+        return bucket
+
+    def _reserve(self, chat_id) -> float:
+        """
+        Берет токены общего и чатового лимита. Возвращает время ожидания, если рано.
+        Без chat_id (например, правка inline-сообщения) учитывается только общий лимит.
+        """
+        now = time.monotonic()
+        wait = self._global_bucket.wait_time(now)
+        chat_bucket = None
+        if chat_id is not None:
+            key = str(chat_id)
+            paused_until = self._paused_until.get(key)
+            if paused_until is not None:
+                if paused_until <= now:
+                    del self._paused_until[key]
+                else:
+                    wait = max(wait, paused_until - now)
+            chat_bucket = self._chat_bucket(chat_id)
+            wait = max(wait, chat_bucket.wait_time(now))
+        if wait > 0:
+            return wait
+        self._global_bucket.consume()
+        if chat_bucket is not None:
+            chat_bucket.consume()
+        return 0.0
+
+    def _acquire(self, chat_id, deadline: float = None) -> None:
+        """Ждет в текущем потоке, пока лимиты не позволят отправку (но не дольше deadline)"""
+        while True:
+            with self._condition:
+                wait = self._reserve(chat_id)
+            if wait <= 0:
+                return
+            if deadline is not None and time.monotonic() + wait > deadline:
+                raise SendDeadlineExceeded(f"Chat {chat_id} is rate limited for {wait:.1f}s")
+            time.sleep(wait)
+
+    def _pause_chat(self, chat_id, seconds: float) -> None:
+        now = time.monotonic()
+        # Истекшие паузы удаляются, чтобы словарь не рос вместе с числом чатов
+        for key in [key for key, until in self._paused_until.items() if until <= now]:
+            del self._paused_until[key]
+        if chat_id is not None:
+            self._paused_until[str(chat_id)] = now + seconds
+
+    def _record_failed(self, chat_id) -> None:
+        """Запрос отклонен (не 429): сообщение не отправлено, взятые токены возвращаются"""
+        self._failed_total += 1
+        self._global_bucket.refund()
+        if chat_id is not None and str(chat_id) in self._chat_buckets:
+            self._chat_buckets[str(chat_id)].refund()
+
+    def _record_sent(self) -> None:
+        """Учитывается только успешная отправка"""
+        now = time.monotonic()
+        self._sent_total += 1
+        self._sent_times.append(now)
+        while self._sent_times and now - self._sent_times[0] > 60:
+            self._sent_times.popleft()
+
+    # --- синхронная отправка ---
+
+    def call(self, method: str, chat_id, deadline: float = None, **kwargs):
+        """
+        Выполняет вызов API сразу (в текущем потоке), дожидаясь лимитов.
+        При 429 ждет retry_after и повторяет; остальные ошибки пробрасывает.
+        deadline (time.monotonic()) - не ждать дольше: если лимиты требуют большего,
+        пробрасывается SendDeadlineExceeded, а ответ 429 - как ApiTelegramException.
+        """
+        attempts = 0
+        while True:
+            self._acquire(chat_id, deadline)
+            try:
+                result = self._invoke(method, chat_id, kwargs)
+            except ApiTelegramException as e:
+                retry_after = get_retry_after(e)
+                attempts += 1
+                if retry_after is None:
+                    with self._condition:
+                        self._record_failed(chat_id)
+                    raise
+                if attempts > settings.TELEGRAM_SEND_RETRIES:
+                    raise
+                if deadline is not None and time.monotonic() + retry_after > deadline:
+                    with self._condition:
+                        self._pause_chat(chat_id, retry_after)
+                    raise
+                with self._condition:
+                    self._pause_chat(chat_id, retry_after)
+                    self._retried_total += 1
+                logger.warning(f"Flood limit for chat {chat_id}, retrying {method} in {retry_after}s")
+                continue
+            with self._condition:
+                self._record_sent()
+            return result
+
+    def _invoke(self, method: str, chat_id, kwargs: dict):
+        """Вызов метода бота, для которого токены уже взяты (send_request их повторно не берет)"""
+        _local.reserved = True
+        try:
+            return getattr(bot, method)(chat_id=chat_id, **kwargs)
+        finally:
+            _local.reserved = False
+
+    # --- прямые вызовы из обработчиков ---
+
+    def send_request(self, http_method: str, url: str, **kwargs):
+        """
+        apihelper.CUSTOM_REQUEST_SENDER: выполняет HTTP-запрос к Bot API.
+        Запросы, отправляющие сообщения, ждут токены общего и чатового лимита;
+        на ответ 429 чат приостанавливается на retry_after, и запрос повторяется.
+        """
+        session = apihelper.session or requests
+        if getattr(_local, 'reserved', False) or not _RATE_LIMITED_METHOD.match(url.rsplit('/', 1)[-1]):
+            return session.request(http_method, url, **kwargs)
+
+        chat_id = (kwargs.get('params') or {}).get('chat_id')
+        attempts = 0
+        while True:
+            self._acquire(chat_id)
+            response = session.request(http_method, url, **kwargs)
+            # Файлы из потоков уже прочитаны - такой запрос не повторяем, ошибку получит вызывающий код
+            if response.status_code != 429 or kwargs.get('files') or attempts >= settings.TELEGRAM_SEND_RETRIES:
+                if response.status_code == 429:
+                    self._pause_after(response, chat_id)
+                else:
+                    with self._condition:
+                        if response.ok:
+                            self._record_sent()
+                        else:
+                            self._record_failed(chat_id)
+                return response
+            attempts += 1
+            retry_after = self._pause_after(response, chat_id)
+            logger.warning(f"Flood limit for chat {chat_id}, retrying {url.rsplit('/', 1)[-1]} in {retry_after}s")
+            if chat_id is None:
+                # Пауза хранится по чатам: без chat_id выжидаем здесь
+                time.sleep(retry_after)
+
+    def _pause_after(self, response, chat_id) -> float:
+        try:
+            retry_after = float(response.json()['parameters']['retry_after'])
+        except Exception:
+            retry_after = 1.0
+        with self._condition:
+            self._pause_chat(chat_id, retry_after)
+            self._retried_total += 1
+        return retry_after
+
+    # --- очередь ---
+
+    def submit(self, method: str, chat_id, **kwargs) -> None:
+        """Ставит вызов API в очередь; он будет выполнен фоновым потоком с учетом лимитов"""
+        with self._condition:
+            self._ensure_worker()
+            sequence = next(self._sequence)
+            if chat_id is not None:
+                self._chat_order.setdefault(str(chat_id), deque()).append(sequence)
+            heapq.heappush(self._heap, (time.monotonic(), sequence, _Job(method, chat_id, kwargs)))
+            self._condition.notify()
+
+    def _ensure_worker(self) -> None:
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._worker_loop, name='outbound-dispatcher', daemon=True)
+            self._worker.start()
+
+    def _requeue(self, delay: float, sequence: int, job: _Job) -> None:
+        # Порядок внутри чата держит _chat_order: более поздние задачи чата не обгонят повторяемую
+        heapq.heappush(self._heap, (time.monotonic() + delay, sequence, job))
+
+    def _is_chat_head(self, sequence: int, job: _Job) -> bool:
+        """Нет ли в чате более ранней незавершенной задачи (иначе задача откладывается в _parked)"""
+        if job.chat_id is None:
+            return True
+        return self._chat_order[str(job.chat_id)][0] == sequence
+
+    def _finish(self, job: _Job) -> None:
+        """Задача завершена (отправлена или отброшена): следующая задача чата возвращается в очередь"""
+        if job.chat_id is None:
+            return
+        key = str(job.chat_id)
+        order = self._chat_order[key]
+        order.popleft()
+        if not order:
+            del self._chat_order[key]
+        for entry in self._parked.pop(key, []):
+            heapq.heappush(self._heap, entry)
+
+    def _worker_loop(self) -> None:
+        while True:
+            with self._condition:
+                while True:
+                    if not self._heap:
+                        self._condition.wait()
+                        continue
+                    ready_at, sequence, job = self._heap[0]
+                    delay = ready_at - time.monotonic()
+                    if delay > 0:
+                        self._condition.wait(delay)
+                        continue
+                    heapq.heappop(self._heap)
+                    if not self._is_chat_head(sequence, job):
+                        self._parked.setdefault(str(job.chat_id), []).append((ready_at, sequence, job))
+                        continue
+                    wait = self._reserve(job.chat_id)
+                    if wait > 0:
+                        self._requeue(wait, sequence, job)
+                        continue
+                    self._in_flight += 1
+                    break
+            finished = True
+            try:
+                finished = self._execute(sequence, job)
+            finally:
+                close_old_connections()
+                with self._condition:
+                    if finished:
+                        self._finish(job)
+                    self._in_flight -= 1
+                    self._condition.notify_all()
+
+    def _execute(self, sequence: int, job: _Job) -> bool:
+        """Выполняет задачу. Возвращает False, если она поставлена на повтор"""
+        job.attempts += 1
+        try:
+            self._invoke(job.method, job.chat_id, job.kwargs)
+        except ApiTelegramException as e:
+            retry_after = get_retry_after(e)
+            if retry_after is not None and job.attempts <= settings.TELEGRAM_SEND_RETRIES:
+                logger.warning(f"Flood limit for chat {job.chat_id}, requeue {job.method} in {retry_after}s")
+                with self._condition:
+                    self._pause_chat(job.chat_id, retry_after)
+                    self._requeue(retry_after, sequence, job)
+                    self._retried_total += 1
+                return False
+            if job.kwargs.get('parse_mode') and "can't parse entities" in str(e).lower():
+                # Повторяем без разметки, как и safe_edit_or_send_message
+                job.kwargs.pop('parse_mode')
+                with self._condition:
+                    self._record_failed(job.chat_id)
+                    self._requeue(0, sequence, job)
+                return False
+            logger.error(f"Failed to {job.method} to {job.chat_id}: {e}")
+            with self._condition:
+                if retry_after is None:
+                    self._record_failed(job.chat_id)
+                self._dropped_total += 1
+        except Exception as e:
+            if job.attempts <= settings.TELEGRAM_SEND_RETRIES:
+                delay = min(60, 2 ** job.attempts)
+                logger.warning(f"Error on {job.method} to {job.chat_id}: {e}, retry in {delay}s")
+                with self._condition:
+                    self._requeue(delay, sequence, job)
+                    self._retried_total += 1
+                return False
+            logger.error(f"Failed to {job.method} to {job.chat_id} after {job.attempts} attempts: {e}")
+            with self._condition:
+                self._dropped_total += 1
+        else:
+            with self._condition:
+                self._record_sent()
+        return True
+
+    def flush(self, timeout: float = 60.0) -> bool:
+        """Ждет отправки всей очереди (для разовых процессов: cron-команд и т.п.)"""
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while self._heap or self._parked or self._in_flight:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._condition.wait(min(remaining, 0.5))
+        return True
+
+    def stats(self) -> dict:
+        with self._condition:
+            now = time.monotonic()
+            recent = sum(1 for sent_at in self._sent_times if now - sent_at <= 60)
+            return {
+                'queue_depth': len(self._heap) + sum(len(parked) for parked in self._parked.values()),
+                'in_flight': self._in_flight,
+                'paused_chats': sum(1 for until in self._paused_until.values() if until > now),
+                'sent_per_minute': recent,
+                'sent_per_second': round(recent / 60, 2),
+                'sent_total': self._sent_total,
+                'failed_total': self._failed_total,
+                'retried_total': self._retried_total,
+                'dropped_total': self._dropped_total,
+            }
+
+
+outbound = OutboundDispatcher()
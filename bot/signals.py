@@ -0,0 +1,78 @@
+"""
+Сброс кэша ролей (bot/role_cache.py) при изменении состава ролей и кэша числа
+задач в списках (bot/task_list_cache.py) при изменении задач и ролей
+"""
+from django.db.models.signals import m2m_changed, pre_delete, post_delete, post_save
+from django.dispatch import receiver
+
+from bot.models import Role, Task, User
+from bot.role_cache import invalidate_user_roles as _invalidate_role_cache
+from bot.task_list_cache import invalidate_task_list_counts
+
+
+def invalidate_user_roles(telegram_ids) -> None:
+    # От ролей зависит и список "Мои задачи": сбрасываем оба кэша
+    telegram_ids = list(telegram_ids)
+    _invalidate_role_cache(telegram_ids)
+    invalidate_task_list_counts(telegram_ids)
+
+
+@receiver(m2m_changed, sender=User.roles.through)
+def user_roles_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        # user.roles.add/remove/clear/set
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            invalidate_user_roles([instance.pk])
+        return
+
+    # role.users.add/remove/clear/set: затронуты пользователи из pk_set
+    if action == 'pre_clear':
+        # После очистки pk_set не передается, поэтому запоминаем пользователей заранее
+        instance._cleared_user_ids = list(instance.users.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        invalidate_user_roles(getattr(instance, '_cleared_user_ids', []))
+    elif action in ('post_add', 'post_remove'):
+        invalidate_user_roles(pk_set or [])
+
+
+@receiver(pre_delete, sender=Role)
+def role_deleting(sender, instance, **kwargs):
+    # Связи удаляются каскадно без m2m_changed: запоминаем участников роли до удаления
+    instance._member_ids = list(instance.users.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Role)
+def role_deleted(sender, instance, **kwargs):
+    invalidate_user_roles(getattr(instance, '_member_ids', []))
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    invalidate_user_roles([instance.pk])
+
+
+def _task_list_users(task: Task) -> set:
+    """Создатель и исполнители задачи (прежние и текущие), включая участников ролей"""
+    user_ids = {task.creator_id, task.assignee_id}
+    role_ids = {task.assigned_role_id}
+    saved = getattr(task, '_saved_assignment', None)
+    if saved:
+        user_ids.update(saved[:2])
+        role_ids.add(saved[2])
+    role_ids.discard(None)
+    if role_ids:
+        user_ids.update(User.roles.through.objects.filter(role_id__in=role_ids).values_list('user_id', flat=True))
+    user_ids.discard(None)
+    return user_ids
+
+
+@receiver(post_save, sender=Task)
+def task_saved(sender, instance, created, update_fields=None, **kwargs):
+    if created or update_fields is None or Task.TASK_LIST_FIELDS.intersection(update_fields):
+        invalidate_task_list_counts(_task_list_users(instance))
+    instance._saved_assignment = (instance.creator_id, instance.assignee_id, instance.assigned_role_id)
+
+
+@receiver(post_delete, sender=Task)
+def task_deleted(sender, instance, **kwargs):
+    invalidate_task_list_counts(_task_list_users(instance))
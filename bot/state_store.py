@@ -0,0 +1,129 @@
+"""
+Хранилища состояния диалога (UserState).
+
+STATE_BACKEND=db (по умолчанию) - каждое изменение сразу пишется в таблицу UserState.
+STATE_BACKEND=memory - состояние живет в памяти процесса с TTL, а изменения
+сбрасываются в UserState фоновым потоком раз в STATE_FLUSH_INTERVAL секунд и при
+завершении процесса. Если состояния нет в памяти (после перезапуска или истечения
+TTL), оно читается из БД. Такой режим рассчитан на один процесс бота (или на
+маршрутизацию всех обновлений чата в один процесс).
+"""
+import atexit
+import copy
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from bot import logger
+
+
+class DatabaseStateStore:
+    def load(self, chat_id) -> dict:
+        from bot.handlers.utils import _load_state
+        return _load_state(chat_id)
+
+    def save(self, chat_id, state: dict) -> None:
+        from bot.handlers.utils import _save_state
+        _save_state(chat_id, state)
+
+    def delete(self, chat_id) -> None:
+        from bot.handlers.utils import _delete_state
+        _delete_state(chat_id)
+
+    def flush(self) -> None:
+        pass
+
+
+class MemoryStateStore(DatabaseStateStore):
+    def __init__(self, ttl: float, flush_interval: float):
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+        # chat_id -> (состояние или None, если удалено; момент истечения)
+        self._entries = {}
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._flusher = None
+
+    def _ensure_flusher(self) -> None:
+        if self._flusher is None or not self._flusher.is_alive():
+            self._flusher = threading.Thread(target=self._flusher_loop, name='state-flusher', daemon=True)
+            self._flusher.start()
+            atexit.register(self.flush)
+
+    def load(self, chat_id) -> dict:
+        key = str(chat_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry[1] > time.monotonic() or key in self._dirty):
+                return copy.deepcopy(entry[0]) if entry[0] else {}
+        state = super().load(key)
+        with self._lock:
+            # Пока читали из БД, состояние могли изменить - не затираем его
+            if key not in self._dirty:
+                self._entries[key] = (state, time.monotonic() + self.ttl)
+        return copy.deepcopy(state)
+
+    def _put(self, key: str, state) -> None:
+        with self._lock:
+            self._ensure_flusher()
+            self._entries[key] = (state, time.monotonic() + self.ttl)
+            self._dirty.add(key)
+
+    def save(self, chat_id, state: dict) -> None:
+        key = str(chat_id)
+        state = copy.deepcopy(state) if state else {}
+        if state.get('state') is None:
+            # Как и при записи в БД: если state не указан, сохраняем текущий
+            state['state'] = self.load(key).get('state', '')
+        self._put(key, state)
+
+    def delete(self, chat_id) -> None:
+        self._put(str(chat_id), None)
+
+    def flush(self) -> None:
+        """Записывает в БД все измененные состояния"""
+        with self._flush_lock:
+            with self._lock:
+                pending = {key: self._entries[key][0] for key in self._dirty}
+                self._dirty.clear()
+            for key, state in pending.items():
+                try:
+                    if state:
+                        super().save(key, state)
+                    else:
+                        super().delete(key)
+                except Exception as e:
+                    logger.error(f"Failed to persist state for {key}: {e}")
+                    with self._lock:
+                        self._dirty.add(key)
+
+    def _evict_expired(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            expired = [key for key, (_, expires_at) in self._entries.items()
+                       if expires_at <= now and key not in self._dirty]
+            for key in expired:
+                del self._entries[key]
+
+    def _flusher_loop(self) -> None:
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+                self._evict_expired()
+            except Exception as e:
+                logger.error(f"State flusher error: {e}")
+            finally:
+                close_old_connections()
+
+
+def _create_store():
+    if settings.STATE_BACKEND == 'memory':
+        return MemoryStateStore(settings.STATE_TTL, settings.STATE_FLUSH_INTERVAL)
+    return DatabaseStateStore()
+
+
+state_store = _create_store()
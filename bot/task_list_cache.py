@@ -0,0 +1,55 @@
+"""
+Кэш числа задач в списках "Мои задачи" / "Созданные мной".
+
+Число задач выводится на каждой странице списка, поэтому кэшируется на
+TASK_LIST_COUNT_TTL секунд по ключу (пользователь, список, фильтр). При
+сохранении или удалении задачи сигналы из bot/signals.py сбрасывают записи
+создателя и исполнителей - прежних и новых, включая участников роли. Массовые
+Task.objects.update() сигналов не вызывают; для них, как и для задач, ставших
+просроченными со временем, остается TTL.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from bot import logger
+
+
+def _cache_key(telegram_id, view: str, status_filter: str) -> str:
+    return f"task_list_count:{telegram_id}:{view}:{status_filter}"
+
+
+def get_task_list_count(telegram_id, view: str, status_filter: str, count) -> int:
+    """Число задач из кэша; при промахе вызывает count() и кэширует результат"""
+    key = _cache_key(telegram_id, view, status_filter)
+    try:
+        value = cache.get(key)
+    except Exception as e:
+        logger.warning(f"Task list cache is unavailable: {e}")
+        value = None
+    if value is not None:
+        return value
+
+    value = count()
+    try:
+        cache.set(key, value, timeout=settings.TASK_LIST_COUNT_TTL)
+    except Exception as e:
+        logger.warning(f"Task list cache is unavailable: {e}")
+    return value
+
+
+def invalidate_task_list_counts(telegram_ids) -> None:
+    """Сбрасывает закэшированные числа задач указанных пользователей во всех списках и фильтрах"""
+    from bot.keyboards import TASK_LIST_VIEW_FILTERS
+
+    keys = [
+        _cache_key(telegram_id, view, status_filter)
+        for telegram_id in set(telegram_ids)
+        for view, filters in TASK_LIST_VIEW_FILTERS.items()
+        for status_filter in filters
+    ]
+    if not keys:
+        return
+    try:
+        cache.delete_many(keys)
+    except Exception as e:
+        logger.warning(f"Task list cache is unavailable: {e}")
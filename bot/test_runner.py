@@ -0,0 +1,19 @@
+"""
+Запуск тестов без обращений к Telegram.
+
+get_bot() при первом вызове выполняет set_my_commands и get_me, а модули
+обработчиков обращаются к боту уже при импорте (регистрация хендлеров). Раннер
+подставляет бота без сетевых вызовов до того, как тесты начнут импортироваться.
+"""
+import telebot
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+import bot as bot_package
+
+
+class OfflineBotTestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        if bot_package._bot is None:
+            bot_package._bot = telebot.TeleBot(settings.BOT_TOKEN or '123456:test', threaded=False)
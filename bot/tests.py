@@ -0,0 +1,395 @@
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from bot.models import User, Task, Subtask, TaskComment
+
+
+class TaskViewQueriesTest(TestCase):
+    """Бюджет запросов экрана задачи (task_view_queryset / get_task_for_view)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.creator = User.objects.create(telegram_id='1001', user_name='creator', first_name='Анна')
+        cls.assignee = User.objects.create(telegram_id='1002', user_name='assignee', first_name='Петр')
+        cls.task = Task.objects.create(
+            title='Отчет за квартал',
+            description='Собрать данные',
+            creator=cls.creator,
+            assignee=cls.assignee,
+        )
+        for i in range(5):
+            Subtask.objects.create(task=cls.task, title=f'Шаг {i}', is_completed=i % 2 == 0)
+        for i in range(6):
+            TaskComment.objects.create(task=cls.task, author=cls.assignee, text=f'Комментарий {i}')
+
+    def test_task_screen_fits_query_budget(self):
+        from bot.handlers.utils import get_task_for_view, show_task_progress
+
+        # Задача со связями, подзадачи, последние комментарии с авторами
+        with mock.patch('bot.handlers.utils.safe_edit_or_send_message') as send:
+            with self.assertNumQueries(3):
+                task = get_task_for_view(self.task.id)
+                show_task_progress(self.creator.telegram_id, task, is_creator=True, is_assignee=False)
+        text = send.call_args.args[1]
+        self.assertIn('Шаг 4', text)
+        self.assertIn('3/5', text)
+
+    def test_recent_comments_are_limited(self):
+        from bot.handlers.utils import get_task_for_view, RECENT_COMMENTS_LIMIT
+
+        task = get_task_for_view(self.task.id)
+        self.assertEqual(len(task.recent_comments), RECENT_COMMENTS_LIMIT)
+        self.assertEqual(task.recent_comments[0].text, 'Комментарий 5')
+
+    def test_creator_check_does_not_load_task_users(self):
+        from bot.handlers.utils import check_permissions
+
+        task = Task.objects.get(id=self.task.id)
+        # Только загрузка пользователя, без запросов к создателю/исполнителю задачи
+        with self.assertNumQueries(1):
+            allowed, _ = check_permissions(self.creator.telegram_id, task, require_creator=True)
+        self.assertTrue(allowed)
+
+
+class SubtaskCountersTest(TestCase):
+    """Счетчики subtasks_total/subtasks_done сдвигаются атомарными UPDATE"""
+
+    def setUp(self):
+        creator = User.objects.create(telegram_id='2001', user_name='creator')
+        self.task = Task.objects.create(title='Подготовка', creator=creator, assignee=creator)
+        self.subtasks = self.task.add_subtasks(['Первый', 'Второй'])
+
+    def counters(self):
+        self.task.refresh_from_db(fields=['subtasks_total', 'subtasks_done'])
+        return self.task.subtasks_total, self.task.subtasks_done
+
+    def test_concurrent_toggles_count_once(self):
+        first = Subtask.objects.get(pk=self.subtasks[0].pk)
+        stale = Subtask.objects.get(pk=self.subtasks[0].pk)
+        first.is_completed = True
+        first.save(update_fields=['is_completed', 'completed_at'])
+        # Второй обработчик загрузил подзадачу до переключения и переключает ее так же
+        stale.is_completed = True
+        stale.save(update_fields=['is_completed', 'completed_at'])
+        self.assertEqual(self.counters(), (2, 1))
+
+    def test_stale_toggle_takes_stored_state(self):
+        stale = Subtask.objects.get(pk=self.subtasks[0].pk)
+        Subtask.objects.filter(pk=stale.pk).update(is_completed=True)
+        stale.is_completed = True
+        stale.save()
+        self.assertTrue(stale.is_completed)
+        self.assertEqual(self.counters(), (2, 0))
+
+    def test_delete_uses_stored_state(self):
+        stale = Subtask.objects.get(pk=self.subtasks[1].pk)
+        done = Subtask.objects.get(pk=self.subtasks[1].pk)
+        done.is_completed = True
+        done.save()
+        stale.delete()
+        self.assertEqual(self.counters(), (1, 0))
+
+    def test_recount_command_fixes_drift(self):
+        Task.objects.filter(pk=self.task.pk).update(subtasks_total=0, subtasks_done=5)
+        out = StringIO()
+        call_command('recount_subtasks', '--backfill', stdout=out)
+        self.assertIn(': 1', out.getvalue())
+        self.assertEqual(self.counters(), (2, 0))
+        call_command('recount_subtasks', '--backfill', stdout=out)
+        self.assertIn(': 0', out.getvalue())
+
+
+class TaskListCountCacheTest(TestCase):
+    """Кэш числа задач в списках сбрасывается при изменении задач и ролей"""
+
+    def setUp(self):
+        from django.core.cache import cache
+
+        cache.clear()
+        self.creator = User.objects.create(telegram_id='3001', user_name='creator')
+        self.assignee = User.objects.create(telegram_id='3002', user_name='assignee')
+        self.other = User.objects.create(telegram_id='3003', user_name='other')
+
+    def count(self, user, view='assignee'):
+        from bot.handlers.utils import get_task_list_count
+
+        return get_task_list_count(user, view)
+
+    def test_new_and_closed_tasks_update_counts(self):
+        self.assertEqual(self.count(self.assignee), 0)
+        self.assertEqual(self.count(self.creator, 'creator'), 0)
+        task = Task.objects.create(title='Первая задача', creator=self.creator, assignee=self.assignee)
+        self.assertEqual(self.count(self.assignee), 1)
+        self.assertEqual(self.count(self.creator, 'creator'), 1)
+        task.delete()
+        self.assertEqual(self.count(self.assignee), 0)
+
+    def test_reassignment_resets_previous_assignee(self):
+        task = Task.objects.create(title='Задача', creator=self.creator, assignee=self.assignee)
+        task = Task.objects.get(pk=task.pk)
+        self.assertEqual(self.count(self.assignee), 1)
+        self.assertEqual(self.count(self.other), 0)
+        task.assignee = self.other
+        task.save(update_fields=['assignee'])
+        self.assertEqual(self.count(self.assignee), 0)
+        self.assertEqual(self.count(self.other), 1)
+
+    def test_role_tasks_and_membership(self):
+        from bot.models import Role
+
+        role = Role.objects.create(name='Методисты')
+        self.other.roles.add(role)
+        self.assertEqual(self.count(self.other), 0)
+        self.assertEqual(self.count(self.assignee), 0)
+        Task.objects.create(title='Для роли', creator=self.creator, assigned_role=role)
+        self.assertEqual(self.count(self.other), 1)
+        role.users.add(self.assignee)
+        self.assertEqual(self.count(self.assignee), 1)
+
+    def test_list_is_not_empty_with_stale_count(self):
+        from django.core.cache import cache
+        from bot.handlers.utils import show_task_list
+
+        Task.objects.create(title='Задача', creator=self.creator, assignee=self.assignee)
+        # Число, закэшированное до появления задачи (например, Task.objects.update в обход сигналов)
+        cache.set(f"task_list_count:{self.assignee.telegram_id}:assignee:all", 0)
+        with mock.patch('bot.handlers.utils.safe_edit_or_send_message') as send:
+            show_task_list(self.assignee.telegram_id, self.assignee, 'assignee')
+        self.assertIn('Всего: 1', send.call_args.args[1])
+
+
+class TaskRemindersCommandTest(TestCase):
+    """Команда task_reminders: напоминания уходят в том же прогоне, next_notify_at всегда сдвигается"""
+
+    def setUp(self):
+        from datetime import timedelta
+        from django.utils import timezone
+
+        self.creator = User.objects.create(telegram_id='4001', user_name='creator')
+        self.assignee = User.objects.create(telegram_id='4002', user_name='assignee', work_start=0, work_end=24)
+        self.tasks = [
+            Task.objects.create(title=f'Задача {i}', creator=self.creator, assignee=self.assignee,
+                                notification_interval=60)
+            for i in range(2)
+        ]
+        Task.objects.filter(pk__in=[task.pk for task in self.tasks]).update(
+            next_notify_at=timezone.now() - timedelta(minutes=1)
+        )
+
+    def run_command(self):
+        with mock.patch('bot.outbox._deliver') as deliver, \
+                mock.patch('bot.outbox._deliver_digest') as deliver_digest:
+            call_command('task_reminders', stdout=StringIO())
+        return deliver, deliver_digest
+
+    def test_reminders_are_sent_as_one_digest_in_the_same_run(self):
+        from bot.models import NotificationOutbox
+
+        deliver, deliver_digest = self.run_command()
+        deliver.assert_not_called()
+        self.assertEqual(deliver_digest.call_count, 1)
+        self.assertEqual(len(deliver_digest.call_args.args[2]), 2)
+        self.assertFalse(NotificationOutbox.objects.filter(status='pending').exists())
+
+    def test_interval_changed_during_run_keeps_reminders_scheduled(self):
+        from django.utils import timezone
+        from bot.management.commands.task_reminders import Command
+
+        changed = self.tasks[0]
+        original = Command.send_reminder
+
+        def send_and_change_interval(command, task):
+            original(command, task)
+            # Интервал изменили в обход Task.save, пока шел прогон
+            Task.objects.filter(pk=changed.pk).update(notification_interval=15)
+
+        with mock.patch.object(Command, 'send_reminder', send_and_change_interval):
+            self.run_command()
+        changed.refresh_from_db()
+        self.assertIsNotNone(changed.next_notify_at)
+        self.assertGreater(changed.next_notify_at, timezone.now())
+
+
+    def test_reminders_disabled_during_run_stay_disabled(self):
+        from bot.management.commands.task_reminders import Command
+
+        disabled = self.tasks[0]
+        original = Command.send_reminder
+
+        def send_and_disable(command, task):
+            original(command, task)
+            # Задачу закрыли в обход Task.save: интервал остался, next_notify_at сброшен
+            Task.objects.filter(pk=disabled.pk).update(next_notify_at=None)
+
+        with mock.patch.object(Command, 'send_reminder', send_and_disable):
+            self.run_command()
+        disabled.refresh_from_db()
+        self.assertIsNone(disabled.next_notify_at)
+        self.tasks[1].refresh_from_db()
+        self.assertIsNotNone(self.tasks[1].next_notify_at)
+
+
+class UserPageTest(TestCase):
+    """Выбор исполнителя: keyset-страницы по (first_name, telegram_id), один запрос на страницу"""
+
+    @classmethod
+    def setUpTestData(cls):
+        names = ['Борис', None, 'Анна', 'Иван', 'Анна', None, 'Вера', 'Иван', 'Глеб', 'Дина', 'Елена', 'Жанна']
+        for i, name in enumerate(names):
+            User.objects.create(telegram_id=str(5000 + i), user_name=f'user{i}', first_name=name)
+        User.objects.create(telegram_id='5100', user_name='ivan_petrov', first_name='Петр')
+        User.objects.create(telegram_id='5101', user_name='someone', first_name='Олег', last_name='Иванов')
+        cls.expected = [
+            user.telegram_id
+            for user in sorted(User.objects.all(), key=lambda u: (u.first_name is not None, u.first_name or '', u.telegram_id))
+        ]
+
+    def test_pages_forward_and_back_one_query_each(self):
+        from bot.handlers.utils import get_user_page
+
+        pages, after = [], None
+        while True:
+            with self.assertNumQueries(1):
+                users, has_prev, has_next = get_user_page(after=after, per_page=4)
+            self.assertEqual(has_prev, after is not None)
+            pages.append([user.telegram_id for user in users])
+            if not has_next:
+                break
+            after = users[-1].telegram_id
+        self.assertEqual(sum(pages, []), self.expected)
+
+        # Назад от первого пользователя последней страницы - предыдущая страница
+        with self.assertNumQueries(1):
+            users, has_prev, has_next = get_user_page(before=pages[-1][0], per_page=4)
+        self.assertEqual([user.telegram_id for user in users], pages[-2])
+        self.assertTrue(has_next)
+
+    def test_search_is_case_insensitive_across_name_fields(self):
+        from bot.handlers.utils import get_user_page
+
+        users, _, _ = get_user_page(search='иван', per_page=10)
+        self.assertEqual(
+            {user.telegram_id for user in users},
+            {'5003', '5007', '5101'},
+        )
+        users, _, _ = get_user_page(search='IVAN', per_page=10)
+        self.assertEqual([user.telegram_id for user in users], ['5100'])
+
+
+class OutboundDispatcherTest(TestCase):
+    """Очередь исходящих: порядок внутри чата и учет только успешных отправок"""
+
+    def flood_error(self, retry_after):
+        from telebot.apihelper import ApiTelegramException
+
+        return ApiTelegramException('sendMessage', None, {
+            'error_code': 429,
+            'description': f'Too Many Requests: retry after {retry_after}',
+            'parameters': {'retry_after': retry_after},
+        })
+
+    def test_chat_order_survives_flood_retry(self):
+        from bot.sender import OutboundDispatcher
+
+        dispatcher = OutboundDispatcher()
+        sent, failed_once = [], set()
+
+        def invoke(method, chat_id, kwargs):
+            if kwargs['text'] == 'первое' and 'первое' not in failed_once:
+                failed_once.add('первое')
+                raise self.flood_error(0.05)
+            sent.append((chat_id, kwargs['text']))
+
+        with mock.patch.object(dispatcher, '_invoke', side_effect=invoke):
+            for text in ['первое', 'второе', 'третье']:
+                dispatcher.submit('send_message', 6001, text=text)
+            dispatcher.submit('send_message', 6002, text='другой чат')
+            self.assertTrue(dispatcher.flush(timeout=10))
+
+        self.assertEqual([text for chat_id, text in sent if chat_id == 6001], ['первое', 'второе', 'третье'])
+        stats = dispatcher.stats()
+        self.assertEqual(stats['sent_total'], 4)
+        self.assertEqual(stats['retried_total'], 1)
+        self.assertEqual(stats['queue_depth'], 0)
+
+    def test_rejected_request_is_not_counted_as_sent(self):
+        from bot.sender import OutboundDispatcher
+
+        dispatcher = OutboundDispatcher()
+        response = mock.Mock(status_code=400, ok=False)
+        session = mock.Mock(**{'request.return_value': response})
+        with mock.patch('bot.sender.apihelper.session', session):
+            tokens = dispatcher._global_bucket.tokens
+            result = dispatcher.send_request('post', 'https://api.telegram.org/bot1:x/sendMessage',
+                                             params={'chat_id': 6003})
+        self.assertIs(result, response)
+        stats = dispatcher.stats()
+        self.assertEqual((stats['sent_total'], stats['failed_total'], stats['sent_per_minute']), (0, 1, 0))
+        # Токен отклоненного запроса возвращен в общий лимит
+        self.assertAlmostEqual(dispatcher._global_bucket.tokens, tokens, delta=0.5)
+
+
+class TasksCallbackTest(TestCase):
+    """Кнопка "Мои задачи": решение перерисовать список принимается по callback_data, а не по тексту"""
+
+    def press(self, markup):
+        from bot.handlers.commands import tasks_callback
+
+        call = mock.Mock(id='1', data='tasks')
+        call.message.reply_markup = markup
+        call.message.text = '📋 ВАШИ АКТИВНЫЕ ЗАДАЧИ'
+        with mock.patch('bot.handlers.commands.bot') as bot, \
+                mock.patch('bot.handlers.commands.tasks_command_logic') as show:
+            tasks_callback(call)
+        return bot.answer_callback_query.called, show.called
+
+    def markup(self, status_filter, has_prev, has_next):
+        from bot.keyboards import get_tasks_list_markup
+
+        tasks = [Task(id=7, title='Задача', status='active')]
+        return get_tasks_list_markup(tasks, status_filter=status_filter, has_prev=has_prev, has_next=has_next)
+
+    def test_first_page_is_not_redrawn(self):
+        self.assertEqual(self.press(self.markup('all', False, True)), (True, False))
+
+    def test_other_pages_and_screens_are_redrawn(self):
+        from bot.keyboards import get_main_menu
+
+        self.assertEqual(self.press(self.markup('all', True, True)), (False, True))
+        self.assertEqual(self.press(self.markup('overdue', False, True)), (False, True))
+        self.assertEqual(self.press(get_main_menu()), (False, True))
+
+
+class RoleCacheTest(TestCase):
+    """Кэш ролей: в локальном для процесса кэше записи живут недолго"""
+
+    def test_ttl_depends_on_cache_backend(self):
+        import tempfile
+        from django.test import override_settings
+        from bot.role_cache import role_cache_ttl
+
+        self.assertEqual(role_cache_ttl(), 30)
+        with tempfile.TemporaryDirectory() as location:
+            shared = {
+                'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+                'roles': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location},
+            }
+            with override_settings(CACHES=shared, ROLE_CACHE_ALIAS='roles'):
+                self.assertEqual(role_cache_ttl(), 3600)
+        with override_settings(ROLE_CACHE_TTL=600):
+            self.assertEqual(role_cache_ttl(), 600)
+
+    def test_roles_are_cached_and_reset_on_membership_change(self):
+        from bot.models import Role
+        from bot.role_cache import get_user_role_ids
+
+        user = User.objects.create(telegram_id='7001', user_name='member')
+        role = Role.objects.create(name='Кураторы')
+        self.assertEqual(get_user_role_ids(user), frozenset())
+        user.roles.add(role)
+        with self.assertNumQueries(1):
+            self.assertEqual(get_user_role_ids(user), frozenset({role.id}))
+            self.assertEqual(get_user_role_ids(user), frozenset({role.id}))
@@ -0,0 +1,104 @@
+"""
+Снимок часовых поясов для проверок рабочего времени.
+
+Раньше каждая проверка User.is_working_time создавала объект pytz и вычисляла
+текущее время в поясе пользователя. Теперь для каждого встречающегося пояса
+смещение от UTC и местный час вычисляются один раз на снимок, а решения
+"рабочее время" / "начался рабочий день" запоминаются по ключу
+(timezone, work_start, work_end) - у большинства пользователей эти ключи
+совпадают, поэтому массовая проверка сводится к поиску в словаре.
+
+Смещения всех поясов кратны 15 минутам, поэтому местный час в любом поясе
+не меняется внутри четверти часа UTC: get_snapshot() переиспользует снимок
+до перехода через такую границу. Разовые прогоны (management-команды) могут
+создать свой TimezoneSnapshot(now) и работать с ним весь прогон.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import pytz
+
+# Шаг, внутри которого местный час не меняется ни в одном поясе (сек)
+SNAPSHOT_STEP = 15 * 60
+
+
+def is_working_hour(hour: int, work_start: int, work_end: int) -> bool:
+    """Входит ли час в рабочий интервал (интервал может переходить через полночь, например с 22 до 06)"""
+    if work_start < work_end:
+        return work_start <= hour < work_end
+    return hour >= work_start or hour < work_end
+
+
+class TimezoneSnapshot:
+    """Местный час и смещение от UTC для каждого пояса на момент now"""
+
+    def __init__(self, now: datetime = None):
+        self.now = now or datetime.now(dt_timezone.utc)
+        self.bucket = int(self.now.timestamp()) // SNAPSHOT_STEP
+        self._local = {}
+        self._working = {}
+        self._started = {}
+
+    def _resolve(self, tz_name: str) -> tuple:
+        local = self._local.get(tz_name)
+        if local is None:
+            try:
+                tz = pytz.timezone(tz_name)
+            except Exception:
+                tz = pytz.UTC
+            moment = self.now.astimezone(tz)
+            local = self._local[tz_name] = (moment.utcoffset(), moment.hour)
+        return local
+
+    def utc_offset(self, tz_name: str):
+        return self._resolve(tz_name)[0]
+
+    def hour(self, tz_name: str) -> int:
+        return self._resolve(tz_name)[1]
+
+    def next_work_start(self, tz_name: str, work_start: int) -> datetime:
+        """Ближайшее начало рабочего дня в поясе (момент в UTC)"""
+        try:
+            tz = pytz.timezone(tz_name)
+        except Exception:
+            tz = pytz.UTC
+        local_now = self.now.astimezone(tz)
+        day = local_now.date()
+        if local_now.hour >= work_start:
+            day += timedelta(days=1)
+        start = tz.normalize(tz.localize(datetime(day.year, day.month, day.day, work_start)))
+        return start.astimezone(dt_timezone.utc)
+
+    def is_working_time(self, tz_name: str, work_start: int, work_end: int) -> bool:
+        key = (tz_name, work_start, work_end)
+        working = self._working.get(key)
+        if working is None:
+            working = self._working[key] = is_working_hour(self.hour(tz_name), work_start, work_end)
+        return working
+
+    def is_work_started(self, tz_name: str, work_start: int, work_end: int) -> bool:
+        """Наступил ли час начала работы (или позже) и идет ли еще рабочее время"""
+        key = (tz_name, work_start, work_end)
+        started = self._started.get(key)
+        if started is None:
+            started = self._started[key] = (
+                self.hour(tz_name) >= work_start and self.is_working_time(tz_name, work_start, work_end)
+            )
+        return started
+
+    def filter_working(self, users) -> list:
+        """Пользователи, у которых сейчас рабочее время"""
+        return [user for user in users if self.is_working_time(user.timezone, user.work_start, user.work_end)]
+
+
+_snapshot = None
+
+
+def get_snapshot() -> TimezoneSnapshot:
+    """Снимок для текущей четверти часа UTC (пересоздается при переходе границы)"""
+    global _snapshot
+    now = datetime.now(dt_timezone.utc)
+    snapshot = _snapshot
+    if snapshot is None or snapshot.bucket != int(now.timestamp()) // SNAPSHOT_STEP:
+        # Гонка потоков безвредна: снимки одной четверти часа дают одинаковые ответы
+        snapshot = _snapshot = TimezoneSnapshot(now)
+    return snapshot
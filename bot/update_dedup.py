@@ -0,0 +1,69 @@
+"""
+Отбрасывание повторно доставленных обновлений.
+
+Telegram повторяет доставку webhook, если ответ пришел слишком поздно или с
+ошибкой. Чтобы повтор не создавал задачу и не рассылал уведомления второй
+раз, недавно увиденные update_id запоминаются в LRU фиксированного размера.
+Для нескольких процессов можно дополнительно включить общий кэш Django
+(UPDATE_DEDUP_SHARED=true), например Redis/Memcached/таблицу БД.
+"""
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+from bot import logger
+
+
+class RecentUpdateIds:
+    """Множество последних update_id с ограниченной памятью (проверка и вставка за O(1))"""
+
+    def __init__(self, capacity: int):
+        self.capacity = max(1, capacity)
+        self._ids = OrderedDict()
+        self._lock = threading.Lock()
+
+    def check_and_add(self, update_id: int) -> bool:
+        """Возвращает True, если update_id уже встречался; иначе запоминает его"""
+        with self._lock:
+            if update_id in self._ids:
+                self._ids.move_to_end(update_id)
+                return True
+            self._ids[update_id] = None
+            if len(self._ids) > self.capacity:
+                self._ids.popitem(last=False)
+            return False
+
+    def discard(self, update_id: int) -> None:
+        with self._lock:
+            self._ids.pop(update_id, None)
+
+    def __len__(self):
+        return len(self._ids)
+
+
+_recent_updates = RecentUpdateIds(settings.UPDATE_DEDUP_SIZE)
+
+
+def is_duplicate_update(update_id: int) -> bool:
+    """Проверяет, обрабатывалось ли уже обновление, и помечает его как увиденное"""
+    if _recent_updates.check_and_add(update_id):
+        return True
+    if settings.UPDATE_DEDUP_SHARED:
+        try:
+            # cache.add атомарен: вернет False, если ключ уже добавил другой процесс
+            return not cache.add(f"tg_update:{update_id}", 1, timeout=settings.UPDATE_DEDUP_TTL)
+        except Exception as e:
+            logger.warning(f"Shared update dedup is unavailable: {e}")
+    return False
+
+
+def forget_update(update_id: int) -> None:
+    """Снимает отметку с обновления, которое не удалось принять, чтобы его повторная доставка была обработана"""
+    _recent_updates.discard(update_id)
+    if settings.UPDATE_DEDUP_SHARED:
+        try:
+            cache.delete(f"tg_update:{update_id}")
+        except Exception as e:
+            logger.warning(f"Shared update dedup is unavailable: {e}")
@@ -0,0 +1,129 @@
+"""
+Очередь входящих обновлений Telegram.
+
+В асинхронном режиме (WEBHOOK_ASYNC=true) webhook только проверяет и ставит
+обновление в очередь, а пул рабочих потоков обрабатывает его. Так ответ
+Telegram не ждет запросов к БД и исходящих вызовов API.
+
+Обновления распределяются по потокам по chat_id: у каждого потока своя
+очередь, поэтому обновления одного пользователя обрабатываются строго по
+порядку (состояние UserState не гоняется само с собой), а разные
+пользователи обрабатываются параллельно.
+"""
+import atexit
+import queue
+import threading
+from traceback import format_exc
+
+from django.conf import settings
+from django.db import close_old_connections
+from telebot.apihelper import ApiTelegramException
+
+from bot import bot, logger
+from bot.context import update_context
+
+_shards = []
+_workers = []
+_lock = threading.Lock()
+
+
+def process_update(update) -> None:
+    """Обрабатывает одно обновление, логируя ошибки обработчиков"""
+    try:
+        # Пользователь и состояние загружаются один раз на обновление (см. bot/context.py)
+        with update_context():
+            bot.process_new_updates([update])
+    except ApiTelegramException as e:
+        logger.error(f"Telegram API exception: {e} {format_exc()}")
+    except ConnectionError as e:
+        logger.error(f"Connection error: {e} {format_exc()}")
+    except Exception as e:
+        logger.error(f"Error processing update: {e} {format_exc()}")
+        if hasattr(settings, 'OWNER_ID') and settings.OWNER_ID:
+            try:
+                bot.send_message(settings.OWNER_ID, f'Error from index: {e}')
+            except Exception as msg_e:
+                logger.warning(f"Could not send error notification: {msg_e}")
+
+
+def get_update_chat_id(update):
+    """Возвращает chat_id, к которому относится обновление (ключ шардирования)"""
+    message = update.message or update.edited_message
+    if message:
+        return message.chat.id
+    if update.callback_query:
+        call = update.callback_query
+        if call.message:
+            return call.message.chat.id
+        return call.from_user.id
+    return update.update_id
+
+
+def _worker_loop(shard: queue.Queue) -> None:
+    while True:
+        update = shard.get()
+        try:
+            if update is None:
+                return
+            # Рабочий поток живет долго, поэтому сами следим за соединениями с БД
+            close_old_connections()
+            process_update(update)
+        finally:
+            close_old_connections()
+            shard.task_done()
+
+
+def start_workers() -> None:
+    """Запускает пул обработчиков: по одной очереди на поток (однократно на процесс)"""
+    with _lock:
+        if _workers:
+            return
+        workers_count = max(1, settings.UPDATE_WORKERS)
+        shard_size = max(1, settings.UPDATE_QUEUE_SIZE // workers_count)
+        for i in range(workers_count):
+            shard = queue.Queue(maxsize=shard_size)
+            worker = threading.Thread(target=_worker_loop, args=(shard,), name=f'update-worker-{i}', daemon=True)
+            worker.start()
+            _shards.append(shard)
+            _workers.append(worker)
+        atexit.register(stop_workers)
+        logger.info(f"Started {len(_workers)} update workers")
+
+
+def stop_workers(timeout: float = 5.0) -> None:
+    """Дожидается обработки уже принятых обновлений и останавливает пул"""
+    with _lock:
+        if not _workers:
+            return
+        for shard in _shards:
+            try:
+                shard.put(None, timeout=timeout)
+            except queue.Full:
+                logger.warning("Update queue is still full on shutdown")
+        for worker in _workers:
+            worker.join(timeout)
+        _workers.clear()
+        _shards.clear()
+
+
+def enqueue_update(update) -> bool:
+    """
+    Ставит обновление в очередь потока, закрепленного за его чатом.
+    Если очередь переполнена, ждет освобождения места до UPDATE_ENQUEUE_TIMEOUT секунд.
+    Возвращает False, если место так и не освободилось: обрабатывать такое обновление
+    в обход очереди нельзя (поток чата может еще обрабатывать его прежние обновления),
+    поэтому webhook отвечает ошибкой и Telegram доставляет обновление повторно.
+    """
+    if not _workers:
+        start_workers()
+    shard = _shards[hash(get_update_chat_id(update)) % len(_shards)]
+    try:
+        shard.put(update, timeout=settings.UPDATE_ENQUEUE_TIMEOUT)
+        return True
+    except queue.Full:
+        logger.warning(f"Update queue is full, update {update.update_id} is left for redelivery")
+        return False
+
+
+def queue_depth() -> int:
+    return sum(shard.qsize() for shard in _shards)
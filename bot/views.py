@@ -3,14 +3,15 @@ from asgiref.sync import sync_to_async
 from bot.handlers import (
     start_command, tasks_command, my_created_tasks_command,
     close_task_command, task_progress_command, debug_command,
-    tasks_callback, my_created_tasks_callback,
+    tasks_callback, my_created_tasks_callback, task_list_callback,
     create_task_command, create_task_callback,
     handle_task_creation_messages, skip_description_callback, skip_due_date_callback,
     assign_to_creator_callback, assign_to_me_callback, choose_user_from_list_callback,
     add_subtask_callback, cancel_subtask_input_callback, clear_subtasks_callback, finish_subtasks_callback,
     clear_attachments_callback, finish_attachments_callback,
     skip_assignee_callback, choose_assignee_callback,
-    user_page_callback, select_user_callback, back_to_assignee_selection_callback,
+    user_next_callback, user_prev_callback, user_search_callback, user_search_reset_callback,
+    handle_user_search_input, select_user_callback, back_to_assignee_selection_callback,
     back_to_assignee_type_callback, cancel_task_creation_callback,
     select_notification_interval_callback, skip_notification_interval_callback,
     back_to_calendar_callback, back_to_notifications_callback,
@@ -21,7 +22,6 @@ from bot.handlers import (
     task_delete_callback, confirm_delete_callback, task_status_callback,
     task_edit_callback, edit_title_callback, edit_description_callback,
     edit_assignee_callback, edit_due_date_callback, edit_notification_interval_callback,
-    assignee_page_callback,
     change_assignee_callback, task_close_callback,
     handle_task_report, view_report_attachments_callback, view_task_attachments_callback,
     handle_task_comment, task_comment_callback, finish_report_callback, clear_report_attachments_callback,
@@ -38,9 +38,12 @@ from django.conf import settings
 from django.http import HttpRequest, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_GET, require_POST
-from telebot.apihelper import ApiTelegramException
-from telebot.types import Update, Message, CallbackQuery
+from telebot.types import Update, Message
 from bot import bot, logger
+from bot.update_queue import enqueue_update, process_update, queue_depth
+from bot.router import callback_router, optional_int
+from bot.update_dedup import is_duplicate_update, forget_update
+from bot.sender import outbound
 
 @require_GET
 def set_webhook(request: HttpRequest) -> JsonResponse:
@@ -67,7 +70,11 @@ def set_webhook(request: HttpRequest) -> JsonResponse:
         return JsonResponse({"message": error_msg, "webhook_url": webhook_url}, status=500)
 @require_GET
 def status(request: HttpRequest) -> JsonResponse:
-    return JsonResponse({"message": "OK"}, status=200)
+    return JsonResponse({
+        "message": "OK",
+        "update_queue_depth": queue_depth(),
+        "outbound": outbound.stats(),
+    }, status=200)
 @csrf_exempt
 @require_POST
 def index(request: HttpRequest) -> JsonResponse:
@@ -94,23 +101,23 @@ def index(request: HttpRequest) -> JsonResponse:
             logger.error(f"Error parsing update: {e} {format_exc()}")
             return JsonResponse({"message": "Bad Request: Invalid update format"}, status=400)
         
-        # Обработка обновления
-        try:
-            bot.process_new_updates([update])
-        except ApiTelegramException as e:
-            logger.error(f"Telegram API exception: {e} {format_exc()}")
-            # Не прерываем выполнение, возвращаем OK
-        except ConnectionError as e:
-            logger.error(f"Connection error: {e} {format_exc()}")
-            # Не прерываем выполнение, возвращаем OK
-        except Exception as e:
-            logger.error(f"Error processing update: {e} {format_exc()}")
-            if hasattr(settings, 'OWNER_ID') and settings.OWNER_ID:
-                try:
-                    bot.send_message(settings.OWNER_ID, f'Error from index: {e}')
-                except Exception as msg_e:
-                    logger.warning(f"Could not send error notification: {msg_e}")
-        
+        # Повторную доставку того же обновления подтверждаем, но не обрабатываем
+        if is_duplicate_update(update.update_id):
+            logger.info(f"Duplicate update {update.update_id} skipped")
+            return JsonResponse({"message": "OK", "status": "duplicate"}, status=200)
+
+        # В асинхронном режиме только ставим обновление в очередь и сразу отвечаем
+        if settings.WEBHOOK_ASYNC:
+            if enqueue_update(update):
+                return JsonResponse({"message": "OK", "status": "queued"}, status=200)
+            # Очередь чата переполнена: обработка в обход нее нарушит порядок обновлений чата,
+            # поэтому просим Telegram доставить обновление повторно
+            forget_update(update.update_id)
+            return JsonResponse({"message": "Service Unavailable: update queue is full"}, status=503)
+
+        # Обработка обновления (ошибки обработчиков логируются и не прерывают ответ)
+        process_update(update)
+
         # Всегда возвращаем успешный ответ
         return JsonResponse({"message": "OK", "status": "processed"}, status=200)
         
@@ -127,11 +134,6 @@ task_progress_command_handler = bot.message_handler(commands=["task_progress"])(
 debug_command_handler = bot.message_handler(commands=["debug"])(debug_command)
 create_task_command_handler = bot.message_handler(commands=["create_task"])(create_task_command)
 
-# Callback для команд
-tasks_callback_handler = bot.callback_query_handler(func=lambda c: c.data == "tasks")(tasks_callback)
-my_created_tasks_callback_handler = bot.callback_query_handler(func=lambda c: c.data == "my_created_tasks")(my_created_tasks_callback)
-create_task_callback_handler = bot.callback_query_handler(func=lambda c: c.data == "create_task")(create_task_callback)
-
 # Обработка сообщений (текст, фото, файлы)
 @bot.message_handler(content_types=['text', 'photo', 'document'])
 def master_message_handler(message: Message):
@@ -164,97 +166,111 @@ def master_message_handler(message: Message):
         handle_task_report(message)
     elif state == 'waiting_comment':
         handle_task_comment(message)
+    elif state == 'waiting_user_search':
+        handle_user_search_input(message)
     elif user_state and (state or 'editing_task_id' in user_state or 'adding_subtasks_task_id' in user_state):
         handle_task_creation_messages(message)
 
+# Все callback'и проходят через один обработчик: точные значения ищутся в словаре,
+# префиксы - в префиксном дереве (см. bot/router.py)
+callback_handler = bot.callback_query_handler(func=lambda c: True)(callback_router.dispatch)
+
+# Callback для команд
+callback_router.exact("tasks", tasks_callback)
+callback_router.exact("my_created_tasks", my_created_tasks_callback)
+callback_router.exact("create_task", create_task_callback)
+callback_router.prefix("task_list_", task_list_callback, str, str, str)
+
 # Callback для создания задач
-skip_description_handler = bot.callback_query_handler(func=lambda c: c.data == "skip_description")(skip_description_callback)
-skip_due_date_handler = bot.callback_query_handler(func=lambda c: c.data == "skip_due_date")(skip_due_date_callback)
-assign_to_creator_handler = bot.callback_query_handler(func=lambda c: c.data == "assign_to_creator")(assign_to_creator_callback)
-assign_to_me_handler = bot.callback_query_handler(func=lambda c: c.data == "assign_to_me")(assign_to_me_callback)
-choose_user_from_list_handler = bot.callback_query_handler(func=lambda c: c.data == "choose_user_from_list")(choose_user_from_list_callback)
-add_subtask_handler = bot.callback_query_handler(func=lambda c: c.data == "add_subtask")(add_subtask_callback)
-cancel_subtask_input_handler = bot.callback_query_handler(func=lambda c: c.data == "cancel_subtask_input")(cancel_subtask_input_callback)
-clear_subtasks_handler = bot.callback_query_handler(func=lambda c: c.data == "clear_subtasks")(clear_subtasks_callback)
-finish_subtasks_handler = bot.callback_query_handler(func=lambda c: c.data == "finish_subtasks")(finish_subtasks_callback)
-skip_assignee_handler = bot.callback_query_handler(func=lambda c: c.data == "skip_assignee")(skip_assignee_callback)
-choose_assignee_handler = bot.callback_query_handler(func=lambda c: c.data == "choose_assignee")(choose_assignee_callback)
-user_page_handler = bot.callback_query_handler(func=lambda c: c.data.startswith("user_page_"))(user_page_callback)
-select_user_handler = bot.callback_query_handler(func=lambda c: c.data.startswith("select_user_"))(select_user_callback)
-back_to_assignee_selection_handler = bot.callback_query_handler(func=lambda c: c.data == "back_to_assignee_selection")(back_to_assignee_selection_callback)
-back_to_assignee_type_handler = bot.callback_query_handler(func=lambda c: c.data == "back_to_assignee_type")(back_to_assignee_type_callback)
-cancel_task_creation_handler = bot.callback_query_handler(func=lambda c: c.data == "cancel_task_creation")(cancel_task_creation_callback)
-clear_attachments_handler = bot.callback_query_handler(func=lambda c: c.data == "clear_attachments")(clear_attachments_callback)
+callback_router.exact("skip_description", skip_description_callback)
+callback_router.exact("skip_due_date", skip_due_date_callback)
+callback_router.exact("assign_to_creator", assign_to_creator_callback)
+callback_router.exact("assign_to_me", assign_to_me_callback)
+callback_router.exact("choose_user_from_list", choose_user_from_list_callback)
+callback_router.exact("add_subtask", add_subtask_callback)
+callback_router.exact("cancel_subtask_input", cancel_subtask_input_callback)
+callback_router.exact("clear_subtasks", clear_subtasks_callback)
+callback_router.exact("finish_subtasks", finish_subtasks_callback)
+callback_router.exact("skip_assignee", skip_assignee_callback)
+callback_router.exact("choose_assignee", choose_assignee_callback)
+callback_router.prefix("user_next_", user_next_callback, str)
+callback_router.prefix("user_prev_", user_prev_callback, str)
+callback_router.exact("user_search", user_search_callback)
+callback_router.exact("user_search_reset", user_search_reset_callback)
+callback_router.prefix("select_user_", select_user_callback, str)
+callback_router.exact("back_to_assignee_selection", back_to_assignee_selection_callback)
+callback_router.exact("back_to_assignee_type", back_to_assignee_type_callback)
+callback_router.exact("cancel_task_creation", cancel_task_creation_callback)
+callback_router.exact("clear_attachments", clear_attachments_callback)
 # Callback для уведомлений
-select_notification_interval_handler = bot.callback_query_handler(func=lambda c: c.data.startswith("set_notify_"))(select_notification_interval_callback)
+callback_router.prefix("set_notify_", select_notification_interval_callback, optional_int)
 
-finish_attachments_handler = bot.callback_query_handler(func=lambda c: c.data == "finish_attachments")(finish_attachments_callback)
+callback_router.exact("finish_attachments", finish_attachments_callback)
 
 # Callback для навигации при создании задач
-back_to_calendar_handler = bot.callback_query_handler(func=lambda c: c.data == "back_to_calendar")(back_to_calendar_callback)
-back_to_notifications_handler = bot.callback_query_handler(func=lambda c: c.data == "back_to_notifications")(back_to_notifications_callback)
-back_to_subtasks_handler = bot.callback_query_handler(func=lambda c: c.data == "back_to_subtasks")(back_to_subtasks_callback)
-back_to_description_handler = bot.callback_query_handler(func=lambda c: c.data == "back_to_description")(back_to_description_callback)
-back_to_attachments_handler = bot.callback_query_handler(func=lambda c: c.data == "back_to_attachments")(back_to_attachments_callback)
+callback_router.exact("back_to_calendar", back_to_calendar_callback)
+callback_router.exact("back_to_notifications", back_to_notifications_callback)
+callback_router.exact("back_to_subtasks", back_to_subtasks_callback)
+callback_router.exact("back_to_description", back_to_description_callback)
+callback_router.exact("back_to_attachments", back_to_attachments_callback)
 
 # Callback для отмены создания задач с подтверждением
-confirm_cancel_task_handler = bot.callback_query_handler(func=lambda c: c.data == "confirm_cancel_task")(confirm_cancel_task_callback)
-actually_cancel_task_handler = bot.callback_query_handler(func=lambda c: c.data == "actually_cancel_task")(actually_cancel_task_callback)
-resume_task_handler = bot.callback_query_handler(func=lambda c: c.data.startswith("resume_task_"))(resume_task_callback)
+callback_router.exact("confirm_cancel_task", confirm_cancel_task_callback)
+callback_router.exact("actually_cancel_task", actually_cancel_task_callback)
+callback_router.prefix("resume_task_", resume_task_callback, str)
 
 # Callback для ролей
-choose_role_from_list_handler = bot.callback_query_handler(func=lambda c: c.data == "choose_role_from_list")(choose_role_from_list_callback)
-select_role_handler = bot.callback_query_handler(func=lambda c: c.data.startswith("select_role_"))(select_role_callback)
+callback_router.exact("choose_role_from_list", choose_role_from_list_callback)
+callback_router.prefix("select_role_", select_role_callback, int)
 
-# Callback для календаря
-calendar_handler = bot.callback_query_handler(func=lambda c: c.data.startswith("calendar_"))(process_calendar_callback)
+# Callback для календаря (разбирает callback_data самостоятельно)
+callback_router.prefix("calendar_", process_calendar_callback)
 
 # Callback для действий с задачами
-task_view_handler = bot.callback_query_handler(func=lambda c: c.data.startswith("task_view_"))(task_view_callback)
-task_progress_handler = bot.callback_query_handler(func=lambda c: c.data.startswith("task_progress_"))(task_progress_callback)
-task_complete_handler = bot.callback_query_handler(func=lambda c: c.data.startswith("task_complete_"))(task_complete_callback)
-task_confirm_handler = bot.callback_query_handler(func=lambda c: c.data.startswith("task_confirm_"))(task_confirm_callback)
-task_reject_handler = bot.callback_query_handler(func=lambda c: c.data.startswith("task_reject_"))(task_reject_callback)
-subtask_toggle_handler = bot.callback_query_handler(func=lambda c: c.data.startswith("subtask_toggle_"))(subtask_toggle_callback)
-task_delete_handler = bot.callback_query_handler(func=lambda c: c.data.startswith("task_delete_"))(task_delete_callback)
-confirm_delete_handler = bot.callback_query_handler(func=lambda c: c.data.startswith("confirm_delete_"))(confirm_delete_callback)
-task_status_handler = bot.callback_query_handler(func=lambda c: c.data.startswith("task_status_"))(task_status_callback)
-task_close_handler = bot.callback_query_handler(func=lambda c: c.data.startswith("task_close_"))(task_close_callback)
+callback_router.prefix("task_view_", task_view_callback, int, str)
+callback_router.prefix("task_progress_", task_progress_callback, int)
+callback_router.prefix("task_complete_", task_complete_callback, int)
+callback_router.prefix("task_confirm_", task_confirm_callback, int)
+callback_router.prefix("task_reject_", task_reject_callback, int)
+callback_router.prefix("subtask_toggle_", subtask_toggle_callback, int, int)
+callback_router.prefix("task_delete_", task_delete_callback, int)
+callback_router.prefix("confirm_delete_", confirm_delete_callback, int)
+callback_router.prefix("task_status_", task_status_callback, int)
+callback_router.prefix("task_close_", task_close_callback, int)
 
 # Callback для редактирования задач
-task_edit_handler = bot.callback_query_handler(func=lambda c: c.data.startswith("task_edit_"))(task_edit_callback)
-edit_title_handler = bot.callback_query_handler(func=lambda c: c.data.startswith("edit_title_"))(edit_title_callback)
-edit_description_handler = bot.callback_query_handler(func=lambda c: c.data.startswith("edit_description_"))(edit_description_callback)
-edit_assignee_handler = bot.callback_query_handler(func=lambda c: c.data.startswith("edit_assignee_"))(edit_assignee_callback)
-edit_due_date_handler = bot.callback_query_handler(func=lambda c: c.data.startswith("edit_due_date_"))(edit_due_date_callback)
-edit_notify_handler = bot.callback_query_handler(func=lambda c: c.data.startswith("edit_notify_"))(edit_notification_interval_callback)
-assignee_page_handler = bot.callback_query_handler(func=lambda c: c.data.startswith("assignee_page_"))(assignee_page_callback)
-change_assignee_handler = bot.callback_query_handler(func=lambda c: c.data.startswith("change_assignee_"))(change_assignee_callback)
+callback_router.prefix("task_edit_", task_edit_callback, int)
+callback_router.prefix("edit_title_", edit_title_callback, int)
+callback_router.prefix("edit_description_", edit_description_callback, int)
+callback_router.prefix("edit_assignee_", edit_assignee_callback, int)
+callback_router.prefix("edit_due_date_", edit_due_date_callback, int)
+callback_router.prefix("edit_notify_", edit_notification_interval_callback, int)
+callback_router.prefix("change_assignee_", change_assignee_callback, int, str)
 
 # Callback для вложений
-view_report_attachments_handler = bot.callback_query_handler(func=lambda c: c.data.startswith("view_report_attachments_"))(view_report_attachments_callback)
-view_task_attachments_handler = bot.callback_query_handler(func=lambda c: c.data.startswith("view_task_attachments_"))(view_task_attachments_callback)
+callback_router.prefix("view_report_attachments_", view_report_attachments_callback, int)
+callback_router.prefix("view_task_attachments_", view_task_attachments_callback, int)
 
 # Callback для комментариев и отчетов
-task_comment_handler = bot.callback_query_handler(func=lambda c: c.data.startswith("task_comment_"))(task_comment_callback)
-finish_report_handler = bot.callback_query_handler(func=lambda c: c.data == "finish_report")(finish_report_callback)
-clear_report_attachments_handler = bot.callback_query_handler(func=lambda c: c.data == "clear_report_attachments")(clear_report_attachments_callback)
+callback_router.prefix("task_comment_", task_comment_callback, int)
+callback_router.exact("finish_report", finish_report_callback)
+callback_router.exact("clear_report_attachments", clear_report_attachments_callback)
 
 # Callback для главного меню
-tasks_back_handler = bot.callback_query_handler(func=lambda c: c.data == "tasks_back")(tasks_back_callback)
-main_menu_handler = bot.callback_query_handler(func=lambda c: c.data == "main_menu")(main_menu_callback)
+callback_router.exact("tasks_back", tasks_back_callback)
+callback_router.exact("main_menu", main_menu_callback)
 
 # Callback для добавления подзадач и изменения статуса задач
-add_subtasks_handler = bot.callback_query_handler(func=lambda c: c.data.startswith("add_subtasks_"))(add_subtasks_callback)
-reopen_task_handler = bot.callback_query_handler(func=lambda c: c.data.startswith("reopen_task_"))(reopen_task_callback)
+callback_router.prefix("add_subtasks_", add_subtasks_callback, int)
+callback_router.prefix("reopen_task_", reopen_task_callback, int)
 
 # Callback для обучения
-start_tutorial_handler = bot.callback_query_handler(func=lambda c: c.data == "start_tutorial")(start_tutorial_callback)
-skip_tutorial_handler = bot.callback_query_handler(func=lambda c: c.data == "skip_tutorial")(skip_tutorial_callback)
+callback_router.exact("start_tutorial", start_tutorial_callback)
+callback_router.exact("skip_tutorial", skip_tutorial_callback)
 
 # Callback для профиля
-profile_handler = bot.callback_query_handler(func=lambda c: c.data == "profile")(profile_callback)
-profile_edit_info_menu_handler = bot.callback_query_handler(func=lambda c: c.data == "profile_edit_info_menu")(profile_edit_info_menu_callback)
-profile_edit_first_name_handler = bot.callback_query_handler(func=lambda c: c.data == "profile_edit_first_name")(profile_edit_first_name_callback)
-profile_edit_last_name_handler = bot.callback_query_handler(func=lambda c: c.data == "profile_edit_last_name")(profile_edit_last_name_callback)
-profile_edit_work_hours_handler = bot.callback_query_handler(func=lambda c: c.data == "profile_edit_work_hours")(profile_edit_work_hours_callback)
+callback_router.exact("profile", profile_callback)
+callback_router.exact("profile_edit_info_menu", profile_edit_info_menu_callback)
+callback_router.exact("profile_edit_first_name", profile_edit_first_name_callback)
+callback_router.exact("profile_edit_last_name", profile_edit_last_name_callback)
+callback_router.exact("profile_edit_work_hours", profile_edit_work_hours_callback)
@@ -23,6 +23,62 @@ BOT_TOKEN = os.getenv('BOT_TOKEN')
 HOOK = os.getenv('HOOK')
 OWNER_ID = os.getenv('OWNER_ID')
 
+# Асинхронный приём webhook: index только ставит обновление в очередь, обработка идет в пуле потоков.
+# Обновления шардируются по chat_id: один чат всегда обрабатывается одним потоком по порядку
+WEBHOOK_ASYNC = os.getenv('WEBHOOK_ASYNC', 'False').lower() == 'true'
+UPDATE_WORKERS = int(os.getenv('UPDATE_WORKERS', '4'))
+UPDATE_QUEUE_SIZE = int(os.getenv('UPDATE_QUEUE_SIZE', '1000'))
+# Сколько секунд ждать места в переполненной очереди чата, прежде чем ответить 503 (Telegram повторит доставку)
+UPDATE_ENQUEUE_TIMEOUT = float(os.getenv('UPDATE_ENQUEUE_TIMEOUT', '5'))
+
+# Защита от повторной доставки webhook: сколько последних update_id помнить в процессе
+# и нужно ли дополнительно делить их между процессами через кэш Django
+UPDATE_DEDUP_SIZE = int(os.getenv('UPDATE_DEDUP_SIZE', '10000'))
+UPDATE_DEDUP_SHARED = os.getenv('UPDATE_DEDUP_SHARED', 'False').lower() == 'true'
+UPDATE_DEDUP_TTL = int(os.getenv('UPDATE_DEDUP_TTL', '86400'))
+
+# Лимиты исходящих сообщений (bot/sender.py): общий на бота и на один чат (сообщений в секунду),
+# допустимый всплеск в чат и число повторов при 429/сетевых ошибках
+TELEGRAM_GLOBAL_RATE = float(os.getenv('TELEGRAM_GLOBAL_RATE', '30'))
+TELEGRAM_CHAT_RATE = float(os.getenv('TELEGRAM_CHAT_RATE', '1'))
+TELEGRAM_CHAT_BURST = float(os.getenv('TELEGRAM_CHAT_BURST', '3'))
+TELEGRAM_SEND_RETRIES = int(os.getenv('TELEGRAM_SEND_RETRIES', '5'))
+
+# HTTP-сессия для Bot API: размер пула keep-alive соединений (потоки обработки + отправка + планировщик),
+# таймауты (сек) и число повторов при ошибке соединения
+TELEGRAM_POOL_SIZE = int(os.getenv('TELEGRAM_POOL_SIZE', str(UPDATE_WORKERS + 2)))
+TELEGRAM_CONNECT_TIMEOUT = float(os.getenv('TELEGRAM_CONNECT_TIMEOUT', '5'))
+TELEGRAM_READ_TIMEOUT = float(os.getenv('TELEGRAM_READ_TIMEOUT', '30'))
+TELEGRAM_CONNECT_RETRIES = int(os.getenv('TELEGRAM_CONNECT_RETRIES', '3'))
+
+# Сколько последних сообщений бота помнить, чтобы пропускать правки без изменений
+MESSAGE_RENDER_CACHE_SIZE = int(os.getenv('MESSAGE_RENDER_CACHE_SIZE', '5000'))
+
+# Outbox уведомлений (bot/outbox.py): размер пачки, период опроса таблицы (сек) и число попыток отправки
+OUTBOX_BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', '50'))
+OUTBOX_POLL_INTERVAL = float(os.getenv('OUTBOX_POLL_INTERVAL', '30'))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', '8'))
+
+# Хранилище состояний диалога (bot/state_store.py): db - сразу в UserState, memory - в памяти процесса
+# с отложенной записью в БД. Для memory: время жизни состояния в памяти и период сброса в БД (сек)
+STATE_BACKEND = os.getenv('STATE_BACKEND', 'db').lower()
+STATE_TTL = float(os.getenv('STATE_TTL', '3600'))
+STATE_FLUSH_INTERVAL = float(os.getenv('STATE_FLUSH_INTERVAL', '5'))
+
+# Кэш ролей пользователей (bot/role_cache.py): алиас из CACHES и время жизни (сек). Сброс сигналами
+# в локальном для процесса кэше (LocMem) другие процессы не видят, поэтому без ROLE_CACHE_TTL общий кэш
+# (Redis/Memcached/БД) хранит роли ROLE_CACHE_SHARED_TTL, а локальный - ROLE_CACHE_LOCAL_TTL
+ROLE_CACHE_ALIAS = os.getenv('ROLE_CACHE_ALIAS', 'default')
+ROLE_CACHE_TTL = int(os.getenv('ROLE_CACHE_TTL')) if os.getenv('ROLE_CACHE_TTL') else None
+ROLE_CACHE_SHARED_TTL = int(os.getenv('ROLE_CACHE_SHARED_TTL', '3600'))
+ROLE_CACHE_LOCAL_TTL = int(os.getenv('ROLE_CACHE_LOCAL_TTL', '30'))
+
+# Сколько секунд кэшировать число задач в списках "Мои задачи" / "Созданные мной"
+TASK_LIST_COUNT_TTL = int(os.getenv('TASK_LIST_COUNT_TTL', '60'))
+
+# Окно объединения частых уведомлений (комментарии, напоминания) в одну сводку, сек; 0 - отправлять сразу
+NOTIFICATION_COALESCE_SECONDS = int(os.getenv('NOTIFICATION_COALESCE_SECONDS', '60'))
+
 def get_bot_commands():
     """Lazy load bot commands to avoid telebot import during Django setup"""
     try:
@@ -130,3 +186,6 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Тесты запускаются с ботом без обращений к Telegram (см. bot/test_runner.py)
+TEST_RUNNER = 'bot.test_runner.OfflineBotTestRunner'
@@ -0,0 +1,136 @@
+"""
+Замер задержки вызовов Bot API через apihelper против локальной заглушки API:
+одноразовая сессия на каждый запрос (новое соединение и рукопожатие TLS),
+сессия на поток (поведение telebot по умолчанию) и общая keep-alive сессия
+с пулом соединений (bot.configure_api_session).
+
+Заглушка отвечает на любой метод как sendMessage. Для замера с TLS передайте
+сертификат и ключ для localhost, например:
+
+    openssl req -x509 -newkey rsa:2048 -nodes -days 1 -subj /CN=localhost \\
+        -addext subjectAltName=DNS:localhost -keyout /tmp/key.pem -out /tmp/cert.pem
+    python scripts/bench_api_session.py --sends 1000 --threads 8 --certfile /tmp/cert.pem --keyfile /tmp/key.pem
+"""
+import argparse
+import json
+import os
+import ssl
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from bench_common import print_table, setup_django
+
+_RESPONSE = json.dumps({
+    'ok': True,
+    'result': {'message_id': 1, 'date': 0, 'chat': {'id': 1, 'type': 'private'}, 'text': 'ok'},
+}).encode()
+
+
+class StubApiHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Заголовки и тело пишутся отдельно: без TCP_NODELAY keep-alive ответы ждут delayed ACK (~40 мс)
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(_RESPONSE)))
+        self.end_headers()
+        self.wfile.write(_RESPONSE)
+
+    do_GET = do_POST
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stub(certfile=None, keyfile=None) -> str:
+    server = ThreadingHTTPServer(('localhost', 0), StubApiHandler)
+    server.daemon_threads = True
+    scheme = 'http'
+    if certfile:
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(certfile, keyfile)
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+        scheme = 'https'
+        # Клиентские сессии requests доверяют сертификату заглушки через REQUESTS_CA_BUNDLE
+        os.environ['REQUESTS_CA_BUNDLE'] = certfile
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"{scheme}://localhost:{server.server_port}/bot{{0}}/{{1}}"
+
+
+def configure_mode(mode: str) -> None:
+    from telebot import apihelper
+
+    from bot import configure_api_session
+
+    apihelper.session = None
+    apihelper.SESSION_TIME_TO_LIVE = None
+    if mode == 'one-shot':
+        apihelper.SESSION_TIME_TO_LIVE = 0
+    elif mode == 'pooled':
+        configure_api_session()
+
+
+def run(sends: int, threads: int) -> tuple:
+    from bot import bot
+
+    latencies = []
+    lock = threading.Lock()
+    per_thread = sends // threads
+
+    def worker():
+        local = []
+        for i in range(per_thread):
+            started = time.perf_counter()
+            bot.send_message(1, f"benchmark {i}")
+            local.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(local)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return latencies, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sends', type=int, default=1000)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--certfile')
+    parser.add_argument('--keyfile')
+    args = parser.parse_args()
+
+    setup_django()
+    from telebot import apihelper
+
+    apihelper.API_URL = start_stub(args.certfile, args.keyfile)
+
+    rows = []
+    for mode in ('one-shot', 'per-thread', 'pooled'):
+        configure_mode(mode)
+        latencies, elapsed = run(args.sends, args.threads)
+        latencies.sort()
+        rows.append([
+            mode,
+            f"{statistics.median(latencies) * 1000:.2f}",
+            f"{latencies[int(len(latencies) * 0.95)] * 1000:.2f}",
+            f"{len(latencies) / elapsed:.0f}",
+        ])
+
+    print_table(
+        f"{args.sends} вызовов sendMessage, {args.threads} потоков, {'TLS' if args.certfile else 'HTTP'}",
+        ['сессия', 'p50, мс', 'p95, мс', 'вызовов/с'],
+        rows,
+    )
+
+
+if __name__ == '__main__':
+    main()
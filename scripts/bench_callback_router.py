@@ -0,0 +1,95 @@
+"""
+Микро-замер стоимости выбора обработчика callback'а: прежний линейный перебор
+фильтров (lambda c: c.data == ... / c.data.startswith(...), в порядке регистрации
+из bot/views.py) против словаря и префиксного дерева bot/router.py.
+
+Для каждого маршрута строится пример callback_data; замеряется только выбор
+обработчика (вместе с разбором аргументов у роутера), сами обработчики не вызываются.
+
+    python scripts/bench_callback_router.py --iterations 20000
+"""
+import argparse
+import os
+import re
+import time
+from types import SimpleNamespace
+
+from bench_common import ROOT, print_table, setup_django
+
+_REGISTRATION = re.compile(r'callback_router\.(exact|prefix)\("([^"]+)"')
+
+
+def registrations() -> list:
+    with open(os.path.join(ROOT, 'bot', 'views.py'), encoding='utf-8') as f:
+        return _REGISTRATION.findall(f.read())
+
+
+def sample_data(kind: str, value: str, router) -> str:
+    if kind == 'exact':
+        return value
+    node = router._trie
+    for char in value:
+        node = node[char]
+    route = node[None]
+    samples = {int: '42', str: 'assigned'}
+    args = [samples.get(converter, '15') for converter in route.converters]
+    return value + ('_'.join(args) if args else 'day_2026_10_17')
+
+
+def legacy_filters(routes: list) -> list:
+    filters = []
+    for kind, value in routes:
+        if kind == 'exact':
+            filters.append(lambda c, value=value: c.data == value)
+        else:
+            filters.append(lambda c, value=value: c.data.startswith(value))
+    return filters
+
+
+def legacy_dispatch(filters, call):
+    for index, test in enumerate(filters):
+        if test(call):
+            return index
+    return None
+
+
+def per_call_ns(func, call, iterations: int) -> float:
+    started = time.perf_counter_ns()
+    for _ in range(iterations):
+        func(call)
+    return (time.perf_counter_ns() - started) / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=20000)
+    args = parser.parse_args()
+
+    setup_django()
+    import bot.views  # noqa: F401  регистрирует маршруты
+    from bot.router import callback_router
+
+    routes = registrations()
+    filters = legacy_filters(routes)
+
+    rows = []
+    legacy_total = router_total = 0.0
+    for kind, value in routes:
+        call = SimpleNamespace(data=sample_data(kind, value, callback_router))
+        assert callback_router.resolve(call.data) is not None, call.data
+        legacy_ns = per_call_ns(lambda c: legacy_dispatch(filters, c), call, args.iterations)
+        router_ns = per_call_ns(lambda c: callback_router.resolve(c.data), call, args.iterations)
+        legacy_total += legacy_ns
+        router_total += router_ns
+        rows.append([call.data, f"{legacy_ns:.0f}", f"{router_ns:.0f}"])
+
+    rows.append(['среднее', f"{legacy_total / len(routes):.0f}", f"{router_total / len(routes):.0f}"])
+    print_table(
+        f"{len(routes)} маршрутов, {args.iterations} повторов на маршрут (нс на callback)",
+        ['callback_data', 'перебор фильтров', 'router'],
+        rows,
+    )
+
+
+if __name__ == '__main__':
+    main()
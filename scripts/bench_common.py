@@ -0,0 +1,54 @@
+"""
+Общая подготовка для скриптов замеров из scripts/.
+
+Скрипты запускаются из корня проекта (python scripts/bench_<...>.py) с теми же
+переменными окружения, что и бот. Бот создается без обращений к Telegram:
+get_bot() при первом вызове выполняет set_my_commands и get_me, а замерам
+нужна только регистрация обработчиков.
+"""
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def setup_django(offline_bot: bool = True) -> None:
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    import django
+    import dotenv
+
+    dotenv.load_dotenv(os.path.join(ROOT, '.env'))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'dd.settings')
+    django.setup()
+
+    if offline_bot:
+        import telebot
+        from django.conf import settings
+
+        import bot as bot_package
+
+        bot_package._bot = telebot.TeleBot(settings.BOT_TOKEN or '123456:benchmark', threaded=False)
+
+
+def timed(func, *args, **kwargs) -> float:
+    """Время одного вызова в секундах"""
+    started = time.perf_counter()
+    func(*args, **kwargs)
+    return time.perf_counter() - started
+
+
+def repeat(func, runs: int) -> dict:
+    """Медиана и минимум по нескольким прогонам (сек)"""
+    samples = [timed(func) for _ in range(runs)]
+    return {'median': statistics.median(samples), 'min': min(samples)}
+
+
+def print_table(title: str, header: list, rows: list) -> None:
+    print(f"\n{title}")
+    widths = [max(len(str(row[i])) for row in [header] + rows) for i in range(len(header))]
+    print('  '.join(str(cell).ljust(width) for cell, width in zip(header, widths)))
+    for row in rows:
+        print('  '.join(str(cell).ljust(width) for cell, width in zip(row, widths)))
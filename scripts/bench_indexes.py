@@ -0,0 +1,196 @@
+"""
+Замер горячих запросов к задачам на синтетической базе: список "Мои задачи" и
+"Созданные мной" (task_list_queryset / get_task_page / count), выборка
+напоминаний task_reminders и отбор пользователей с подсчетом задач morning_summary.
+
+Скрипт создает отдельную тестовую базу (как manage.py test), заполняет ее
+--tasks задачами, печатает EXPLAIN каждого запроса с отметкой, использован ли
+индекс task_*_idx, и время выполнения. С --drop-indexes замер повторяется
+после удаления индексов задач - для сравнения.
+
+    python scripts/bench_indexes.py --tasks 100000 --users 2000 --drop-indexes
+"""
+import argparse
+import random
+import re
+from datetime import timedelta
+
+from bench_common import print_table, repeat, setup_django
+
+TIMEZONES = ['UTC', 'Europe/Moscow', 'Asia/Yekaterinburg', 'Asia/Novosibirsk', 'Asia/Vladivostok']
+STATUSES = ['active'] * 40 + ['pending_review'] * 10 + ['completed'] * 45 + ['cancelled'] * 5
+_INDEX_NAME = re.compile(r'\b(task_\w+_idx)\b')
+
+
+def seed(tasks: int, users: int, roles: int) -> None:
+    from django.utils import timezone
+
+    from bot.models import Role, Task, User
+
+    rng = random.Random(42)
+    now = timezone.now()
+    User.objects.bulk_create(
+        [User(telegram_id=str(100000 + i), user_name=f"user{i}", first_name=f"Имя {i}",
+              timezone=rng.choice(TIMEZONES)) for i in range(users)],
+        batch_size=1000,
+    )
+    Role.objects.bulk_create([Role(name=f"Роль {i}") for i in range(roles)])
+    role_ids = list(Role.objects.values_list('id', flat=True))
+    user_ids = list(User.objects.values_list('telegram_id', flat=True))
+
+    # Каждый пользователь состоит в 0-2 ролях
+    User.roles.through.objects.bulk_create(
+        [User.roles.through(user_id=user_id, role_id=role_id)
+         for user_id in user_ids for role_id in rng.sample(role_ids, rng.randint(0, 2))],
+        batch_size=1000,
+    )
+
+    batch = []
+    for i in range(tasks):
+        status = rng.choice(STATUSES)
+        interval = rng.choice([None, 60, 180, 1440])
+        by_role = rng.random() < 0.2
+        open_task = status in Task.REMINDER_STATUSES
+        batch.append(Task(
+            title=f"Задача {i}",
+            creator_id=rng.choice(user_ids),
+            assignee_id=None if by_role else rng.choice(user_ids),
+            assigned_role_id=rng.choice(role_ids) if by_role else None,
+            status=status,
+            notification_interval=interval,
+            # Напоминание подошло примерно у 2% открытых задач с интервалом
+            next_notify_at=now + timedelta(minutes=rng.randint(-1440, 1440 * 50)) if interval and open_task else None,
+            due_date=now + timedelta(days=rng.randint(-30, 60)) if rng.random() < 0.7 else None,
+        ))
+        if len(batch) == 5000:
+            Task.objects.bulk_create(batch)
+            batch = []
+    Task.objects.bulk_create(batch)
+
+
+def hot_queries() -> list:
+    """(название, queryset для EXPLAIN, функция полного выполнения)"""
+    from django.utils import timezone
+
+    from bot.handlers.utils import get_task_page, task_list_queryset
+    from bot.management.commands.morning_summary import Command as MorningSummary
+    from bot.models import Task, User
+    from bot.timezones import TimezoneSnapshot
+
+    user = max(User.objects.filter(roles__isnull=False), key=lambda u: u.telegram_id)
+    now = timezone.now()
+    summary = MorningSummary()
+    my_tasks = task_list_queryset(user, 'assignee')
+    created = task_list_queryset(user, 'creator')
+    due = Task.objects.filter(next_notify_at__lte=now, status__in=Task.REMINDER_STATUSES).order_by()
+
+    def morning_summary():
+        users = list(User.objects.filter(summary.eligibility_filter(TimezoneSnapshot(now))).only('telegram_id'))
+        summary.collect_counters([u.telegram_id for u in users], now, now.date())
+
+    user_ids = list(User.objects.values_list('telegram_id', flat=True))
+    summary_counts = Task.objects.filter(status='active', assignee_id__in=user_ids).order_by().values('assignee_id')
+
+    return [
+        ('Мои задачи: страница', my_tasks.only('id', 'title', 'status', 'due_date').order_by('-id')[:6],
+         lambda: get_task_page(my_tasks)),
+        ('Мои задачи: count', my_tasks.order_by(), my_tasks.count),
+        ('Созданные мной: страница', created.only('id', 'title', 'status', 'due_date').order_by('-id')[:6],
+         lambda: get_task_page(created)),
+        ('Созданные мной: count', created.order_by(), created.count),
+        ('Напоминания: к отправке', due, lambda: list(due.values_list('id', flat=True))),
+        ('Сводка: отбор и счетчики', summary_counts, morning_summary),
+    ]
+
+
+def explain(queryset) -> str:
+    try:
+        return queryset.explain()
+    except Exception as e:
+        return f"EXPLAIN недоступен: {e}"
+
+
+def measure(runs: int, show_plans: bool) -> dict:
+    results = {}
+    for name, queryset, run in hot_queries():
+        plan = explain(queryset)
+        indexes = sorted(set(_INDEX_NAME.findall(plan)))
+        if show_plans:
+            print(f"\n--- {name}\n{plan}")
+        results[name] = (', '.join(indexes) or '-', repeat(run, runs)['median'])
+    return results
+
+
+def analyze() -> None:
+    """Собирает статистику таблиц, как в рабочей базе: без нее планировщик выбирает индекс наугад"""
+    from django.db import connection
+
+    from bot.models import Task, User
+
+    tables = [Task._meta.db_table, User._meta.db_table, User.roles.through._meta.db_table]
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute('ANALYZE')
+        elif connection.vendor == 'mysql':
+            cursor.execute(f"ANALYZE TABLE {', '.join(tables)}")
+        else:
+            for table in tables:
+                cursor.execute(f'ANALYZE {table}')
+
+
+def drop_task_indexes() -> None:
+    from django.db import connection
+
+    from bot.models import Task
+
+    with connection.schema_editor() as editor:
+        for index in Task._meta.indexes:
+            editor.remove_index(Task, index)
+    analyze()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tasks', type=int, default=100000)
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--roles', type=int, default=50)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--drop-indexes', action='store_true', help='повторить замер без индексов task_*_idx')
+    parser.add_argument('--quiet', action='store_true', help='не печатать планы запросов')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db import connection
+
+    # Отдельная база: миграции (или syncdb, если их нет) применяются как в manage.py test
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        seed(args.tasks, args.users, args.roles)
+        analyze()
+        with_indexes = measure(args.runs, not args.quiet)
+        without_indexes = {}
+        if args.drop_indexes:
+            drop_task_indexes()
+            without_indexes = measure(args.runs, not args.quiet)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    header = ['запрос', 'индекс', 'мс']
+    if without_indexes:
+        header += ['без индексов, мс']
+    rows = []
+    for name, (indexes, elapsed) in with_indexes.items():
+        row = [name, indexes, f"{elapsed * 1000:.2f}"]
+        if without_indexes:
+            row.append(f"{without_indexes[name][1] * 1000:.2f}")
+        rows.append(row)
+    print_table(
+        f"{args.tasks} задач, {args.users} пользователей, {connection.vendor}, медиана {args.runs} прогонов",
+        header,
+        rows,
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Замер локального экранирования и проверки Markdown (bot/formatting.py) на
+враждебных входных данных: незакрытые и вложенные сущности, длинные серии
+служебных символов, обратные слэши, ссылки без URL.
+
+Каждое значение экранируется и подставляется в шаблон, похожий на карточку
+задачи; результат обязан проходить find_markdown_error (иначе Telegram ответил
+бы "can't parse entities" и понадобилась бы повторная отправка). Для сравнения
+приведено время самой проверки на неэкранированном тексте.
+
+    python scripts/bench_markdown.py --iterations 2000
+"""
+import argparse
+import time
+
+from bench_common import print_table, setup_django
+
+TEMPLATE = "📋 **{title}**\n\n📝 Описание: {description}\n👤 Исполнитель: Иван\n💬 _Комментарий:_ {comment}"
+
+
+def adversarial_inputs() -> dict:
+    return {
+        'обычный текст': 'Подготовить отчет за квартал',
+        'snake_case': 'fix_user_state_flush_' * 20,
+        'незакрытая *': 'важно *срочно' * 51,
+        'незакрытый `': 'код `print(' * 51,
+        'ссылки [a](': '[ссылка](http://a' * 50,
+        'вложенные': '*_`[' * 500,
+        'слэши': '\\' * 999 + '*',
+        'только *': '*' * 4001,
+        'эмодзи и _': '🔥_🚀_' * 500,
+        'длинное 4096': ('_*`[' + 'x' * 60) * 64,
+    }
+
+
+def per_call_us(func, value, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        func(value)
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=2000)
+    args = parser.parse_args()
+
+    setup_django()
+    from bot.formatting import escape_md, find_markdown_error
+
+    def render(value):
+        escaped = escape_md(value)
+        return TEMPLATE.format(title=escaped, description=escaped, comment=escaped)
+
+    def render_and_check(value):
+        return find_markdown_error(render(value))
+
+    rows = []
+    failures = 0
+    for name, value in adversarial_inputs().items():
+        raw_text = TEMPLATE.format(title=value, description=value, comment=value)
+        valid = find_markdown_error(render(value)) is None
+        failures += not valid
+        rows.append([
+            name,
+            len(raw_text),
+            'ok' if find_markdown_error(raw_text) is None else 'ошибка',
+            'ok' if valid else 'ОШИБКА',
+            f"{per_call_us(escape_md, value, args.iterations):.1f}",
+            f"{per_call_us(find_markdown_error, raw_text, args.iterations):.1f}",
+            f"{per_call_us(render_and_check, value, args.iterations):.1f}",
+        ])
+
+    print_table(
+        f"Враждебные входные данные, {args.iterations} повторов (мкс на сообщение)",
+        ['вход', 'длина', 'без экранирования', 'после экранирования',
+         'escape_md', 'проверка', 'сборка + проверка'],
+        rows,
+    )
+    if failures:
+        raise SystemExit(f"{failures} экранированных сообщений не прошли проверку")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+"""
+Замер хранилищ состояния диалога (bot/state_store.py) на сценарии создания
+задачи: DatabaseStateStore (STATE_BACKEND=db) против MemoryStateStore
+(STATE_BACKEND=memory).
+
+Каждый шаг сценария - отдельное обновление: внутри update_context()
+состояние читается через get_user_state и записывается через set_user_state,
+как это делают обработчики из bot/handlers/task_creation.py; в конце
+сценария состояние очищается. Сама задача не создается и сообщения не
+отправляются - эта часть одинакова для обоих хранилищ. Для memory в общее
+время включен итоговый flush() в БД.
+
+    python scripts/bench_state_store.py --chats 200 --flows 5 --threads 1 4
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from bench_common import print_table, setup_django
+
+# (новое состояние, поля, которые шаг добавляет в данные) - по шагам task_creation.py
+FLOW = [
+    ('waiting_task_title', {}),
+    ('waiting_task_description', {'title': 'Подготовить квартальный отчет'}),
+    ('waiting_subtasks', {'description': 'Собрать данные по всем отделам и сверить с бухгалтерией'}),
+    ('waiting_subtask_input', {}),
+    ('waiting_subtasks', {'subtask': 'Выгрузить продажи'}),
+    ('waiting_subtask_input', {}),
+    ('waiting_subtasks', {'subtask': 'Сверить расходы'}),
+    ('waiting_attachments', {}),
+    ('waiting_due_date', {'attachments': [{'type': 'photo', 'file_id': 'AgACAgIAAxkBAAIBZ2' * 3}]}),
+    ('waiting_notification_interval', {'due_date': '2026-10-31 18:00'}),
+    ('waiting_assignee_selection', {'notification_interval': 60}),
+]
+
+
+class QueryCounter:
+    """execute_wrapper: считает запросы к БД во всех потоках"""
+
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        with self._lock:
+            self.count += 1
+        return execute(sql, params, many, context)
+
+
+def run_flow(chat_id: str) -> None:
+    from bot.context import update_context
+    from bot.handlers.utils import clear_user_state, get_user_state, set_user_state
+
+    for state_name, data in FLOW:
+        with update_context():
+            user_state = get_user_state(chat_id)
+            user_state['state'] = state_name
+            for key, value in data.items():
+                if key == 'subtask':
+                    user_state.setdefault('subtasks', []).append(value)
+                else:
+                    user_state[key] = value
+            set_user_state(chat_id, user_state)
+    with update_context():
+        get_user_state(chat_id)
+        clear_user_state(chat_id)
+
+
+def use_store(store) -> None:
+    import bot.handlers.utils
+    import bot.state_store
+
+    bot.state_store.state_store = store
+    bot.handlers.utils.state_store = store
+
+
+def run(store, chat_ids: list, flows: int, threads: int) -> tuple:
+    from django.db import close_old_connections, connection
+
+    use_store(store)
+    counter = QueryCounter()
+    chunks = [chat_ids[i::threads] for i in range(threads)]
+    errors = []
+
+    def worker(chats):
+        try:
+            with connection.execute_wrapper(counter):
+                for _ in range(flows):
+                    for chat_id in chats:
+                        run_flow(chat_id)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            close_old_connections()
+
+    workers = [threading.Thread(target=worker, args=(chunk,)) for chunk in chunks]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    if errors:
+        raise RuntimeError(f"Сценарий завершился ошибкой: {errors[0]}")
+    with connection.execute_wrapper(counter):
+        store.flush()
+    return time.perf_counter() - started, counter.count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--chats', type=int, default=200)
+    parser.add_argument('--flows', type=int, default=5, help='сценариев создания задачи на чат')
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 4])
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from django.db import connection
+
+    from bot.models import User
+    from bot.state_store import DatabaseStateStore, MemoryStateStore
+
+    if connection.vendor == 'sqlite':
+        # Файловая база вместо базы в памяти: запись на диск, как у рабочего бота, и доступ из потоков
+        connection.settings_dict['TEST']['NAME'] = os.path.join(tempfile.gettempdir(), 'bench_state_store.sqlite3')
+        # Потоки пишут по очереди: update_or_create читает и пишет в одной транзакции, поэтому
+        # блокировка на запись берется сразу (IMMEDIATE), а занятая база ждется, а не падает с "database is locked"
+        connection.settings_dict['OPTIONS'].update(timeout=60, transaction_mode='IMMEDIATE')
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        chat_ids = [str(500000 + i) for i in range(args.chats)]
+        User.objects.bulk_create([User(telegram_id=chat_id, user_name=f"user{chat_id}") for chat_id in chat_ids])
+
+        total_flows = args.chats * args.flows
+        rows = []
+        for threads in args.threads:
+            stores = [
+                ('db', DatabaseStateStore()),
+                # Фоновый сброс не успевает сработать за замер: все изменения уходят итоговым flush()
+                ('memory', MemoryStateStore(settings.STATE_TTL, flush_interval=3600)),
+            ]
+            for name, store in stores:
+                elapsed, queries = run(store, chat_ids, args.flows, threads)
+                rows.append([
+                    name,
+                    threads,
+                    f"{elapsed:.2f}",
+                    f"{total_flows / elapsed:.0f}",
+                    f"{queries / total_flows:.1f}",
+                ])
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    print_table(
+        f"{total_flows} сценариев создания задачи ({len(FLOW) + 1} обновлений), {connection.vendor}",
+        ['хранилище', 'потоков', 'время, с', 'сценариев/с', 'запросов на сценарий'],
+        rows,
+    )
+
+
+if __name__ == '__main__':
+    main()
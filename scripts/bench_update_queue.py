@@ -0,0 +1,122 @@
+"""
+Замер пропускной способности обработки обновлений: последовательный путь
+(WEBHOOK_ASYNC=false, process_update в потоке запроса) против очереди с
+шардированием по chat_id (bot/update_queue.py).
+
+Обработка обновления в боте почти целиком состоит из ожидания БД и Bot API,
+поэтому обработчик заменен задержкой --latency; порядок обработки внутри
+каждого чата проверяется.
+
+    python scripts/bench_update_queue.py --chats 50 --per-chat 20 --latency 0.02 --workers 1 4 8
+"""
+import argparse
+import json
+import threading
+import time
+from collections import defaultdict
+
+from bench_common import print_table, setup_django
+
+
+def make_updates(chats: int, per_chat: int) -> list:
+    from telebot.types import Update
+
+    updates = []
+    update_id = 1
+    # Обновления чатов перемешаны, как они приходят в webhook
+    for seq in range(per_chat):
+        for chat_id in range(1, chats + 1):
+            updates.append(Update.de_json(json.dumps({
+                'update_id': update_id,
+                'message': {
+                    'message_id': update_id,
+                    'date': 0,
+                    'chat': {'id': chat_id, 'type': 'private'},
+                    'from': {'id': chat_id, 'is_bot': False, 'first_name': 'bench'},
+                    'text': str(seq),
+                },
+            })))
+            update_id += 1
+    return updates
+
+
+class Recorder:
+    """Заменяет bot.process_new_updates: ждет latency и запоминает порядок сообщений чата"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.seen = defaultdict(list)
+        self.lock = threading.Lock()
+
+    def __call__(self, updates):
+        time.sleep(self.latency)
+        for update in updates:
+            with self.lock:
+                self.seen[update.message.chat.id].append(int(update.message.text))
+
+    def ordered(self) -> bool:
+        return all(values == sorted(values) for values in self.seen.values())
+
+
+def run_serial(updates, recorder) -> float:
+    from bot import update_queue
+
+    started = time.perf_counter()
+    for update in updates:
+        update_queue.process_update(update)
+    return time.perf_counter() - started
+
+
+def run_sharded(updates, workers: int) -> float:
+    from django.conf import settings
+
+    from bot import update_queue
+
+    settings.UPDATE_WORKERS = workers
+    update_queue.start_workers()
+    try:
+        started = time.perf_counter()
+        for update in updates:
+            if not update_queue.enqueue_update(update):
+                raise RuntimeError("Update queue is full: increase UPDATE_QUEUE_SIZE or UPDATE_ENQUEUE_TIMEOUT")
+        for shard in update_queue._shards:
+            shard.join()
+        return time.perf_counter() - started
+    finally:
+        update_queue.stop_workers()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--chats', type=int, default=50)
+    parser.add_argument('--per-chat', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=0.02, help='время обработки одного обновления, сек')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8])
+    args = parser.parse_args()
+
+    setup_django()
+    from bot import bot
+
+    updates = make_updates(args.chats, args.per_chat)
+    rows = []
+
+    recorder = Recorder(args.latency)
+    bot.process_new_updates = recorder
+    elapsed = run_serial(updates, recorder)
+    rows.append(['serial', f"{elapsed:.2f}", f"{len(updates) / elapsed:.0f}", recorder.ordered()])
+
+    for workers in args.workers:
+        recorder = Recorder(args.latency)
+        bot.process_new_updates = recorder
+        elapsed = run_sharded(updates, workers)
+        rows.append([f"sharded x{workers}", f"{elapsed:.2f}", f"{len(updates) / elapsed:.0f}", recorder.ordered()])
+
+    print_table(
+        f"{len(updates)} обновлений, {args.chats} чатов, обработка {args.latency * 1000:.0f} мс",
+        ['режим', 'время, с', 'обновлений/с', 'порядок в чате'],
+        rows,
+    )
+
+
+if __name__ == '__main__':
+    main()